@@ -4,8 +4,19 @@ TC_AUTH_001: 用戶登錄和註冊功能測試
 """
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import json
 from game.models import PlayerProfile
+from game.players import get_or_create_player
+
+
+def _statements(captured_queries):
+    """輔助函數：排除 SAVEPOINT 相關語句（測試交易內才會出現），只保留實際的資料庫操作"""
+    return [
+        q['sql'] for q in captured_queries
+        if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+    ]
 
 
 class LoginRegisterTestCase(TestCase):
@@ -206,3 +217,45 @@ class LoginRegisterTestCase(TestCase):
         user_count = User.objects.filter(username=username).count()
         self.assertEqual(user_count, 1)
 
+    def test_new_player_upsert_statement_count(self):
+        """測試用例：新玩家以最少語句建立 User 與 PlayerProfile"""
+        with CaptureQueriesContext(connection) as ctx:
+            user, profile, created = get_or_create_player('upsert_new_user')
+        
+        self.assertTrue(created)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(profile.user_id, user.id)
+        self.assertIsNotNone(profile.created_at)
+        self.assertEqual(PlayerProfile.objects.get(user__username='upsert_new_user').pk, profile.pk)
+        
+        # 查詢是否存在 + 建立（PostgreSQL 以單一 CTE 語句同時建立 User 與 PlayerProfile）
+        expected = 2 if connection.vendor == 'postgresql' else 3
+        self.assertEqual(len(_statements(ctx.captured_queries)), expected)
+
+    def test_existing_player_upsert_single_query(self):
+        """測試用例：已存在的玩家一次 JOIN 查詢取得 User 與 PlayerProfile"""
+        existing = User.objects.create_user(username='upsert_existing_user')
+        existing.set_unusable_password()
+        existing.save()
+        PlayerProfile.objects.create(user=existing, coins=123)
+        
+        with self.assertNumQueries(1):
+            user, profile, created = get_or_create_player('upsert_existing_user')
+        
+        self.assertFalse(created)
+        self.assertEqual(user.id, existing.id)
+        self.assertEqual(profile.coins, 123)
+
+    def test_new_player_login_query_count(self):
+        """測試用例：新玩家登入的總查詢數（包含 session 建立）固定不變"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                self.base_url,
+                data=json.dumps({'username': 'query_count_user'}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        
+        # 玩家查詢與建立 2~3 條 + session 建立與儲存 3 條 + last_login 更新 + 用戶 Session 索引
+        expected = 7 if connection.vendor == 'postgresql' else 8
+        self.assertEqual(len(_statements(ctx.captured_queries)), expected)
@@ -6,8 +6,10 @@ from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
 from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import json
-from game.models import PlayerProfile
+from game.models import PlayerProfile, UserSession
 
 
 class SessionManagementTestCase(TestCase):
@@ -280,6 +282,68 @@ class SessionManagementTestCase(TestCase):
         response2_profile = self.client.get('/api/profile/')
         self.assertEqual(response2_profile.status_code, 200)
 
+    def test_session_index_maintained_on_login_logout(self):
+        """測試用例：登入時建立用戶 Session 索引，登出時移除"""
+        username = 'session_index_user'
+        
+        response = self.client.post(
+            self.base_url,
+            data=json.dumps({'username': username}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        user = User.objects.get(username=username)
+        session_key = self.client.session.session_key
+        indexed_keys = list(UserSession.objects.filter(user=user).values_list('session_key', flat=True))
+        self.assertEqual(indexed_keys, [session_key])
+        
+        # 登出後索引記錄應被移除
+        self.client.post('/api/logout/')
+        self.assertFalse(UserSession.objects.filter(user=user).exists())
+
+    def test_single_session_eviction_uses_index(self):
+        """測試用例：清除舊會話不掃描其他用戶的 session（查詢數與 session 總數無關）"""
+        username = 'index_eviction_user'
+        
+        # 其他用戶的大量 session 不應影響登入時的查詢數量
+        for i in range(20):
+            other_client = Client()
+            other_client.post(
+                self.base_url,
+                data=json.dumps({'username': f'other_user_{i}'}),
+                content_type='application/json'
+            )
+        
+        client1 = Client()
+        client1.post(
+            self.base_url,
+            data=json.dumps({'username': username}),
+            content_type='application/json'
+        )
+        
+        client2 = Client()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client2.post(
+                self.base_url,
+                data=json.dumps({'username': username}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        
+        # 不應載入所有 session 逐一解碼（對 django_session 的查詢都必須以 session_key 定位）
+        session_scans = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "django_session"' in q['sql']
+            and '"session_key" =' not in q['sql']
+        ]
+        self.assertEqual(session_scans, [])
+        
+        # 舊裝置已失效，其他用戶的 session 不受影響
+        self.assertEqual(client1.get('/api/profile/').status_code, 401)
+        self.assertEqual(client2.get('/api/profile/').status_code, 200)
+        self.assertEqual(UserSession.objects.exclude(user__username=username).count(), 20)
+
     def _get_user_sessions(self, user_id):
         """輔助方法：獲取指定用戶的所有活躍 session"""
         active_sessions = Session.objects.filter(
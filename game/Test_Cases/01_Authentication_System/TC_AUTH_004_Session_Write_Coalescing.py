@@ -0,0 +1,75 @@
+"""
+認證系統測試 - Session 合併寫入
+TC_AUTH_004: 資料未變更的請求不寫入 session，超過刷新間隔才延長過期時間
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+import json
+import time
+
+
+def _session_writes(captured_queries):
+    """輔助函數：篩選出寫入 django_session 的查詢"""
+    return [
+        q['sql'] for q in captured_queries
+        if 'django_session' in q['sql'] and q['sql'].startswith(('UPDATE', 'INSERT'))
+    ]
+
+
+@override_settings(SESSION_SAVE_EVERY_REQUEST=False, SESSION_REFRESH_FRACTION=0.1)
+class SessionWriteCoalescingTestCase(TestCase):
+    """Session 合併寫入測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'coalesce_user'}),
+            content_type='application/json'
+        )
+        self.session_key = self.client.session.session_key
+
+    def test_unchanged_session_not_saved(self):
+        """測試用例：連續讀取 API 不會寫入 django_session"""
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                response = self.client.get('/api/profile/')
+                self.assertEqual(response.status_code, 200)
+            response = self.client.get('/api/history/')
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(_session_writes(ctx.captured_queries), [])
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_session_extended_after_refresh_interval(self):
+        """測試用例：超過刷新間隔後寫入一次並延長過期時間"""
+        expire_before = Session.objects.get(session_key=self.session_key).expire_date
+
+        # 模擬經過一天（超過 7 天 * 0.1 的刷新間隔）
+        one_day_later = time.time() + 60 * 60 * 24
+        with mock.patch('react_game.middleware.time.time', return_value=one_day_later):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(_session_writes(ctx.captured_queries)), 1)
+        self.assertIn('sessionid', response.cookies)
+
+        expire_after = Session.objects.get(session_key=self.session_key).expire_date
+        self.assertGreaterEqual(expire_after, expire_before)
+
+        # 同一時間點的下一次請求不再寫入
+        with mock.patch('react_game.middleware.time.time', return_value=one_day_later + 60):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get('/api/profile/')
+        self.assertEqual(_session_writes(ctx.captured_queries), [])
+
+    def test_logout_still_clears_session(self):
+        """測試用例：合併寫入模式下登出仍然清除 session"""
+        response = self.client.post('/api/logout/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Session.objects.filter(session_key=self.session_key).exists())
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
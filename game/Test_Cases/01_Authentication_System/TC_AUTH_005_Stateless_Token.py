@@ -0,0 +1,98 @@
+"""
+認證系統測試 - 無狀態簽名憑證
+TC_AUTH_005: 簽名憑證登入、撤銷計數與單一會話策略測試
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+from game.models import PlayerProfile
+
+
+@override_settings(GAME_STATELESS_AUTH=True)
+class StatelessTokenTestCase(TestCase):
+    """無狀態簽名憑證測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.base_url = '/api/login/'
+
+    def _login(self, username, client=None):
+        """輔助方法：登入並返回 (client, token)"""
+        client = client or Client()
+        response = client.post(
+            self.base_url,
+            data=json.dumps({'username': username}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertIn('token', data)
+        return client, data['token']
+
+    def test_login_issues_token_without_session(self):
+        """測試用例：登入簽發憑證且不建立 django_session 記錄"""
+        client, token = self._login('token_user')
+        self.assertTrue(token)
+        self.assertIn('cf_auth', client.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+        # cookie 方式
+        response = client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['profile']['username'], 'token_user')
+
+    def test_bearer_token_skips_session_and_user_queries(self):
+        """測試用例：Bearer 憑證認證不查詢 django_session 與 auth_user"""
+        _, token = self._login('bearer_user')
+        bearer_client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = bearer_client.get('/api/history/')
+        self.assertEqual(response.status_code, 200)
+
+        tables_touched = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('django_session', tables_touched)
+        self.assertNotIn('"auth_user"', tables_touched)
+
+    def test_relogin_revokes_previous_token(self):
+        """測試用例：在新裝置登入後，舊裝置的憑證失效（單一會話策略）"""
+        client1, token1 = self._login('revoke_user')
+        client2, token2 = self._login('revoke_user')
+        self.assertNotEqual(token1, token2)
+
+        self.assertEqual(client1.get('/api/profile/').status_code, 401)
+        self.assertEqual(client2.get('/api/profile/').status_code, 200)
+        self.assertEqual(PlayerProfile.objects.get(user__username='revoke_user').auth_epoch, 1)
+
+    def test_logout_revokes_token(self):
+        """測試用例：登出後憑證失效"""
+        client, token = self._login('logout_token_user')
+        response = client.post('/api/logout/')
+        self.assertEqual(response.status_code, 200)
+
+        bearer_client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(bearer_client.get('/api/profile/').status_code, 401)
+
+    def test_tampered_token_rejected(self):
+        """測試用例：被竄改的憑證無法通過驗證"""
+        _, token = self._login('tamper_user')
+        tampered = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+        bearer_client = Client(HTTP_AUTHORIZATION=f'Bearer {tampered}')
+        self.assertEqual(bearer_client.get('/api/profile/').status_code, 401)
+
+    def test_admin_uses_session_with_token_cookie(self):
+        """測試用例：同時帶有遊戲憑證的管理員仍以 session 登入後台（憑證只用於遊戲 API）"""
+        client, token = self._login('staff_user')
+        admin = User.objects.get(username='staff_user')
+        admin.is_staff = True
+        admin.is_superuser = True
+        admin.save()
+        client.force_login(admin)
+
+        response = client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        response = client.get('/api/profile/')
+        self.assertEqual(json.loads(response.content)['profile']['username'], 'staff_user')
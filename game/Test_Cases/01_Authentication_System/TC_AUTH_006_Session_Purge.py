@@ -0,0 +1,80 @@
+"""
+認證系統測試 - 過期 Session 清除命令
+TC_AUTH_006: purge_expired_sessions 分批刪除、試運行與檢查點續跑測試
+"""
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+import tempfile
+from game.models import UserSession
+
+
+class SessionPurgeTestCase(TestCase):
+    """過期 Session 清除命令測試類"""
+
+    def setUp(self):
+        """測試前準備：建立 25 個過期與 5 個有效的 session"""
+        self.user = User.objects.create_user(username='purge_user')
+        now = timezone.now()
+        sessions = []
+        for i in range(25):
+            sessions.append(Session(
+                session_key=f'expired{i:033d}',
+                session_data='',
+                expire_date=now - timedelta(days=1),
+            ))
+        for i in range(5):
+            sessions.append(Session(
+                session_key=f'active{i:034d}',
+                session_data='',
+                expire_date=now + timedelta(days=1),
+            ))
+        Session.objects.bulk_create(sessions)
+        UserSession.objects.create(user=self.user, session_key='expired' + '0' * 33)
+
+    def test_purge_deletes_only_expired_sessions(self):
+        """測試用例：只刪除過期 session 與其索引記錄"""
+        out = StringIO()
+        call_command('purge_expired_sessions', chunk_size=10, stdout=out)
+
+        self.assertEqual(Session.objects.count(), 5)
+        self.assertFalse(Session.objects.filter(expire_date__lt=timezone.now()).exists())
+        self.assertFalse(UserSession.objects.exists())
+        self.assertIn('已刪除 25 筆', out.getvalue())
+        self.assertIn('筆/秒', out.getvalue())
+
+    def test_dry_run_deletes_nothing(self):
+        """測試用例：試運行模式不刪除任何資料"""
+        out = StringIO()
+        call_command('purge_expired_sessions', dry_run=True, stdout=out)
+
+        self.assertEqual(Session.objects.count(), 30)
+        self.assertIn('將刪除 25 筆', out.getvalue())
+
+    def test_time_budget_resumes_from_checkpoint(self):
+        """測試用例：時間預算用完後保留檢查點，再次執行從檢查點續跑"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'purge.json')
+
+            # 極小的時間預算：處理第一批後即停止
+            call_command(
+                'purge_expired_sessions', chunk_size=10, time_budget=1e-9,
+                checkpoint=checkpoint, stdout=StringIO()
+            )
+            self.assertEqual(Session.objects.count(), 20)
+            with open(checkpoint, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['last_session_key'], f'expired{9:033d}')
+
+            # 續跑直到完成，完成後刪除檢查點
+            call_command(
+                'purge_expired_sessions', chunk_size=10,
+                checkpoint=checkpoint, stdout=StringIO()
+            )
+            self.assertEqual(Session.objects.count(), 5)
+            self.assertFalse(os.path.exists(checkpoint))
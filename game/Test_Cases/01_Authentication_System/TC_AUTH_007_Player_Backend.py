@@ -0,0 +1,75 @@
+"""
+認證系統測試 - 玩家資料認證後端
+TC_AUTH_007: PlayerModelBackend 載入 session 用戶時以 JOIN 一併取得玩家資料，
+其他行為（後台登入、權限、停用帳號、舊 session）與 ModelBackend 相同
+"""
+from django.test import TestCase, Client
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from game.backends import PlayerModelBackend
+from game.models import PlayerProfile
+from game.views import loaded_profile
+
+
+class PlayerBackendTestCase(TestCase):
+    """玩家資料認證後端測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.backend = PlayerModelBackend()
+        self.player = User.objects.create_user(username='backend_player')
+        self.profile = PlayerProfile.objects.create(user=self.player, coins=42)
+        self.admin = User.objects.create_superuser(username='backend_admin', password='admin-pass-123')
+
+    def test_get_user_matches_model_backend(self):
+        """測試用例：get_user 的結果與 ModelBackend 相同（沒有玩家資料、停用帳號、不存在的用戶）"""
+        inactive = User.objects.create_user(username='backend_inactive', is_active=False)
+        for user_id in (self.player.id, self.admin.id, inactive.id, 999999):
+            self.assertEqual(self.backend.get_user(user_id), ModelBackend().get_user(user_id), user_id)
+
+    def test_get_user_joins_profile(self):
+        """測試用例：get_user 以一個查詢載入用戶與玩家資料，沒有玩家資料的用戶（管理員）不受影響"""
+        with CaptureQueriesContext(connection) as ctx:
+            user = self.backend.get_user(self.player.id)
+            self.assertEqual(loaded_profile(user).coins, 42)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        admin = self.backend.get_user(self.admin.id)
+        self.assertIsNone(loaded_profile(admin))
+        self.assertTrue(admin.is_superuser)
+
+    def test_permissions_unchanged(self):
+        """測試用例：權限判斷與 ModelBackend 相同"""
+        staff = User.objects.create_user(username='backend_staff', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='change_shopitem'))
+        staff = self.backend.get_user(staff.id)
+        self.assertTrue(self.backend.has_perm(staff, 'game.change_shopitem'))
+        self.assertFalse(self.backend.has_perm(staff, 'game.delete_shopitem'))
+        self.assertEqual(
+            self.backend.get_all_permissions(staff), ModelBackend().get_all_permissions(staff)
+        )
+
+    def test_admin_password_login(self):
+        """測試用例：後台以密碼登入，登入後可以瀏覽後台；錯誤的密碼仍被拒絕"""
+        client = Client()
+        response = client.post('/admin/login/?next=/admin/', {
+            'username': 'backend_admin', 'password': 'wrong-pass',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(SESSION_KEY, client.session)
+
+        response = client.post('/admin/login/?next=/admin/', {
+            'username': 'backend_admin', 'password': 'admin-pass-123',
+        })
+        self.assertRedirects(response, '/admin/')
+        self.assertEqual(client.session[BACKEND_SESSION_KEY], 'game.backends.PlayerModelBackend')
+        self.assertEqual(client.get('/admin/').status_code, 200)
+
+    def test_model_backend_sessions_still_valid(self):
+        """測試用例：以 ModelBackend 建立的 session（切換後端前登入）仍然有效"""
+        client = Client()
+        client.force_login(self.admin, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(client.get('/admin/').status_code, 200)
@@ -6,10 +6,18 @@
 from .TC_AUTH_001_Login_Register import LoginRegisterTestCase
 from .TC_AUTH_002_Session_Management import SessionManagementTestCase
 from .TC_AUTH_003_Validation_Unit import ValidationUnitTestCase
+from .TC_AUTH_004_Session_Write_Coalescing import SessionWriteCoalescingTestCase
+from .TC_AUTH_005_Stateless_Token import StatelessTokenTestCase
+from .TC_AUTH_006_Session_Purge import SessionPurgeTestCase
+from .TC_AUTH_007_Player_Backend import PlayerBackendTestCase
 
 __all__ = [
     'LoginRegisterTestCase',
     'SessionManagementTestCase',
     'ValidationUnitTestCase',
+    'SessionWriteCoalescingTestCase',
+    'StatelessTokenTestCase',
+    'SessionPurgeTestCase',
+    'PlayerBackendTestCase',
 ]
 
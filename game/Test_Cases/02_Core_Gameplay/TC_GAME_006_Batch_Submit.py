@@ -0,0 +1,114 @@
+"""
+核心遊戲玩法測試 - 批量提交遊戲結果
+TC_GAME_006: 離線佇列中的多局以單一請求、單一交易提交，返回每一局的結果
+"""
+from django.test import TestCase, Client
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+from game.models import Achievement, GameSession, PlayerAchievement, PlayerProfile
+
+
+class BatchSubmitTestCase(TestCase):
+    """批量提交遊戲結果測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.client = Client()
+        self.username = 'batch_user'
+        self.base_url = '/api/submit-games/'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+
+    def _post(self, rounds, client=None):
+        """輔助方法：提交批量結果"""
+        return (client or self.client).post(
+            self.base_url,
+            data=json.dumps({'rounds': rounds}),
+            content_type='application/json'
+        )
+
+    def test_batch_applied_in_one_insert_and_one_update(self):
+        """測試用例：多局以一次 INSERT 與一次玩家資料 UPDATE 寫入"""
+        rounds = [
+            {'client_id': 'r1', 'clicks': 30, 'game_duration': 10.0},
+            {'client_id': 'r2', 'clicks': 80, 'game_duration': 10.0},
+            {'client_id': 'r3', 'clicks': 40, 'game_duration': 20.0},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post(rounds)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+
+        self.assertEqual([r['client_id'] for r in data['results']], ['r1', 'r2', 'r3'])
+        self.assertTrue(all(r['status'] == 'applied' for r in data['results']))
+        # 第三局延長時間：20 基礎點擊 + 20 延長點擊 × 2
+        self.assertEqual(data['results'][2]['coins_earned'], 60)
+        self.assertEqual(data['coins_earned'], 30 + 80 + 60)
+
+        statements = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "game_gamesession"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE "game_playerprofile"')]), 1)
+
+        profile = PlayerProfile.objects.get(user__username=self.username)
+        self.assertEqual(profile.total_games_played, 3)
+        self.assertEqual(profile.total_clicks, 150)
+        self.assertEqual(profile.best_clicks_per_round, 80)
+        self.assertEqual(profile.coins, 170)
+        self.assertEqual(data['profile']['coins'], 170)
+        self.assertEqual(GameSession.objects.filter(user__username=self.username).count(), 3)
+        self.assertEqual(len(data['history']), 3)
+
+    def test_achievements_evaluated_once_on_final_values(self):
+        """測試用例：成就依批量後的數值判斷一次，獎勵只發放一次"""
+        Achievement.objects.create(
+            name='單局80', description='', achievement_type='single_round',
+            target_value=80, reward_coins=10
+        )
+        Achievement.objects.create(
+            name='三局', description='', achievement_type='total_games',
+            target_value=3, reward_coins=5
+        )
+        rounds = [
+            {'client_id': f'r{i}', 'clicks': clicks, 'game_duration': 10.0}
+            for i, clicks in enumerate([10, 90, 20])
+        ]
+        data = json.loads(self._post(rounds).content)
+
+        self.assertEqual(sorted(a['name'] for a in data['new_achievements']), ['三局', '單局80'])
+        self.assertEqual(PlayerAchievement.objects.filter(user__username=self.username).count(), 2)
+        self.assertEqual(data['profile']['coins'], 120 + 15)
+
+    def test_invalid_rounds_rejected_individually(self):
+        """測試用例：無效的局個別拒絕，其他局照常寫入"""
+        rounds = [
+            {'client_id': 'ok', 'clicks': 10},
+            {'client_id': 'negative', 'clicks': -1},
+            {'client_id': 'bad_duration', 'clicks': 10, 'game_duration': 0},
+        ]
+        response = self._post(rounds)
+        self.assertEqual(response.status_code, 200)
+        statuses = {r['client_id']: r['status'] for r in json.loads(response.content)['results']}
+        self.assertEqual(statuses, {'ok': 'applied', 'negative': 'rejected', 'bad_duration': 'rejected'})
+        self.assertEqual(GameSession.objects.filter(user__username=self.username).count(), 1)
+
+        # 全部無效時不寫入任何資料
+        response = self._post([{'client_id': 'x', 'clicks': 'abc'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['results'][0]['status'], 'rejected')
+
+    def test_malformed_batches(self):
+        """測試用例：格式錯誤的批量請求"""
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post([{'clicks': 10}]).status_code, 400)
+        self.assertEqual(self._post([
+            {'client_id': 'dup', 'clicks': 1}, {'client_id': 'dup', 'clicks': 2}
+        ]).status_code, 400)
+        too_many = [{'client_id': str(i), 'clicks': 1} for i in range(51)]
+        self.assertEqual(self._post(too_many).status_code, 400)
+        self.assertFalse(GameSession.objects.exists())
+
+        self.assertEqual(self._post([{'client_id': 'a', 'clicks': 1}], client=Client()).status_code, 401)
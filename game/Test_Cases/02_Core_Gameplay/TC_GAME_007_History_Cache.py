@@ -0,0 +1,129 @@
+"""
+核心遊戲玩法測試 - 最近遊戲記錄快取
+TC_GAME_007: 提交後更新玩家的記錄快取，快取長度內的歷史記錄查詢不讀取遊戲記錄表
+"""
+from django.test import TransactionTestCase, Client, override_settings
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+import json
+from game.history_cache import get_cached_history
+from game.models import GameSession, PlayerProfile
+from game.views import record_game_result
+
+
+@override_settings(GAME_HISTORY_CACHE_SIZE=5)
+class HistoryCacheTestCase(TransactionTestCase):
+    """最近遊戲記錄快取測試類（使用自動提交，交易提交後的快取更新立即執行）"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.username = 'history_cache_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+
+    def _submit(self, clicks):
+        """輔助方法：提交遊戲"""
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _history(self, limit):
+        response = self.client.get(f'/api/history/?limit={limit}')
+        self.assertEqual(response.status_code, 200)
+        return [h['clicks'] for h in json.loads(response.content)['history']]
+
+    @staticmethod
+    def _game_queries(ctx):
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if 'game_gamesession' in q['sql'] or 'game_playerprofile' in q['sql']
+        ]
+
+    def test_history_served_from_cache_after_submit(self):
+        """測試用例：提交後的歷史記錄查詢不讀取遊戲記錄，玩家資料只讀取版本（ETag）"""
+        for clicks in (1, 2, 3):
+            self._submit(clicks)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._history(10), [3, 2, 1])
+        queries = self._game_queries(ctx)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"data_version"', queries[0])
+        self.assertNotIn('game_gamesession', queries[0])
+
+        # 提交返回的歷史記錄同樣來自快取
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._submit(4)
+        self.assertEqual([h['clicks'] for h in data['history']], [4, 3, 2, 1])
+        selects = [sql for sql in self._game_queries(ctx) if sql.startswith('SELECT') and 'game_gamesession' in sql]
+        self.assertEqual(selects, [])
+
+    def test_ring_buffer_bounded_and_falls_back_beyond_size(self):
+        """測試用例：快取只保留最新 N 筆，超出長度的查詢改用資料庫"""
+        for clicks in range(1, 8):
+            self._submit(clicks)
+        self.assertEqual([h['clicks'] for h in get_cached_history(self.user.id, 5)], [7, 6, 5, 4, 3])
+        self.assertIsNone(get_cached_history(self.user.id, 6))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._history(7), [7, 6, 5, 4, 3, 2, 1])
+        self.assertTrue(any('game_gamesession' in sql for sql in self._game_queries(ctx)))
+
+    def test_rollback_does_not_update_cache(self):
+        """測試用例：回滾的提交不會進入快取"""
+        self._submit(1)
+        self._history(10)
+        try:
+            with transaction.atomic():
+                record_game_result(self.user, 99, 10.0, 99)
+                raise RuntimeError('rollback')
+        except RuntimeError:
+            pass
+        self.assertEqual([h['clicks'] for h in get_cached_history(self.user.id, 5)], [1])
+
+    def test_missed_update_invalidates_cache(self):
+        """測試用例：局數不連續（其他程序的提交未更新快取）時刪除快取並重建"""
+        self._submit(1)
+        self._history(10)
+        # 模擬另一個程序的提交：寫入資料庫，但沒有更新這個快取
+        GameSession.objects.create(user=self.user, clicks=50)
+        PlayerProfile.objects.filter(user=self.user).update(total_games_played=2)
+
+        # 提交時偵測到局數不連續而刪除快取，提交回應由資料庫重建
+        data = self._submit(3)
+        self.assertEqual([h['clicks'] for h in data['history']], [3, 50, 1])
+        self.assertEqual([h['clicks'] for h in get_cached_history(self.user.id, 5)], [3, 50, 1])
+
+    def test_admin_changes_invalidate_cache(self):
+        """測試用例：後台刪除遊戲記錄後快取失效"""
+        self._submit(1)
+        self._submit(2)
+        self._history(10)
+        admin = site._registry[GameSession]
+        request = RequestFactory().post('/admin/')
+        with transaction.atomic():
+            admin.delete_queryset(request, GameSession.objects.filter(user=self.user, clicks=2))
+        self.assertIsNone(get_cached_history(self.user.id, 1))
+        self.assertEqual(self._history(10), [1])
+
+    def test_deleted_user_cache_removed(self):
+        """測試用例：刪除用戶後移除該用戶的快取"""
+        self._submit(1)
+        self._history(10)
+        user_id = self.user.id
+        self.user.delete()
+        self.assertIsNone(get_cached_history(user_id, 1))
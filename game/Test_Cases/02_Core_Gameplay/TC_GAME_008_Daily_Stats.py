@@ -0,0 +1,143 @@
+"""
+核心遊戲玩法測試 - 玩家每日統計
+TC_GAME_008: 提交遊戲時以 upsert 累加每日統計，backfill_daily_stats 由既有遊戲記錄分批重建
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+import json
+import os
+import tempfile
+from game.daily_stats import daily_stats, summarize_stats, utc_day
+from game.models import GameSession, PlayerDailyStats
+
+
+class DailyStatsTestCase(TestCase):
+    """玩家每日統計測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.client = Client()
+        self.username = 'daily_stats_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+
+    def _submit(self, clicks, game_duration=10.0):
+        """輔助方法：提交遊戲"""
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': game_duration}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_submit_upserts_daily_row(self):
+        """測試用例：每次提交以一個 upsert 語句累加當天的統計"""
+        self._submit(30)
+        with CaptureQueriesContext(connection) as ctx:
+            self._submit(50, game_duration=20.0)
+        upserts = [q['sql'] for q in ctx.captured_queries if 'game_playerdailystats' in q['sql']]
+        self.assertEqual(len(upserts), 1)
+        self.assertIn('ON CONFLICT', upserts[0])
+
+        stats = PlayerDailyStats.objects.get(user=self.user)
+        self.assertEqual(stats.day, utc_day(timezone.now()))
+        self.assertEqual(stats.games_played, 2)
+        self.assertEqual(stats.total_clicks, 80)
+        self.assertEqual(stats.best_clicks, 50)
+        self.assertEqual(stats.total_duration, 30.0)
+        # 延長時間：第二局 50 點擊中 25 為延長點擊（× 2）
+        self.assertEqual(stats.coins_earned, 30 + 75)
+
+    def test_batch_submit_counts_every_round(self):
+        """測試用例：批量提交的多局累加到同一天的一列"""
+        self.client.post(
+            '/api/submit-games/',
+            data=json.dumps({'rounds': [
+                {'client_id': 'a', 'clicks': 10},
+                {'client_id': 'b', 'clicks': 40},
+            ]}),
+            content_type='application/json'
+        )
+        stats = PlayerDailyStats.objects.get(user=self.user)
+        self.assertEqual((stats.games_played, stats.total_clicks, stats.best_clicks), (2, 50, 40))
+
+    def test_daily_and_weekly_queries(self):
+        """測試用例：依日期範圍讀取每日統計與合計"""
+        today = utc_day(timezone.now())
+        PlayerDailyStats.objects.bulk_create([
+            PlayerDailyStats(
+                user=self.user, day=today - timedelta(days=offset),
+                games_played=offset + 1, total_clicks=10 * (offset + 1),
+                coins_earned=offset, best_clicks=offset * 3, total_duration=10.0,
+            )
+            for offset in range(10)
+        ])
+        week = daily_stats(self.user.id, today - timedelta(days=6), today)
+        self.assertEqual(len(week), 7)
+        self.assertEqual(week[-1]['day'], today)
+
+        summary = summarize_stats(self.user.id, today - timedelta(days=6), today)
+        self.assertEqual(summary['games_played'], sum(range(1, 8)))
+        self.assertEqual(summary['best_clicks'], 18)
+        self.assertEqual(summarize_stats(self.user.id, today + timedelta(days=1), today + timedelta(days=7))['games_played'], 0)
+
+
+class BackfillDailyStatsTestCase(TestCase):
+    """每日統計重建命令測試類"""
+
+    def setUp(self):
+        """測試前準備：兩個用戶跨越兩個 UTC 日期的遊戲記錄"""
+        self.users = [User.objects.create_user(username=f'backfill_{i}') for i in range(3)]
+        day_one = datetime(2026, 3, 1, 23, 30, tzinfo=dt_timezone.utc)
+        day_two = day_one + timedelta(hours=1)
+        GameSession.objects.bulk_create([
+            GameSession(user=self.users[0], clicks=10, coins_earned=10, game_duration=10.0, played_at=day_one),
+            GameSession(user=self.users[0], clicks=30, coins_earned=30, game_duration=10.0, played_at=day_one),
+            GameSession(user=self.users[0], clicks=20, coins_earned=20, game_duration=15.0, played_at=day_two),
+            GameSession(user=self.users[1], clicks=5, coins_earned=5, game_duration=10.0, played_at=day_two),
+        ])
+        self.day_one = day_one.date()
+        self.day_two = day_two.date()
+
+    def test_backfill_builds_rows(self):
+        """測試用例：依 UTC 日期彙總，重複執行結果相同"""
+        out = StringIO()
+        call_command('backfill_daily_stats', chunk_size=2, stdout=out)
+        call_command('backfill_daily_stats', stdout=StringIO())
+
+        rows = {
+            (s.user_id, s.day): (s.games_played, s.total_clicks, s.coins_earned, s.best_clicks, s.total_duration)
+            for s in PlayerDailyStats.objects.all()
+        }
+        self.assertEqual(rows, {
+            (self.users[0].id, self.day_one): (2, 40, 40, 30, 20.0),
+            (self.users[0].id, self.day_two): (1, 20, 20, 20, 15.0),
+            (self.users[1].id, self.day_two): (1, 5, 5, 5, 10.0),
+        })
+        self.assertIn('已寫入 3 筆', out.getvalue())
+
+    def test_dry_run_and_checkpoint_resume(self):
+        """測試用例：試運行不寫入；從檢查點續跑只處理之後的用戶"""
+        call_command('backfill_daily_stats', dry_run=True, stdout=StringIO())
+        self.assertFalse(PlayerDailyStats.objects.exists())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'daily.json')
+            with open(checkpoint, 'w', encoding='utf-8') as f:
+                json.dump({'last_user_id': self.users[0].id}, f)
+            call_command('backfill_daily_stats', checkpoint=checkpoint, stdout=StringIO())
+            self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(
+            list(PlayerDailyStats.objects.values_list('user_id', flat=True)),
+            [self.users[1].id]
+        )
@@ -7,11 +7,20 @@ from .TC_GAME_001_Game_Flow import GameFlowTestCase
 from .TC_GAME_002_Coin_Calculation import CoinCalculationTestCase
 from .TC_GAME_003_Record_Update import RecordUpdateTestCase
 from .TC_GAME_004_Game_History import GameHistoryTestCase
+from .TC_GAME_005_Atomic_Counters import AtomicCountersTestCase
+from .TC_GAME_006_Batch_Submit import BatchSubmitTestCase
+from .TC_GAME_007_History_Cache import HistoryCacheTestCase
+from .TC_GAME_008_Daily_Stats import DailyStatsTestCase, BackfillDailyStatsTestCase
 
 __all__ = [
     'GameFlowTestCase',
     'CoinCalculationTestCase',
     'RecordUpdateTestCase',
     'GameHistoryTestCase',
+    'AtomicCountersTestCase',
+    'BatchSubmitTestCase',
+    'HistoryCacheTestCase',
+    'DailyStatsTestCase',
+    'BackfillDailyStatsTestCase',
 ]
 
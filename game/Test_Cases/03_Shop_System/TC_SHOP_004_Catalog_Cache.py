@@ -0,0 +1,129 @@
+"""
+商店系統測試 - 商店物品與成就目錄快取
+TC_SHOP_004: 目錄載入後各個 API 不再查詢 ShopItem / Achievement，修改時依版本戳記失效
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+from game.catalog import CATALOG_VERSION_KEY, get_catalog
+from game.models import Achievement, PlayerAchievement, PlayerProfile, ShopItem
+
+
+class CatalogCacheTestCase(TestCase):
+    """目錄快取測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.username = 'catalog_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+        PlayerProfile.objects.filter(user=self.user).update(coins=10000)
+
+        self.time_item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=50, effect_value=2.0, max_level=10
+        )
+        self.pet_item = ShopItem.objects.create(
+            name='寵物夥伴', item_type='extra_button', description='',
+            base_price=100, effect_value=1.0, max_level=5
+        )
+        self.pet_skill_item = ShopItem.objects.create(
+            name='寵物能力', item_type='auto_clicker', description='',
+            base_price=200, effect_value=5.0, max_level=10
+        )
+        self.achievement = Achievement.objects.create(
+            name='初出茅廬', description='', achievement_type='total_clicks',
+            target_value=10, reward_coins=5
+        )
+
+    @staticmethod
+    def _catalog_queries(ctx):
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if '"game_shopitem"' in q['sql'] or '"game_achievement"' in q['sql']
+        ]
+
+    def _post(self, url, payload):
+        return self.client.post(url, data=json.dumps(payload), content_type='application/json')
+
+    def test_views_issue_no_catalog_queries(self):
+        """測試用例：目錄載入後，商店、購買、成就、玩家資料、徽章與提交都不查詢目錄表"""
+        get_catalog()
+        with CaptureQueriesContext(connection) as ctx:
+            shop = json.loads(self.client.get('/api/shop/').content)
+            self.assertEqual(self._post('/api/purchase/', {'item_id': self.pet_item.id}).status_code, 200)
+            self.assertEqual(self._post('/api/purchase/', {'item_id': self.pet_skill_item.id}).status_code, 200)
+            submit = json.loads(self._post('/api/submit-game/', {'clicks': 20, 'game_duration': 10.0}).content)
+            achievements = json.loads(self.client.get('/api/achievements/').content)
+            badges = self._post('/api/update-badges/', {'badge_1_id': self.achievement.id})
+            profile = json.loads(self.client.get('/api/profile/').content)
+        self.assertEqual(self._catalog_queries(ctx), [])
+
+        self.assertEqual([item['type'] for item in shop['items']], ['time_extension', 'extra_button', 'auto_clicker'])
+        self.assertEqual([a['name'] for a in submit['new_achievements']], ['初出茅廬'])
+        self.assertTrue(achievements['achievements'][0]['unlocked'])
+        self.assertEqual(badges.status_code, 200)
+        self.assertEqual(profile['badges'][0]['name'], '初出茅廬')
+        # 購買寵物夥伴時自動附加的寵物能力 + 一次升級
+        self.assertEqual(profile['purchases']['auto_clicker']['level'], 2)
+        self.assertEqual(profile['purchases']['extra_button']['effect_value'], 1.0)
+
+    def test_unknown_ids_use_catalog(self):
+        """測試用例：不存在的物品與成就由目錄判斷"""
+        get_catalog()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post('/api/purchase/', {'item_id': 99999})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self._catalog_queries(ctx), [])
+
+        PlayerAchievement.objects.create(user=self.user, achievement=self.achievement)
+        self.assertEqual(self._post('/api/update-badges/', {'badge_1_id': 99999}).status_code, 400)
+
+    def test_save_and_delete_invalidate_catalog(self):
+        """測試用例：修改或刪除物品後目錄立即更新"""
+        catalog = get_catalog()
+        self.time_item.base_price = 70
+        self.time_item.save()
+        self.assertIsNot(get_catalog(), catalog)
+        self.assertEqual(get_catalog().shop_item(self.time_item.id).base_price, 70)
+
+        self.achievement.delete()
+        self.assertIsNone(get_catalog().achievement(self.achievement.id))
+        items = json.loads(self.client.get('/api/shop/').content)['items']
+        self.assertEqual(items[0]['next_level_price'], 70)
+
+    def test_version_stamp_reloads_catalog(self):
+        """測試用例：其他程序更新版本戳記後重新載入；版本不變時重複使用"""
+        catalog = get_catalog()
+        self.assertIs(get_catalog(), catalog)
+
+        ShopItem.objects.filter(id=self.time_item.id).update(name='新名稱')  # 不發送信號
+        self.assertEqual(get_catalog().shop_item(self.time_item.id).name, '時間延長')
+        cache.set(CATALOG_VERSION_KEY, 'other-process')
+        self.assertEqual(get_catalog().shop_item(self.time_item.id).name, '新名稱')
+
+    @override_settings(GAME_CATALOG_TTL=0)
+    def test_ttl_bounds_staleness(self):
+        """測試用例：版本戳記無法傳遞時，超過 TTL 後重新載入"""
+        catalog = get_catalog()
+        self.assertIsNot(get_catalog(), catalog)
+
+    def test_lookups_are_immutable(self):
+        """測試用例：目錄的查詢表不可修改"""
+        catalog = get_catalog()
+        self.assertEqual(catalog.shop_item_of_type('extra_button').id, self.pet_item.id)
+        self.assertEqual([a.id for a in catalog.achievements_by_type['total_clicks']], [self.achievement.id])
+        with self.assertRaises(TypeError):
+            catalog.shop_items_by_id[0] = None
+        with self.assertRaises(AttributeError):
+            catalog.shop_item(self.time_item.id).base_price = 1
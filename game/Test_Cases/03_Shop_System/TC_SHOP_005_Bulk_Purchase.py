@@ -0,0 +1,135 @@
+"""
+商店系統測試 - 多級購買
+TC_SHOP_005: levels / target_level 一次升級多級，總價以等差數列公式計算並在一個交易內套用
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.cache import cache
+import json
+from game.models import PlayerProfile, PlayerPurchase, ShopItem
+from game.pricing import cumulative_price, level_price
+
+
+class BulkPurchaseTestCase(TestCase):
+    """多級購買測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.username = 'bulk_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+        self._set_coins(10000)
+        self.item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=50, effect_value=2.0, max_level=10
+        )
+
+    def _set_coins(self, coins):
+        PlayerProfile.objects.filter(user=self.user).update(coins=coins)
+
+    def _purchase(self, **payload):
+        response = self.client.post(
+            '/api/purchase/',
+            data=json.dumps({'item_id': self.item.id, **payload}),
+            content_type='application/json'
+        )
+        return response.status_code, json.loads(response.content)
+
+    def _level(self):
+        purchase = PlayerPurchase.objects.filter(user=self.user, shop_item=self.item).first()
+        return purchase.level if purchase else 0
+
+    def test_cumulative_price_matches_per_level_sum(self):
+        """測試用例：公式計算的總價等於逐級累加"""
+        for base_price in (0, 1, 50, 300):
+            for start in range(0, 12):
+                for end in range(start, 12):
+                    expected = sum(level_price(base_price, level) for level in range(start, end))
+                    self.assertEqual(cumulative_price(base_price, start, end), expected)
+        self.assertEqual(cumulative_price(50, 5, 3), 0)
+
+    def test_max_out_in_one_request(self):
+        """測試用例：一次請求升到最高等級，只扣款一次"""
+        status, data = self._purchase(target_level=10)
+        self.assertEqual(status, 200)
+        total = 50 * (1 + 2 + 3 + 4 + 5 + 6 + 7 + 8 + 9 + 10)
+        self.assertEqual(data['new_level'], 10)
+        self.assertEqual(data['levels_purchased'], 10)
+        self.assertEqual(data['total_price'], total)
+        self.assertEqual(data['coins_remaining'], 10000 - total)
+        self.assertFalse(data['can_upgrade'])
+        self.assertIsNone(data['max_out_price'])
+        self.assertEqual(self._level(), 10)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).coins, 10000 - total)
+
+    def test_levels_from_current_level(self):
+        """測試用例：levels 從目前等級往上升級，價格從目前等級開始計算"""
+        self._purchase()
+        status, data = self._purchase(levels=3)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['new_level'], 4)
+        self.assertEqual(data['total_price'], 50 * (2 + 3 + 4))
+        self.assertEqual(data['next_level_price'], 250)
+        self.assertEqual(data['max_out_price'], cumulative_price(50, 4, 10))
+
+        items = json.loads(self.client.get('/api/shop/').content)['items']
+        self.assertEqual(items[0]['current_level'], 4)
+        self.assertEqual(items[0]['max_out_price'], cumulative_price(50, 4, 10))
+
+    def test_insufficient_coins_changes_nothing(self):
+        """測試用例：金幣不足以支付總價時不升級任何一級"""
+        self._set_coins(50 * 5)
+        status, data = self._purchase(levels=3)
+        self.assertEqual(status, 400)
+        self.assertEqual(data['required_coins'], 50 * 6)
+        self.assertEqual(self._level(), 0)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).coins, 50 * 5)
+
+    def test_invalid_levels_rejected(self):
+        """測試用例：超過最高等級、不大於目前等級或格式錯誤時返回 400"""
+        self._purchase(levels=2)
+        cases = [
+            {'target_level': 11},
+            {'levels': 9},
+            {'target_level': 2},
+            {'levels': 0},
+            {'levels': -1},
+            {'levels': 1.5},
+            {'levels': True},
+            {'levels': 'abc'},
+            {'levels': 1, 'target_level': 3},
+        ]
+        for payload in cases:
+            status, data = self._purchase(**payload)
+            self.assertEqual(status, 400, payload)
+            self.assertIn('error', data)
+        self.assertEqual(self._level(), 2)
+
+        status, data = self._purchase(levels='2')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['new_level'], 4)
+
+    def test_first_pet_purchase_attaches_skill(self):
+        """測試用例：一次購買多級寵物夥伴時仍自動附加1等級的寵物夥伴能力"""
+        pet = ShopItem.objects.create(
+            name='寵物夥伴', item_type='extra_button', description='',
+            base_price=100, effect_value=1.0, max_level=5
+        )
+        skill = ShopItem.objects.create(
+            name='寵物能力', item_type='auto_clicker', description='',
+            base_price=200, effect_value=5.0, max_level=10
+        )
+        response = self.client.post(
+            '/api/purchase/',
+            data=json.dumps({'item_id': pet.id, 'target_level': 3}),
+            content_type='application/json'
+        )
+        self.assertEqual(json.loads(response.content)['new_level'], 3)
+        self.assertEqual(PlayerPurchase.objects.get(user=self.user, shop_item=skill).level, 1)
@@ -0,0 +1,217 @@
+"""
+商店系統測試 - 樂觀並發購買
+TC_SHOP_006: 條件式扣款 + 等級比較並交換，不鎖定玩家資料；衝突時重試，重試用盡後退回鎖定流程
+"""
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import mock, skipUnless
+import json
+import threading
+from game import purchases
+from game.models import PlayerProfile, PlayerPurchase, ShopItem
+
+
+class OptimisticPurchaseTestCase(TestCase):
+    """樂觀並發購買測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'cas_user'}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username='cas_user')
+        PlayerProfile.objects.filter(user=self.user).update(coins=1000)
+        self.item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=10, effect_value=2.0, max_level=10
+        )
+
+    def _purchase(self, **payload):
+        response = self.client.post(
+            '/api/purchase/',
+            data=json.dumps({'item_id': self.item.id, **payload}),
+            content_type='application/json'
+        )
+        return response.status_code, json.loads(response.content)
+
+    def _level(self):
+        return PlayerPurchase.objects.get(user=self.user, shop_item=self.item).level
+
+    def _coins(self):
+        return PlayerProfile.objects.get(user=self.user).coins
+
+    def _concurrent_upgrade_after_read(self, times=1):
+        """模擬並發請求：讀取等級之後（扣款之前），另一個請求先升級了一級"""
+        remaining = [times]
+        read_levels = purchases._purchase_levels
+
+        def stale_levels(user, shop_item, related):
+            levels_by_id = read_levels(user, shop_item, related)
+            if remaining[0] > 0:
+                remaining[0] -= 1
+                purchase, created = PlayerPurchase.objects.get_or_create(
+                    user=user, shop_item=self.item, defaults={'level': 1, 'price_paid': 10}
+                )
+                if not created:
+                    PlayerPurchase.objects.filter(pk=purchase.pk).update(level=purchase.level + 1)
+            return levels_by_id
+        return mock.patch.object(purchases, '_purchase_levels', side_effect=stale_levels)
+
+    def test_purchase_does_not_lock_profile(self):
+        """測試用例：購買以條件 UPDATE 扣款並以等級比較並交換，不讀取（鎖定）玩家資料"""
+        self._purchase()
+        with CaptureQueriesContext(connection) as ctx:
+            status, data = self._purchase()
+        self.assertEqual(status, 200)
+        self.assertEqual(data['new_level'], 2)
+        self.assertEqual(data['coins_remaining'], 1000 - 10 - 20)
+
+        statements = [
+            q['sql'] for q in ctx.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        profile_statements = [sql for sql in statements if '"game_playerprofile"' in sql]
+        # 認證後端載入用戶時 JOIN 玩家資料（FROM auth_user），購買本身不讀取玩家資料
+        self.assertFalse(any(
+            sql.startswith('SELECT') and 'FROM "game_playerprofile"' in sql for sql in profile_statements
+        ))
+        self.assertTrue(any('"coins" >=' in sql for sql in profile_statements))
+        purchase_updates = [
+            sql for sql in statements
+            if sql.startswith('UPDATE "game_playerpurchase"')
+        ]
+        self.assertEqual(len(purchase_updates), 1)
+        self.assertIn('"level" = 1', purchase_updates[0])
+
+    def test_level_conflict_retries_with_fresh_price(self):
+        """測試用例：等級被並發修改時回滾扣款，依新的等級重新計算價格"""
+        self._purchase()
+        with self._concurrent_upgrade_after_read():
+            status, data = self._purchase()
+        self.assertEqual(status, 200)
+        # 並發的請求已升到等級 2，這次從等級 2 升到 3（只扣一次 30）
+        self.assertEqual(data['new_level'], 3)
+        self.assertEqual(data['total_price'], 30)
+        self.assertEqual(self._level(), 3)
+        self.assertEqual(self._coins(), 1000 - 10 - 30)
+
+    def test_first_purchase_conflict_retries(self):
+        """測試用例：第一次購買時記錄已被並發建立（唯一約束衝突），重試後升級下一級"""
+        with self._concurrent_upgrade_after_read():
+            status, data = self._purchase()
+        self.assertEqual(status, 200)
+        self.assertEqual(data['new_level'], 2)
+        self.assertEqual(self._coins(), 1000 - 20)
+
+    @override_settings(GAME_PURCHASE_CAS_RETRIES=2)
+    def test_retries_exhausted_falls_back_to_locking(self):
+        """測試用例：重試次數用盡時退回鎖定流程完成購買"""
+        self._purchase()
+        with self._concurrent_upgrade_after_read(times=2), \
+                mock.patch.object(purchases, 'purchase_locked', wraps=purchases.purchase_locked) as locked:
+            status, data = self._purchase()
+        self.assertEqual(status, 200)
+        self.assertEqual(locked.call_count, 1)
+        self.assertEqual(data['new_level'], 4)
+        self.assertEqual(self._coins(), 1000 - 10 - 40)
+
+    @override_settings(GAME_PURCHASE_CAS_RETRIES=0)
+    def test_locking_path_only(self):
+        """測試用例：重試次數為 0 時一律使用鎖定流程，結果相同"""
+        status, data = self._purchase(levels=3)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['new_level'], 3)
+        self.assertEqual(self._coins(), 1000 - 60)
+        status, data = self._purchase()
+        self.assertEqual(data['new_level'], 4)
+
+    def test_insufficient_coins_changes_nothing(self):
+        """測試用例：條件式扣款失敗時返回目前金幣，不修改任何資料"""
+        PlayerProfile.objects.filter(user=self.user).update(coins=15)
+        version = PlayerProfile.objects.get(user=self.user).data_version
+        status, data = self._purchase(levels=2)
+        self.assertEqual(status, 400)
+        self.assertEqual(data['current_coins'], 15)
+        self.assertEqual(data['required_coins'], 30)
+        self.assertFalse(PlayerPurchase.objects.filter(user=self.user).exists())
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).data_version, version)
+
+    def test_coins_credited_after_failed_debit_retries(self):
+        """測試用例：扣款失敗後重新讀取時金幣已足夠（並發的請求增加了金幣），重試而不是拒絕購買"""
+        debit_coins = purchases.debit_coins
+        calls = []
+
+        def debit_before_credit(*args, **kwargs):
+            # 第一次扣款時金幣仍不足，之後並發的請求已增加金幣（目前 1000）
+            calls.append(args)
+            return None if len(calls) == 1 else debit_coins(*args, **kwargs)
+
+        with mock.patch.object(purchases, 'debit_coins', side_effect=debit_before_credit) as debit:
+            status, data = self._purchase()
+        self.assertEqual(status, 200)
+        self.assertEqual(debit.call_count, 2)
+        self.assertEqual(self._level(), 1)
+        self.assertEqual(self._coins(), 1000 - 10)
+
+    def test_missing_profile_uses_locking_path(self):
+        """測試用例：玩家資料不存在（舊帳號）時改用鎖定流程（以 0 金幣建立後判斷）"""
+        PlayerProfile.objects.filter(user=self.user).delete()
+        with mock.patch.object(purchases, 'purchase_locked', wraps=purchases.purchase_locked) as locked:
+            status, data = self._purchase()
+        self.assertEqual(locked.call_count, 1)
+        self.assertEqual(status, 400)
+        self.assertEqual(data['current_coins'], 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', '並發購買測試需要 PostgreSQL')
+class OptimisticPurchaseConcurrencyTestCase(TransactionTestCase):
+    """同一玩家並發購買測試類"""
+
+    WORKERS = 20
+
+    def test_rapid_purchases_do_not_time_out(self):
+        """測試用例：多個執行緒同時購買同一物品，不出現鎖定逾時的 429，金幣與等級一致"""
+        user = User.objects.create_user(username='cas_stress')
+        PlayerProfile.objects.create(user=user, coins=10 ** 9)
+        item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=10, effect_value=2.0, max_level=1000
+        )
+        statuses = []
+        barrier = threading.Barrier(self.WORKERS)
+
+        def worker():
+            client = Client()
+            client.force_login(user)
+            barrier.wait()
+            try:
+                for _ in range(5):
+                    response = client.post(
+                        '/api/purchase/',
+                        data=json.dumps({'item_id': item.id}),
+                        content_type='application/json'
+                    )
+                    statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertNotIn(429, statuses)
+        self.assertEqual(statuses.count(200), len(statuses))
+        level = PlayerPurchase.objects.get(user=user, shop_item=item).level
+        self.assertEqual(level, len(statuses))
+        spent = 10 * level * (level + 1) // 2
+        self.assertEqual(PlayerProfile.objects.get(user=user).coins, 10 ** 9 - spent)
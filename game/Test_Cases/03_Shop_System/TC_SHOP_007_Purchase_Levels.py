@@ -0,0 +1,158 @@
+"""
+商店系統測試 - 玩家資料的購買等級
+TC_SHOP_007: PlayerProfile.purchase_levels 與購買記錄同步，玩家資料與商店讀取不查詢購買記錄
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+import json
+from game.models import PlayerProfile, PlayerPurchase, ShopItem
+
+
+class PurchaseLevelsTestCase(TestCase):
+    """玩家資料購買等級測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.time_item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=10, effect_value=2.0, max_level=10
+        )
+        self.pet = ShopItem.objects.create(
+            name='寵物夥伴', item_type='extra_button', description='',
+            base_price=100, effect_value=1.0, max_level=5
+        )
+        self.skill = ShopItem.objects.create(
+            name='寵物能力', item_type='auto_clicker', description='',
+            base_price=200, effect_value=5.0, max_level=10
+        )
+        self.client = self._login('levels_user')
+        self.user = User.objects.get(username='levels_user')
+        PlayerProfile.objects.filter(user=self.user).update(coins=10000)
+
+    def _login(self, username):
+        client = Client()
+        client.post(
+            '/api/login/',
+            data=json.dumps({'username': username}),
+            content_type='application/json'
+        )
+        return client
+
+    def _purchase(self, item, **payload):
+        response = self.client.post(
+            '/api/purchase/',
+            data=json.dumps({'item_id': item.id, **payload}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)
+
+    def _levels(self, user=None):
+        return PlayerProfile.objects.get(user=user or self.user).purchase_levels
+
+    def _recorded_levels(self, user=None):
+        return {
+            str(shop_item_id): level
+            for shop_item_id, level in PlayerPurchase.objects.filter(user=user or self.user, level__gt=0)
+            .values_list('shop_item_id', 'level')
+        }
+
+    def test_purchase_keeps_levels_in_sync(self):
+        """測試用例：購買（包含自動附加的寵物夥伴能力）同步寫入玩家資料的購買等級"""
+        self._purchase(self.time_item, levels=3)
+        self._purchase(self.pet)
+        self._purchase(self.skill)
+        self.assertEqual(self._levels(), {
+            str(self.time_item.id): 3, str(self.pet.id): 1, str(self.skill.id): 2,
+        })
+        self.assertEqual(self._levels(), self._recorded_levels())
+
+    @override_settings(GAME_PURCHASE_CAS_RETRIES=0)
+    def test_locking_path_keeps_levels_in_sync(self):
+        """測試用例：鎖定流程的購買同樣同步購買等級"""
+        self._purchase(self.pet, target_level=2)
+        self._purchase(self.time_item)
+        self.assertEqual(self._levels(), {
+            str(self.pet.id): 2, str(self.skill.id): 1, str(self.time_item.id): 1,
+        })
+
+    def test_profile_and_shop_read_single_row(self):
+        """測試用例：玩家資料與商店只讀取玩家資料的一列，不查詢購買記錄"""
+        self._purchase(self.time_item, levels=2)
+        self._purchase(self.pet)
+        for url in ('/api/profile/', '/api/shop/'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(
+                any('game_playerpurchase' in q['sql'] for q in ctx.captured_queries), url
+            )
+
+        profile = json.loads(self.client.get('/api/profile/').content)
+        self.assertEqual(profile['purchases']['time_extension']['level'], 2)
+        self.assertEqual(profile['purchases']['extra_button']['level'], 1)
+        self.assertEqual(profile['purchases']['auto_clicker']['level'], 1)
+
+        items = {
+            item['id']: item for item in json.loads(self.client.get('/api/shop/').content)['items']
+        }
+        self.assertEqual(items[self.time_item.id]['current_level'], 2)
+        self.assertEqual(items[self.skill.id]['current_level'], 1)
+        self.assertTrue(items[self.skill.id]['can_upgrade'])
+
+    def test_rollback_endpoints_keep_levels_in_sync(self):
+        """測試用例：回溯單一物品（包含回溯到 0）與回溯全部物品後購買等級一致"""
+        client = self._login('super_test')
+        super_user = User.objects.get(username='super_test')
+        PlayerProfile.objects.filter(user=super_user).update(coins=10000)
+        for item in (self.time_item, self.pet):
+            client.post(
+                '/api/purchase/',
+                data=json.dumps({'item_id': item.id, 'levels': 2}),
+                content_type='application/json'
+            )
+
+        def rollback(item, level):
+            response = client.post(
+                '/api/rollback-shop-level/',
+                data=json.dumps({'item_id': item.id, 'target_level': level}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+
+        rollback(self.time_item, 5)
+        self.assertEqual(self._levels(super_user)[str(self.time_item.id)], 5)
+        rollback(self.pet, 0)
+        self.assertNotIn(str(self.pet.id), self._levels(super_user))
+        self.assertEqual(self._levels(super_user), self._recorded_levels(super_user))
+
+        response = client.post('/api/rollback-all-shop-items/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._levels(super_user), {})
+
+    def test_checker_detects_and_fixes_drift(self):
+        """測試用例：檢查命令列出不一致的玩家，--fix 以購買記錄修正並遞增資料版本"""
+        self._purchase(self.time_item, levels=4)
+        PlayerProfile.objects.filter(user=self.user).update(purchase_levels={str(self.pet.id): 3})
+        version = PlayerProfile.objects.get(user=self.user).data_version
+
+        out = StringIO()
+        call_command('check_purchase_levels', chunk_size=1, stdout=out)
+        self.assertIn('1 位不一致', out.getvalue())
+        self.assertEqual(self._levels(), {str(self.pet.id): 3})
+
+        call_command('check_purchase_levels', fix=True, stdout=StringIO())
+        profile = PlayerProfile.objects.get(user=self.user)
+        self.assertEqual(profile.purchase_levels, {str(self.time_item.id): 4})
+        self.assertEqual(profile.data_version, version + 1)
+
+        out = StringIO()
+        call_command('check_purchase_levels', stdout=out)
+        self.assertIn('全部一致', out.getvalue())
@@ -5,9 +5,18 @@
 
 from .TC_SHOP_001_Item_List import ShopItemListTestCase
 from .TC_SHOP_002_Purchase_Function import PurchaseFunctionTestCase
+from .TC_SHOP_004_Catalog_Cache import CatalogCacheTestCase
+from .TC_SHOP_005_Bulk_Purchase import BulkPurchaseTestCase
+from .TC_SHOP_006_Optimistic_Purchase import OptimisticPurchaseTestCase, OptimisticPurchaseConcurrencyTestCase
+from .TC_SHOP_007_Purchase_Levels import PurchaseLevelsTestCase
 
 __all__ = [
     'ShopItemListTestCase',
     'PurchaseFunctionTestCase',
+    'CatalogCacheTestCase',
+    'BulkPurchaseTestCase',
+    'OptimisticPurchaseTestCase',
+    'OptimisticPurchaseConcurrencyTestCase',
+    'PurchaseLevelsTestCase',
 ]
 
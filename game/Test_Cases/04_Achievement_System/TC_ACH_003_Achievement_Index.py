@@ -0,0 +1,179 @@
+"""
+成就系統測試 - 成就門檻索引
+TC_ACH_003: 編譯後的門檻索引只檢查新跨越的門檻、目錄變更後失效、每次提交成本與成就總數無關
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+import json
+from game.achievements import (
+    AchievementIndex, UnlockState, get_unlock_state, invalidate_achievement_index,
+)
+from game.models import Achievement, PlayerAchievement, PlayerProfile
+
+
+class AchievementIndexTestCase(TestCase):
+    """成就門檻索引測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.client = Client()
+        self.username = 'index_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+
+    def _create(self, achievement_type, target_value, reward_coins=0, name=None):
+        """輔助方法：建立成就"""
+        return Achievement.objects.create(
+            name=name or f'{achievement_type}_{target_value}',
+            description='測試成就',
+            achievement_type=achievement_type,
+            target_value=target_value,
+            reward_coins=reward_coins,
+        )
+
+    def _submit(self, clicks):
+        """輔助方法：提交遊戲並返回回應資料"""
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_unlocks_every_crossed_threshold_once(self):
+        """測試用例：一次跨越多個門檻時全部解鎖，之後不重複解鎖"""
+        self._create('total_clicks', 10, reward_coins=5)
+        self._create('total_clicks', 20, reward_coins=5)
+        self._create('total_clicks', 100, reward_coins=5)
+        self._create('total_games', 2, reward_coins=1)
+
+        data = self._submit(25)
+        self.assertEqual(
+            sorted(a['name'] for a in data['new_achievements']),
+            ['total_clicks_10', 'total_clicks_20']
+        )
+        self.assertEqual(data['profile']['coins'], 25 + 10)
+
+        data = self._submit(5)
+        self.assertEqual([a['name'] for a in data['new_achievements']], ['total_games_2'])
+        self.assertEqual(PlayerAchievement.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).coins, 25 + 10 + 5 + 1)
+
+    def test_warm_submit_skips_achievement_queries(self):
+        """測試用例：索引與玩家狀態已快取時，提交不查詢成就相關資料表"""
+        self._create('single_round', 1000)
+        self._submit(10)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._submit(10)
+        tables_touched = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('"game_achievement"', tables_touched)
+        self.assertNotIn('"game_playerachievement"', tables_touched)
+
+    def test_catalog_change_invalidates_index(self):
+        """測試用例：新增成就後索引重建，已達標的玩家在下一局解鎖"""
+        self._submit(50)
+        self._create('total_clicks', 40, name='後來新增的成就')
+
+        data = self._submit(1)
+        self.assertEqual([a['name'] for a in data['new_achievements']], ['後來新增的成就'])
+
+    def test_deleted_unlock_is_granted_again(self):
+        """測試用例：解鎖記錄被刪除（例如管理員重置）後可再次解鎖"""
+        self._create('single_round', 10, name='單局10')
+        self.assertEqual(len(self._submit(10)['new_achievements']), 1)
+
+        PlayerAchievement.objects.filter(user=self.user).delete()
+        self.assertEqual(len(self._submit(10)['new_achievements']), 1)
+
+    def test_rolled_back_unlock_not_cached(self):
+        """測試用例：交易回滾的解鎖不會殘留在程序內快取"""
+        achievement = self._create('single_round', 10, name='回滾成就')
+        try:
+            with transaction.atomic():
+                PlayerAchievement.objects.create(user=self.user, achievement=achievement)
+                state = get_unlock_state(self.user.id)
+                self.assertIn(achievement.id, state.unlocked)
+                raise RuntimeError('rollback')
+        except RuntimeError:
+            pass
+
+        self.assertNotIn(achievement.id, get_unlock_state(self.user.id).unlocked)
+        self.assertEqual(len(self._submit(10)['new_achievements']), 1)
+
+    def test_large_catalog_examines_only_crossed_thresholds(self):
+        """測試用例：數千個成就時，每次提交只檢查新跨越的門檻，查詢數不變"""
+        Achievement.objects.bulk_create([
+            Achievement(
+                name=f'點擊 {target}', description='測試成就',
+                achievement_type='total_clicks', target_value=target
+            )
+            for target in range(100, 300100, 100)
+        ])
+        invalidate_achievement_index()  # bulk_create 不發送信號，手動失效
+
+        self._submit(250)  # 跨越 100、200
+        self._submit(0)  # 解鎖後的下一次提交重新載入玩家狀態
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._submit(60)  # 累計 310，跨越 300
+        self.assertEqual([a['name'] for a in data['new_achievements']], ['點擊 300'])
+        statements = [
+            q['sql'] for q in ctx.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        # session、用戶、遊戲記錄、每日統計、計數器、已解鎖成就位元組（比較並交換）、解鎖記錄、歷史記錄
+        self.assertEqual(len(statements), 8)
+        self.assertFalse(any('"game_achievement"' in sql for sql in statements))
+
+        state = get_unlock_state(self.user.id)
+        self.assertEqual(state.crossed({'total_clicks': 310}), ([], {}))
+        crossed_ids, _ = state.crossed({'total_clicks': 520})
+        self.assertEqual(len(crossed_ids), 2)
+
+
+class UnlockStateTestCase(TestCase):
+    """成就索引與玩家狀態的單元測試類（不經過資料庫）"""
+
+    def _achievement(self, achievement_id, achievement_type, target_value):
+        return Achievement(
+            id=achievement_id, name=str(achievement_id), description='',
+            achievement_type=achievement_type, target_value=target_value
+        )
+
+    def test_bisect_positions(self):
+        """測試用例：門檻排序與 bisect 位置"""
+        index = AchievementIndex([
+            self._achievement(1, 'total_clicks', 500),
+            self._achievement(2, 'total_clicks', 100),
+            self._achievement(3, 'total_clicks', 100),
+            self._achievement(4, 'unknown_type', 1),
+        ])
+        self.assertEqual(index.thresholds['total_clicks'], [100, 100, 500])
+        self.assertEqual(index.ids['total_clicks'], [2, 3, 1])
+        self.assertNotIn(4, index.by_id)
+        self.assertEqual(index.reached('total_clicks', 99), 0)
+        self.assertEqual(index.reached('total_clicks', 100), 2)
+        self.assertEqual(index.reached('total_games', 100), 0)
+
+    def test_state_skips_unlocked_prefix(self):
+        """測試用例：已解鎖的前綴不再檢查，未按順序解鎖的成就不重複返回"""
+        index = AchievementIndex([
+            self._achievement(1, 'total_clicks', 100),
+            self._achievement(2, 'total_clicks', 200),
+            self._achievement(3, 'total_clicks', 300),
+        ])
+        state = UnlockState(index, unlocked=[1, 3])
+        self.assertEqual(state.checked['total_clicks'], 1)
+
+        crossed_ids, reached = state.crossed({'total_clicks': 350})
+        self.assertEqual(crossed_ids, [2])
+        state.advance(reached, crossed_ids)
+        self.assertEqual(state.checked['total_clicks'], 3)
+        self.assertEqual(state.crossed({'total_clicks': 10 ** 9}), ([], {}))
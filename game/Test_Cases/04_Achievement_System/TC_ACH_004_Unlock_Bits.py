@@ -0,0 +1,166 @@
+"""
+成就系統測試 - 已解鎖成就位元組
+TC_ACH_004: PlayerProfile.achievement_bits 與解鎖記錄同步，讀取 API 不查詢 PlayerAchievement，
+並發解鎖以比較並交換寫入，每個成就只發放一次獎勵
+"""
+from django.test import TestCase, Client, RequestFactory
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+import json
+from game import achievements
+from game.achievements import decode_unlocked, encode_unlocked, is_unlocked
+from game.models import Achievement, PlayerAchievement, PlayerProfile
+
+
+class UnlockBitsTestCase(TestCase):
+    """已解鎖成就位元組測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'bits_user'}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username='bits_user')
+        self.first = self._create('single_round', 10, reward_coins=5)
+        self.second = self._create('single_round', 20, reward_coins=7)
+
+    def _create(self, achievement_type, target_value, reward_coins=0):
+        return Achievement.objects.create(
+            name=f'{achievement_type}_{target_value}', description='測試成就',
+            achievement_type=achievement_type, target_value=target_value, reward_coins=reward_coins,
+        )
+
+    def _submit(self, clicks):
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _profile(self):
+        return PlayerProfile.objects.get(user=self.user)
+
+    def test_encoding_is_stable_across_catalog_growth(self):
+        """測試用例：編碼只取決於成就 ID，加入新的 ID 不改變已有的位元"""
+        self.assertEqual(encode_unlocked([]), b'')
+        self.assertEqual(encode_unlocked([0, 9]), bytes([0b1, 0b10]))
+        ids = {1, 7, 8, 63, 64, 1000}
+        bits = encode_unlocked(ids)
+        self.assertEqual(decode_unlocked(bits), ids)
+        self.assertEqual(decode_unlocked(memoryview(bits)), ids)
+        grown = encode_unlocked(ids | {5000})
+        self.assertEqual(grown[:len(bits)], bits)
+        for achievement_id in range(0, 1100):
+            self.assertEqual(is_unlocked(bits, achievement_id), achievement_id in ids)
+        self.assertFalse(is_unlocked(b'', 3))
+
+    def test_submit_writes_bits_with_unlock(self):
+        """測試用例：提交解鎖成就時同時寫入位元組與獎勵，不重複解鎖"""
+        data = self._submit(15)
+        self.assertEqual([a['id'] for a in data['new_achievements']], [self.first.id])
+        profile = self._profile()
+        self.assertEqual(decode_unlocked(profile.achievement_bits), {self.first.id})
+        self.assertEqual(profile.coins, 15 + 5)
+
+        self._submit(25)
+        self._submit(25)
+        profile = self._profile()
+        self.assertEqual(decode_unlocked(profile.achievement_bits), {self.first.id, self.second.id})
+        self.assertEqual(PlayerAchievement.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(profile.coins, 15 + 5 + 25 + 7 + 25)
+
+    def test_concurrent_unlock_grants_reward_once(self):
+        """測試用例：位元組在讀取後被並發的提交修改時，重新讀取後只寫入尚未解鎖的成就"""
+        grant = achievements.grant_achievements
+        calls = []
+
+        def concurrent_grant(user, old_bits, new_bits, reward_coins):
+            if not calls:
+                # 模擬另一個提交先解鎖了第一個成就並發放獎勵
+                PlayerAchievement.objects.bulk_create([PlayerAchievement(user=user, achievement=self.first)])
+                grant(user, old_bits, encode_unlocked([self.first.id]), self.first.reward_coins)
+            calls.append(reward_coins)
+            return grant(user, old_bits, new_bits, reward_coins)
+
+        with mock.patch.object(achievements, 'grant_achievements', side_effect=concurrent_grant):
+            data = self._submit(25)
+        self.assertEqual([a['id'] for a in data['new_achievements']], [self.second.id])
+        self.assertEqual(calls, [5 + 7, 7])
+        profile = self._profile()
+        self.assertEqual(decode_unlocked(profile.achievement_bits), {self.first.id, self.second.id})
+        self.assertEqual(profile.coins, 25 + 5 + 7)
+
+    def test_reads_do_not_query_unlock_records(self):
+        """測試用例：玩家資料、成就列表與更新徽章由位元組判斷已解鎖，不查詢 PlayerAchievement"""
+        self._submit(15)
+        requests = [
+            lambda: self.client.get('/api/profile/'),
+            lambda: self.client.get('/api/achievements/'),
+            lambda: self.client.post(
+                '/api/update-badges/',
+                data=json.dumps({'badge_1_id': self.first.id}),
+                content_type='application/json'
+            ),
+        ]
+        for request in requests:
+            with CaptureQueriesContext(connection) as ctx:
+                response = request()
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('game_playerachievement' in q['sql'] for q in ctx.captured_queries))
+
+        profile = json.loads(self.client.get('/api/profile/').content)
+        self.assertEqual([a['id'] for a in profile['achievements']], [self.first.id])
+        unlocked = {
+            a['id']: a['unlocked']
+            for a in json.loads(self.client.get('/api/achievements/').content)['achievements']
+        }
+        self.assertEqual(unlocked, {self.first.id: True, self.second.id: False})
+
+        response = self.client.post(
+            '/api/update-badges/',
+            data=json.dumps({'badge_1_id': self.second.id}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_orm_writes_resync_bits(self):
+        """測試用例：後台或管理命令直接建立、刪除解鎖記錄時由信號重新計算位元組"""
+        PlayerAchievement.objects.create(user=self.user, achievement=self.second, reward_claimed=True)
+        self.assertEqual(decode_unlocked(self._profile().achievement_bits), {self.second.id})
+
+        PlayerAchievement.objects.filter(user=self.user).delete()
+        self.assertEqual(self._profile().achievement_bits, b'')
+        self.assertEqual(len(self._submit(25)['new_achievements']), 2)
+
+    def test_admin_moves_unlock_between_players(self):
+        """測試用例：後台修改解鎖記錄時每位玩家只重新計算一次位元組，改變記錄的玩家時原玩家也重新計算"""
+        other = User.objects.create_user(username='bits_other')
+        PlayerProfile.objects.create(user=other)
+        unlock = PlayerAchievement.objects.create(user=self.user, achievement=self.second, reward_claimed=True)
+        admin = site._registry[PlayerAchievement]
+        request = RequestFactory().post('/admin/')
+        request.user = User.objects.create_superuser(username='bits_admin')
+        form = admin.get_form(request, unlock)(
+            data={'user': other.id, 'achievement': self.second.id, 'reward_claimed': 'on'}, instance=unlock
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with mock.patch('game.admin.sync_achievement_bits', wraps=achievements.sync_achievement_bits) as admin_sync, \
+                mock.patch('game.signals.sync_achievement_bits', wraps=achievements.sync_achievement_bits) as signal_sync:
+            admin.save_model(request, form.save(commit=False), form, True)
+        self.assertEqual([c.args for c in signal_sync.call_args_list], [(other.id,)])
+        self.assertEqual([c.args for c in admin_sync.call_args_list], [(self.user.id,)])
+        self.assertEqual(self._profile().achievement_bits, b'')
+        self.assertEqual(
+            decode_unlocked(PlayerProfile.objects.get(user=other).achievement_bits), {self.second.id}
+        )
@@ -0,0 +1,120 @@
+"""
+成就系統測試 - 成就進度
+TC_ACH_005: /api/achievements/progress/ 由玩家資料的一列計算每個成就的目前數值與完成百分比，
+目錄已快取時固定兩個查詢（session、用戶與玩家資料 JOIN），與成就數量無關
+"""
+from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+from game.models import Achievement, PlayerProfile
+
+
+class AchievementProgressTestCase(TestCase):
+    """成就進度測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.total_clicks = self._create('total_clicks', 100)
+        self.single_round = self._create('single_round', 40)
+        self.total_games = self._create('total_games', 3, reward_coins=5)
+        self.unsupported = self._create('friend_count', 10)
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'progress_user'}),
+            content_type='application/json'
+        )
+        for clicks in (30, 15):
+            self._submit(clicks)
+
+    def _create(self, achievement_type, target_value, reward_coins=0):
+        return Achievement.objects.create(
+            name=f'{achievement_type}_{target_value}', description='測試成就',
+            achievement_type=achievement_type, target_value=target_value, reward_coins=reward_coins,
+        )
+
+    def _submit(self, clicks):
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def _progress(self):
+        response = self.client.get('/api/achievements/progress/')
+        self.assertEqual(response.status_code, 200)
+        return {a['id']: a for a in json.loads(response.content)['achievements']}
+
+    def test_progress_values(self):
+        """測試用例：各類型的目前數值與百分比，單局類型以最佳單局計算，已解鎖為 100"""
+        progress = self._progress()
+        self.assertEqual(progress[self.total_clicks.id]['current_value'], 45)
+        self.assertEqual(progress[self.total_clicks.id]['progress'], 45.0)
+        self.assertEqual(progress[self.single_round.id]['current_value'], 30)
+        self.assertEqual(progress[self.single_round.id]['progress'], 75.0)
+        self.assertEqual(progress[self.total_games.id]['progress'], 66.7)
+        self.assertIsNone(progress[self.unsupported.id]['progress'])
+        self.assertFalse(any(a['unlocked'] for a in progress.values()))
+
+        self._submit(50)
+        progress = self._progress()
+        self.assertTrue(progress[self.single_round.id]['unlocked'])
+        self.assertEqual(progress[self.single_round.id]['progress'], 100.0)
+        self.assertEqual(progress[self.total_games.id]['progress'], 100.0)
+        self.assertEqual(progress[self.total_clicks.id]['progress'], 95.0)
+
+        # 與成就列表的內容相同，只多出進度欄位
+        listed = json.loads(self.client.get('/api/achievements/').content)['achievements']
+        for achievement in listed:
+            entry = dict(progress[achievement['id']])
+            del entry['current_value'], entry['progress']
+            self.assertEqual(entry, achievement)
+
+    def test_two_queries_regardless_of_catalog_size(self):
+        """測試用例：目錄已快取時固定兩個查詢，成就數量增加不增加查詢"""
+        for catalog_size in (4, 204):
+            Achievement.objects.bulk_create([
+                Achievement(
+                    name=f'批量成就{i}', description='測試成就', achievement_type='total_clicks',
+                    target_value=1000 + i,
+                )
+                for i in range(catalog_size - Achievement.objects.count())
+            ])
+            cache.clear()
+            self._progress()  # 載入目錄快取
+            with CaptureQueriesContext(connection) as ctx:
+                progress = self._progress()
+            self.assertEqual(len(progress), catalog_size)
+            self.assertEqual(len(ctx.captured_queries), 2, [q['sql'] for q in ctx.captured_queries])
+            self.assertFalse(any('game_achievement' in q['sql'] for q in ctx.captured_queries))
+
+    def test_unchanged_data_returns_304(self):
+        """測試用例：資料未變更時返回 304，提交遊戲後進度更新"""
+        response = self.client.get('/api/achievements/progress/')
+        etag = response['ETag']
+        self.assertNotEqual(etag, self.client.get('/api/achievements/')['ETag'])
+        response = self.client.get('/api/achievements/progress/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self._submit(5)
+        response = self.client.get('/api/achievements/progress/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {a['id']: a['current_value'] for a in json.loads(response.content)['achievements']}[self.total_clicks.id],
+            50
+        )
+
+    def test_missing_profile_and_login(self):
+        """測試用例：未登入返回 401；沒有玩家資料時進度為 0"""
+        response = Client().get('/api/achievements/progress/')
+        self.assertEqual(response.status_code, 401)
+
+        PlayerProfile.objects.filter(user__username='progress_user').delete()
+        progress = self._progress()
+        self.assertEqual(progress[self.total_clicks.id]['current_value'], 0)
+        self.assertEqual(progress[self.total_clicks.id]['progress'], 0.0)
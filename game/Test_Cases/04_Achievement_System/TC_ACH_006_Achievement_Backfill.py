@@ -0,0 +1,155 @@
+"""
+成就系統測試 - 補發成就
+TC_ACH_006: backfill_achievements 依用戶 ID 分批，以每個成就一個查詢找出已達成條件的玩家，
+寫入解鎖記錄、位元組與獎勵，重複執行不重複發放，可從檢查點續跑
+
+批量補發的玩家數量可透過環境變數調整，例如：
+    ACHIEVEMENT_BACKFILL_PLAYERS=100000 python manage.py test game.Test_Cases.04_Achievement_System
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+import json
+import os
+import tempfile
+import time
+from game.achievements import decode_unlocked, encode_unlocked
+from game.models import Achievement, PlayerAchievement, PlayerProfile
+
+
+class AchievementBackfillTestCase(TestCase):
+    """補發成就測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.clicks = self._create('total_clicks', 100, reward_coins=10)
+        self.round = self._create('single_round', 50, reward_coins=7)
+        self.games = self._create('total_games', 3)
+        self._create('friend_count', 1, reward_coins=99)
+        # (累計點擊, 最佳單局, 遊戲局數)
+        counters = [(150, 60, 5), (100, 10, 1), (20, 50, 3), (0, 0, 0)]
+        self.users = []
+        for i, (total_clicks, best, games) in enumerate(counters):
+            user = User.objects.create(username=f'backfill_{i}')
+            PlayerProfile.objects.create(
+                user=user, total_clicks=total_clicks, best_clicks_per_round=best, total_games_played=games
+            )
+            self.users.append(user)
+
+    def _create(self, achievement_type, target_value, reward_coins=0):
+        return Achievement.objects.create(
+            name=f'{achievement_type}_{target_value}', description='測試成就',
+            achievement_type=achievement_type, target_value=target_value, reward_coins=reward_coins,
+        )
+
+    def _unlocked(self, user):
+        return set(PlayerAchievement.objects.filter(user=user).values_list('achievement_id', flat=True))
+
+    def _profile(self, user):
+        return PlayerProfile.objects.get(user=user)
+
+    def test_backfill_unlocks_qualifying_players(self):
+        """測試用例：達成條件的玩家寫入解鎖記錄、位元組、獎勵並遞增資料版本，重複執行不重複發放"""
+        out = StringIO()
+        call_command('backfill_achievements', chunk_size=3, stdout=out)
+        self.assertIn('已補發 6 個成就', out.getvalue())
+
+        expected = [
+            {self.clicks.id, self.round.id, self.games.id},
+            {self.clicks.id},
+            {self.round.id, self.games.id},
+            set(),
+        ]
+        expected_coins = [17, 10, 7, 0]
+        for user, ids, coins in zip(self.users, expected, expected_coins):
+            profile = self._profile(user)
+            self.assertEqual(self._unlocked(user), ids)
+            self.assertEqual(decode_unlocked(profile.achievement_bits), ids)
+            self.assertEqual(profile.coins, coins)
+            self.assertEqual(profile.data_version, len(ids))
+        self.assertTrue(PlayerAchievement.objects.get(user=self.users[0], achievement=self.clicks).reward_claimed)
+        self.assertFalse(PlayerAchievement.objects.get(user=self.users[0], achievement=self.games).reward_claimed)
+
+        out = StringIO()
+        call_command('backfill_achievements', stdout=out)
+        self.assertIn('已補發 0 個成就', out.getvalue())
+        self.assertEqual(self._profile(self.users[0]).coins, 17)
+
+    def test_already_unlocked_not_rewarded_again(self):
+        """測試用例：位元組已包含的成就不再發放獎勵；只補發指定的成就"""
+        PlayerProfile.objects.filter(user=self.users[0]).update(achievement_bits=encode_unlocked([self.clicks.id]))
+        call_command('backfill_achievements', achievement=[self.clicks.id], stdout=StringIO())
+        self.assertEqual(self._profile(self.users[0]).coins, 0)
+        self.assertEqual(self._profile(self.users[1]).coins, 10)
+        self.assertEqual(self._unlocked(self.users[2]), set())
+
+    def test_submit_after_backfill_does_not_grant_again(self):
+        """測試用例：補發後玩家的下一局不重複解鎖或發放獎勵"""
+        client = Client()
+        client.post('/api/login/', data=json.dumps({'username': 'backfill_0'}), content_type='application/json')
+        call_command('backfill_achievements', stdout=StringIO())
+        response = client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': 70, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['new_achievements'], [])
+        self.assertEqual(self._profile(self.users[0]).coins, 17 + 70)
+
+    def test_dry_run_and_checkpoint_resume(self):
+        """測試用例：試運行不寫入；時間預算用完後保留檢查點，續跑只處理之後的用戶"""
+        call_command('backfill_achievements', dry_run=True, stdout=StringIO())
+        self.assertFalse(PlayerAchievement.objects.exists())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, 'achievements.json')
+            out = StringIO()
+            call_command('backfill_achievements', chunk_size=1, time_budget=1e-9, checkpoint=checkpoint, stdout=out)
+            self.assertIn('時間預算已用完', out.getvalue())
+            with open(checkpoint, encoding='utf-8') as f:
+                self.assertEqual(json.load(f), {'last_user_id': self.users[0].id})
+            self.assertEqual(PlayerAchievement.objects.exclude(user=self.users[0]).count(), 0)
+
+            with open(checkpoint, 'w', encoding='utf-8') as f:
+                json.dump({'last_user_id': self.users[1].id}, f)
+            call_command('backfill_achievements', checkpoint=checkpoint, stdout=StringIO())
+            self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(self._unlocked(self.users[1]), set())
+        self.assertEqual(self._unlocked(self.users[2]), {self.round.id, self.games.id})
+
+    def test_bulk_backfill_throughput(self):
+        """測試用例：每批的查詢數與玩家數量無關，輸出補發速度"""
+        players = int(os.getenv('ACHIEVEMENT_BACKFILL_PLAYERS', '3000'))
+        users = User.objects.bulk_create([User(username=f'bulk_{i}') for i in range(players)])
+        users = list(User.objects.filter(username__startswith='bulk_').order_by('id'))
+        PlayerProfile.objects.bulk_create([
+            PlayerProfile(user=user, total_clicks=i % 200, best_clicks_per_round=i % 80, total_games_played=i % 5)
+            for i, user in enumerate(users)
+        ], batch_size=1000)
+
+        chunk_size = 1000
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('backfill_achievements', chunk_size=chunk_size, stdout=StringIO())
+        elapsed = time.perf_counter() - start
+        unlocked = PlayerAchievement.objects.count()
+        chunks = -(-(players + len(self.users)) // chunk_size)
+        print(
+            f'\n✓ 補發 {players + len(self.users):,} 位玩家、{unlocked:,} 個成就：'
+            f'{elapsed:.2f} 秒（{(players + len(self.users)) / elapsed:,.0f} 位/秒），{len(ctx.captured_queries)} 個查詢'
+        )
+        # 每批：一個查詢取得用戶 ID，每個成就一個篩選查詢與一個 UPDATE（解鎖記錄依 bulk_create 的批次寫入）
+        statements = [q['sql'].split()[0] for q in ctx.captured_queries]
+        self.assertLessEqual(statements.count('UPDATE'), chunks * 3)
+        self.assertEqual(statements.count('SELECT'), 1 + (chunks + 1) + chunks * 3)
+        self.assertEqual(
+            sum(PlayerProfile.objects.filter(user__in=users).values_list('coins', flat=True)),
+            sum(10 * (i % 200 >= 100) + 7 * (i % 80 >= 50) for i in range(players))
+        )
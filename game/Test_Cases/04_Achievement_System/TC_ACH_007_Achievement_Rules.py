@@ -0,0 +1,149 @@
+"""
+成就系統測試 - 成就規則登錄表
+TC_ACH_007: 持有金幣、對戰勝場、寵物數量、單日局數、連續天數等類型由規則計算；
+事件只計算依賴其變更輸入的規則，目錄中沒有的類型不增加查詢
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+import json
+from game import views
+from game.achievement_rules import (
+    BATTLE_INPUTS, PURCHASE_INPUTS, RULES, SUBMIT_INPUTS, RuleContext, register_rule,
+)
+from game.achievements import get_achievement_index, invalidate_achievement_index
+from game.daily_stats import utc_day
+from game.models import Achievement, PlayerDailyStats, PlayerProfile, ShopItem
+
+
+class AchievementRulesTestCase(TestCase):
+    """成就規則測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.pet = ShopItem.objects.create(
+            name='寵物夥伴', item_type='extra_button', description='',
+            base_price=10, effect_value=1.0, max_level=5
+        )
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'rules_user'}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username='rules_user')
+        PlayerProfile.objects.filter(user=self.user).update(coins=1000)
+
+    def _create(self, achievement_type, target_value, reward_coins=0):
+        return Achievement.objects.create(
+            name=f'{achievement_type}_{target_value}', description='測試成就',
+            achievement_type=achievement_type, target_value=target_value, reward_coins=reward_coins,
+        )
+
+    def _submit(self, clicks=10):
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [a['id'] for a in json.loads(response.content)['new_achievements']]
+
+    def _purchase(self, **payload):
+        response = self.client.post(
+            '/api/purchase/',
+            data=json.dumps({'item_id': self.pet.id, **payload}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)
+
+    def test_types_for_inputs(self):
+        """測試用例：只選出目錄中有成就、且規則依賴變更輸入的類型"""
+        self._create('total_clicks', 100)
+        self._create('pets_owned', 1)
+        self._create('battle_wins', 1)
+        self._create('friend_count', 1)
+        index = get_achievement_index()
+        self.assertEqual(set(index.types_for(SUBMIT_INPUTS)), {'total_clicks'})
+        self.assertEqual(set(index.types_for(PURCHASE_INPUTS)), {'pets_owned'})
+        self.assertEqual(set(index.types_for(BATTLE_INPUTS)), {'battle_wins'})
+        self.assertNotIn('friend_count', index.ids)
+
+    def test_purchase_unlocks_pets_owned(self):
+        """測試用例：購買寵物夥伴解鎖寵物數量成就，獎勵反映在剩餘金幣"""
+        two_pets = self._create('pets_owned', 2, reward_coins=50)
+        data = self._purchase()
+        self.assertEqual(data['new_achievements'], [])
+        data = self._purchase()
+        self.assertEqual([a['id'] for a in data['new_achievements']], [two_pets.id])
+        self.assertEqual(data['coins_remaining'], 1000 - 10 - 20 + 50)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).coins, data['coins_remaining'])
+
+    def test_purchase_without_related_types_skips_rules(self):
+        """測試用例：目錄中沒有依賴購買的類型時，購買不讀取解鎖狀態也不計算規則"""
+        self._create('total_clicks', 100)
+        self._create('games_in_a_day', 1)
+        with mock.patch.object(views, 'get_unlock_state', side_effect=AssertionError) as unlock_state:
+            data = self._purchase()
+        self.assertEqual(data['new_achievements'], [])
+        unlock_state.assert_not_called()
+
+    def test_coins_held_unlocks_on_submit(self):
+        """測試用例：提交後持有的金幣達到目標時解鎖"""
+        rich = self._create('coins_held', 1010)
+        self.assertEqual(self._submit(5), [])
+        self.assertEqual(self._submit(5), [rich.id])
+
+    def test_daily_rules(self):
+        """測試用例：單日局數與連續天數由每日統計計算，只在目錄中有這些類型時查詢一次"""
+        today = utc_day(timezone.now())
+        for days_ago in (1, 2, 4):
+            PlayerDailyStats.objects.create(user=self.user, day=today - timedelta(days=days_ago), games_played=1)
+        with CaptureQueriesContext(connection) as ctx:
+            self._submit()
+        self.assertFalse(any(
+            q['sql'].startswith('SELECT') and 'game_playerdailystats' in q['sql'] for q in ctx.captured_queries
+        ))
+
+        three_games = self._create('games_in_a_day', 3)
+        streak = self._create('consecutive_days', 3, reward_coins=30)
+        week = self._create('consecutive_days', 7)
+        with CaptureQueriesContext(connection) as ctx:
+            unlocked = self._submit()
+        daily_selects = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and 'game_playerdailystats' in q['sql']
+        ]
+        self.assertEqual(len(daily_selects), 1)
+        self.assertEqual(unlocked, [streak.id])
+        self.assertEqual(self._submit(), [three_games.id])
+        self.assertNotIn(week.id, self._submit())
+
+        # 今天 4 局；今天與前兩天連續（三天前沒有遊戲）
+        context = RuleContext(self.user.id, PlayerProfile.objects.get(user=self.user), get_achievement_index())
+        self.assertEqual(RULES['games_in_a_day'].value(context), 4)
+        self.assertEqual(RULES['consecutive_days'].value(context), 3)
+
+    def test_registered_rule(self):
+        """測試用例：新登錄的類型在目錄重新編譯後生效"""
+        self.addCleanup(invalidate_achievement_index)
+        self.addCleanup(RULES.pop, 'long_game', None)
+        register_rule('long_game', inputs=('best_clicks_per_round',))(
+            lambda context: context.profile.best_clicks_per_round // 10
+        )
+        invalidate_achievement_index()
+        long_game = self._create('long_game', 5)
+        self.assertEqual(self._submit(40), [])
+        self.assertEqual(self._submit(55), [long_game.id])
+        progress = {
+            a['id']: a for a in json.loads(self.client.get('/api/achievements/progress/').content)['achievements']
+        }
+        self.assertEqual(progress[long_game.id]['progress'], 100.0)
@@ -5,9 +5,20 @@
 
 from .TC_ACH_001_Achievement_List import AchievementListTestCase
 from .TC_ACH_002_Achievement_Unlock import AchievementUnlockTestCase
+from .TC_ACH_003_Achievement_Index import AchievementIndexTestCase, UnlockStateTestCase
+from .TC_ACH_004_Unlock_Bits import UnlockBitsTestCase
+from .TC_ACH_005_Achievement_Progress import AchievementProgressTestCase
+from .TC_ACH_006_Achievement_Backfill import AchievementBackfillTestCase
+from .TC_ACH_007_Achievement_Rules import AchievementRulesTestCase
 
 __all__ = [
     'AchievementListTestCase',
     'AchievementUnlockTestCase',
+    'AchievementIndexTestCase',
+    'UnlockStateTestCase',
+    'UnlockBitsTestCase',
+    'AchievementProgressTestCase',
+    'AchievementBackfillTestCase',
+    'AchievementRulesTestCase',
 ]
 
@@ -0,0 +1,117 @@
+"""
+技術與非功能性測試 - 單一會話登入效能基準
+TC_TECH_003: 驗證登入延遲不隨 django_session 總數增長（用戶 Session 索引）
+
+預設規模為 1k 與 10k 個 session，可透過環境變數調整，例如：
+    SESSION_BENCHMARK_SIZES=1000,100000,1000000 python manage.py test game.Test_Cases.08_Technical_Checks
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+import json
+import os
+import statistics
+import time
+from game.models import UserSession
+
+
+class SessionIndexBenchmarkTestCase(TestCase):
+    """單一會話登入效能基準測試類"""
+
+    LOGIN_ROUNDS = 5
+    BULK_BATCH_SIZE = 5000
+    # 每個填充用戶擁有的 session 數量（模擬多裝置）
+    SESSIONS_PER_FILLER_USER = 10
+
+    def setUp(self):
+        """測試前準備"""
+        self.username = 'bench_user'
+        self.base_url = '/api/login/'
+        sizes = os.getenv('SESSION_BENCHMARK_SIZES', '1000,10000')
+        self.sizes = sorted(int(size) for size in sizes.split(',') if size.strip())
+        self.filled = 0
+        self.encoded_cache = {}
+
+    def _fill_sessions(self, target):
+        """填充其他用戶的 session 與索引記錄，直到總數達到 target"""
+        expire_date = timezone.now() + timedelta(days=7)
+        store = SessionStore()
+        while self.filled < target:
+            count = min(self.BULK_BATCH_SIZE, target - self.filled)
+            user_count = (count + self.SESSIONS_PER_FILLER_USER - 1) // self.SESSIONS_PER_FILLER_USER
+            users = User.objects.bulk_create([
+                User(username=f'filler_{self.filled}_{i}', password='!')
+                for i in range(user_count)
+            ])
+            if users[0].pk is None:
+                # 不支援 RETURNING 的資料庫需要重新查詢主鍵
+                users = list(User.objects.filter(username__startswith=f'filler_{self.filled}_'))
+
+            sessions = []
+            index_rows = []
+            for i in range(count):
+                user = users[i // self.SESSIONS_PER_FILLER_USER]
+                session_key = f'bench{self.filled + i:035d}'
+                if user.pk not in self.encoded_cache:
+                    self.encoded_cache[user.pk] = store.encode({'_auth_user_id': str(user.pk)})
+                sessions.append(Session(
+                    session_key=session_key,
+                    session_data=self.encoded_cache[user.pk],
+                    expire_date=expire_date,
+                ))
+                index_rows.append(UserSession(user=user, session_key=session_key))
+            Session.objects.bulk_create(sessions)
+            UserSession.objects.bulk_create(index_rows)
+            self.filled += count
+
+    def _measure_login(self):
+        """量測已存在用戶重新登入（觸發單一會話清除）的延遲與查詢數"""
+        timings = []
+        query_counts = []
+        for _ in range(self.LOGIN_ROUNDS):
+            client = Client()
+            with CaptureQueriesContext(connection) as ctx:
+                start_time = time.perf_counter()
+                response = client.post(
+                    self.base_url,
+                    data=json.dumps({'username': self.username}),
+                    content_type='application/json'
+                )
+                timings.append((time.perf_counter() - start_time) * 1000)
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(ctx.captured_queries))
+        return statistics.median(timings), max(query_counts)
+
+    def test_login_latency_flat_across_session_counts(self):
+        """測試用例：登入延遲與查詢數不隨 session 總數增長"""
+        # 建立用戶並登入一次，使其成為已存在用戶
+        Client().post(
+            self.base_url,
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+
+        results = []
+        for size in self.sizes:
+            self._fill_sessions(size)
+            median_ms, queries = self._measure_login()
+            results.append((size, median_ms, queries))
+            print(f'✓ {size:>9,} 個 session：登入延遲中位數 {median_ms:.2f}ms，查詢數 {queries}')
+
+        # 查詢數必須固定（不掃描 session 表）
+        self.assertEqual(len({queries for _, _, queries in results}), 1)
+
+        # 延遲應大致持平（寬鬆閾值，避免測試環境抖動造成誤判）
+        smallest_ms = max(results[0][1], 1.0)
+        largest_ms = results[-1][1]
+        self.assertLess(
+            largest_ms,
+            smallest_ms * 5,
+            f'登入延遲隨 session 數量增長：{results[0][0]} 個 {smallest_ms:.2f}ms -> '
+            f'{results[-1][0]} 個 {largest_ms:.2f}ms'
+        )
@@ -0,0 +1,101 @@
+"""
+技術與非功能性測試 - 同一玩家並發提交效能基準
+TC_TECH_004: 比較 select_for_update 讀取-修改-寫入（舊版）與單一原子 UPDATE（新版）
+在 50 個並發提交者下的吞吐量，並驗證兩者的計數結果都正確
+
+需要 PostgreSQL（SQLite 的寫入本身即為串行，無法體現資料列鎖的差異），可透過環境變數調整：
+    SUBMIT_BENCHMARK_WORKERS=50 SUBMIT_BENCHMARK_ROUNDS=20 python manage.py test game.Test_Cases.08_Technical_Checks
+"""
+from django.test import TransactionTestCase
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from unittest import skipUnless
+import os
+import threading
+import time
+from game.models import PlayerProfile, GameSession, Achievement
+from game.views import check_achievements_optimized, record_game_result
+
+
+def _locked_submit(user, clicks, game_duration, coins_earned):
+    """舊版提交流程：鎖定玩家資料後讀取-修改-寫入，並在鎖內判斷成就"""
+    with transaction.atomic():
+        profile = PlayerProfile.objects.select_for_update().get(user=user)
+        profile.coins += coins_earned
+        profile.total_clicks += clicks
+        profile.total_games_played += 1
+        update_fields = ['coins', 'total_clicks', 'total_games_played']
+        if clicks > profile.best_clicks_per_round:
+            profile.best_clicks_per_round = clicks
+            update_fields.append('best_clicks_per_round')
+        profile.save(update_fields=update_fields)
+        # 解鎖成就時在同一個交易內寫入位元組並發放獎勵
+        check_achievements_optimized(user, profile)
+        GameSession.objects.create(
+            user=user,
+            clicks=clicks,
+            game_duration=game_duration,
+            coins_earned=coins_earned
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql', '並發基準測試需要 PostgreSQL')
+class SubmitConcurrencyBenchmarkTestCase(TransactionTestCase):
+    """同一玩家並發提交效能基準測試類"""
+
+    CLICKS = 10
+
+    def setUp(self):
+        """測試前準備"""
+        self.workers = int(os.getenv('SUBMIT_BENCHMARK_WORKERS', '50'))
+        self.rounds = int(os.getenv('SUBMIT_BENCHMARK_ROUNDS', '20'))
+        # 成就目標設在基準測試達不到的位置，讓每次提交都完整執行成就判斷
+        Achievement.objects.create(
+            name='遙不可及', description='基準測試用', achievement_type='total_clicks',
+            target_value=10 ** 12, reward_coins=1
+        )
+
+    def _run(self, submit, username):
+        """以多個執行緒對同一玩家並發提交，返回每秒提交數"""
+        user = User.objects.create_user(username=username)
+        PlayerProfile.objects.create(user=user)
+        barrier = threading.Barrier(self.workers + 1)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.rounds):
+                    submit(user, self.CLICKS, 10.0, self.CLICKS)
+            except Exception as e:  # 記錄後由主執行緒斷言
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(errors, [])
+        total = self.workers * self.rounds
+        profile = PlayerProfile.objects.get(user=user)
+        self.assertEqual(profile.total_games_played, total)
+        self.assertEqual(profile.total_clicks, total * self.CLICKS)
+        self.assertEqual(profile.coins, total * self.CLICKS)
+        self.assertEqual(GameSession.objects.filter(user=user).count(), total)
+        return total / elapsed
+
+    def test_atomic_update_throughput(self):
+        """測試用例：50 個並發提交者下，舊版與新版的吞吐量與正確性"""
+        locked = self._run(_locked_submit, 'locked_bench_user')
+        atomic = self._run(record_game_result, 'atomic_bench_user')
+        print(
+            f'\n✓ {self.workers} 個並發提交者 × {self.rounds} 局：'
+            f'select_for_update {locked:.0f} 局/秒，原子 UPDATE {atomic:.0f} 局/秒'
+            f'（{atomic / locked:.2f} 倍）'
+        )
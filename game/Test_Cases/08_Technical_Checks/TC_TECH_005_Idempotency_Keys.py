@@ -0,0 +1,246 @@
+"""
+技術與非功能性測試 - Idempotency-Key 請求去重
+TC_TECH_005: 重試提交遊戲結果與購買時不重複套用，重放回應不進入交易、不鎖定資料列
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+import json
+from game.idempotency import purge_idempotency_records
+from game.models import GameSession, IdempotencyRecord, PlayerProfile, PlayerPurchase, ShopItem
+
+
+class IdempotencyKeyTestCase(TestCase):
+    """Idempotency-Key 請求去重測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.client = Client()
+        self.username = 'idempotent_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+
+    def _post(self, url, payload, key):
+        """輔助方法：帶 Idempotency-Key 標頭的 POST"""
+        return self.client.post(
+            url,
+            data=json.dumps(payload),
+            content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retried_submit_applied_once(self):
+        """測試用例：同一個 key 重試提交遊戲結果，只加一次金幣"""
+        payload = {'clicks': 40, 'game_duration': 10.0}
+        first = self._post('/api/submit-game/', payload, 'round-1')
+        self.assertEqual(first.status_code, 200)
+
+        with CaptureQueriesContext(connection) as ctx:
+            replay = self._post('/api/submit-game/', payload, 'round-1')
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(replay.content), json.loads(first.content))
+
+        # 重放不開啟交易、不鎖定資料列、不寫入任何資料
+        statements = [q['sql'] for q in ctx.captured_queries]
+        self.assertFalse(any(sql.startswith(('SAVEPOINT', 'BEGIN', 'UPDATE', 'INSERT')) for sql in statements))
+        self.assertFalse(any('FOR UPDATE' in sql for sql in statements))
+
+        profile = PlayerProfile.objects.get(user=self.user)
+        self.assertEqual(profile.coins, 40)
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 1)
+
+        # 不同的 key 是新的請求
+        self._post('/api/submit-game/', payload, 'round-2')
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).coins, 80)
+
+    def test_failure_after_commit_not_applied_twice(self):
+        """測試用例：遊戲結果提交後成就判斷失敗，仍返回已提交的結果，同一個 key 重試不重複套用"""
+        payload = {'clicks': 40, 'game_duration': 10.0}
+        with mock.patch('game.views.check_achievements_optimized', side_effect=RuntimeError('boom')), \
+                self.assertLogs('game.views', level='ERROR'):
+            first = self._post('/api/submit-game/', payload, 'after-commit')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(first.content)['new_achievements'], [])
+
+        replay = self._post('/api/submit-game/', payload, 'after-commit')
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        profile = PlayerProfile.objects.get(user=self.user)
+        self.assertEqual(profile.coins, 40)
+        self.assertEqual(profile.total_games_played, 1)
+
+    def test_error_response_after_commit_stored(self):
+        """測試用例：變更提交後產生回應失敗（返回 500）時保存錯誤回應，重試不重複套用"""
+        payload = {'rounds': [{'client_id': 'r1', 'clicks': 30, 'game_duration': 10.0}]}
+        with mock.patch('game.views._game_profile_payload', side_effect=RuntimeError('boom')):
+            first = self._post('/api/submit-games/', payload, 'batch-after-commit')
+        self.assertEqual(first.status_code, 500)
+
+        replay = self._post('/api/submit-games/', payload, 'batch-after-commit')
+        self.assertEqual(replay.status_code, 500)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        profile = PlayerProfile.objects.get(user=self.user)
+        self.assertEqual(profile.coins, 30)
+        self.assertEqual(profile.total_games_played, 1)
+
+    def test_retried_purchase_applied_once(self):
+        """測試用例：同一個 key 重試購買，只購買一級"""
+        item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=10, effect_value=1.0, max_level=10
+        )
+        self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': 100, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+
+        first = self._post('/api/purchase/', {'item_id': item.id}, 'buy-1')
+        replay = self._post('/api/purchase/', {'item_id': item.id}, 'buy-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(replay.content), json.loads(first.content))
+        self.assertEqual(PlayerPurchase.objects.get(user=self.user, shop_item=item).level, 1)
+
+    def test_purchase_achievement_failure_returns_success(self):
+        """測試用例：購買提交後成就判斷失敗，仍返回購買結果，同一個 key 重試不再購買一級"""
+        item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=10, effect_value=1.0, max_level=10
+        )
+        PlayerProfile.objects.filter(user=self.user).update(coins=100)
+        with mock.patch('game.views.check_achievements_optimized', side_effect=RuntimeError('boom')), \
+                self.assertLogs('game.views', level='ERROR'):
+            first = self._post('/api/purchase/', {'item_id': item.id}, 'buy-after-commit')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(first.content)['coins_remaining'], 90)
+
+        replay = self._post('/api/purchase/', {'item_id': item.id}, 'buy-after-commit')
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(PlayerPurchase.objects.get(user=self.user, shop_item=item).level, 1)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).coins, 90)
+
+    def test_key_reused_with_different_body(self):
+        """測試用例：同一個 key 搭配不同內容返回 422"""
+        self._post('/api/submit-game/', {'clicks': 10}, 'reused')
+        response = self._post('/api/submit-game/', {'clicks': 99}, 'reused')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).total_clicks, 10)
+
+    def test_pending_key_returns_conflict(self):
+        """測試用例：第一次請求仍在處理中時返回 409"""
+        from game.idempotency import _hash
+        body = json.dumps({'clicks': 10})
+        IdempotencyRecord.objects.create(
+            user=self.user,
+            key_hash=_hash('submit_game:in-flight'),
+            request_hash=_hash(body),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.client.post(
+            '/api/submit-game/', data=body, content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='in-flight'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content)['error_type'], 'idempotency_in_progress')
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).total_games_played, 0)
+
+    def test_abandoned_pending_key_released_after_lease(self):
+        """測試用例：處理中記錄只有短租約，程序中途結束後同一個 key 在租約到期後可以重新處理"""
+        from game.idempotency import _hash
+        body = json.dumps({'clicks': 10})
+        IdempotencyRecord.objects.create(
+            user=self.user,
+            key_hash=_hash('submit_game:abandoned'),
+            request_hash=_hash(body),
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        response = self.client.post(
+            '/api/submit-game/', data=body, content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY='abandoned'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).total_games_played, 1)
+
+    def test_pending_lease_and_final_ttl(self):
+        """測試用例：處理中記錄的有效期為租約，保存回應後延長為完整的保留時間"""
+        from game import idempotency
+        leases = []
+        original_claim = idempotency._claim
+
+        def claim(*args):
+            claimed = original_claim(*args)
+            leases.append(IdempotencyRecord.objects.get().expires_at - timezone.now())
+            return claimed
+
+        with override_settings(GAME_IDEMPOTENCY_LEASE=30, GAME_IDEMPOTENCY_TTL=3600):
+            with mock.patch.object(idempotency, '_claim', side_effect=claim):
+                self._post('/api/submit-game/', {'clicks': 10}, 'lease')
+        self.assertLessEqual(leases[0], timedelta(seconds=30))
+        self.assertGreater(IdempotencyRecord.objects.get().expires_at - timezone.now(), timedelta(minutes=59))
+
+    def test_validation_errors_stored_and_without_key_unchanged(self):
+        """測試用例：參數錯誤的回應同樣被保存；未帶標頭時行為不變"""
+        self.assertEqual(self._post('/api/submit-game/', {'clicks': -1}, 'bad').status_code, 400)
+        self.assertEqual(self._post('/api/submit-game/', {'clicks': -1}, 'bad').status_code, 400)
+        self.assertEqual(IdempotencyRecord.objects.filter(status_code=400).count(), 1)
+
+        response = self.client.post(
+            '/api/submit-game/', data=json.dumps({'clicks': 5}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+    def test_expired_key_can_be_reused(self):
+        """測試用例：過期的記錄視為不存在"""
+        self._post('/api/submit-game/', {'clicks': 10}, 'expiring')
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self._post('/api/submit-game/', {'clicks': 10}, 'expiring')
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).total_games_played, 2)
+
+    @override_settings(GAME_IDEMPOTENCY_MAX_RECORDS=3)
+    def test_purge_expired_and_over_limit(self):
+        """測試用例：批量刪除過期記錄，並將總數限制在上限以內"""
+        now = timezone.now()
+        IdempotencyRecord.objects.bulk_create([
+            IdempotencyRecord(
+                user=self.user, key_hash=f'{i:064d}', request_hash='',
+                status_code=200, expires_at=now + timedelta(hours=1 if i >= 2 else -1)
+            )
+            for i in range(7)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            deleted = purge_idempotency_records()
+        self.assertEqual(deleted, 4)
+        self.assertEqual(
+            sorted(IdempotencyRecord.objects.values_list('key_hash', flat=True)),
+            [f'{i:064d}' for i in range(4, 7)]
+        )
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+
+    @override_settings(GAME_IDEMPOTENCY_MAX_RECORDS=1)
+    def test_purge_over_limit_keeps_pending(self):
+        """測試用例：超出數量上限時不刪除處理中的記錄"""
+        now = timezone.now()
+        IdempotencyRecord.objects.bulk_create([
+            IdempotencyRecord(
+                user=self.user, key_hash=f'{i:064d}', request_hash='',
+                status_code=None if i == 0 else 200, expires_at=now + timedelta(hours=1)
+            )
+            for i in range(3)
+        ])
+        self.assertEqual(purge_idempotency_records(), 1)
+        self.assertEqual(
+            sorted(IdempotencyRecord.objects.values_list('key_hash', flat=True)),
+            [f'{i:064d}' for i in (0, 2)]
+        )
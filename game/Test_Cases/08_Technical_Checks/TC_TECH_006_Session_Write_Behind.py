@@ -0,0 +1,146 @@
+"""
+技術與非功能性測試 - 遊戲記錄延遲寫入
+TC_TECH_006: 緩衝遊戲記錄、依筆數批量寫入、歷史記錄合併緩衝、日誌回收
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+import json
+import os
+import tempfile
+from game import session_buffer
+from game.models import GameSession, PlayerProfile
+from game.session_buffer import GameSessionBuffer
+
+
+@override_settings(GAME_SESSION_WRITE_BEHIND=True)
+class SessionWriteBehindTestCase(TestCase):
+    """遊戲記錄延遲寫入測試類"""
+
+    def setUp(self):
+        """測試前準備：每個測試使用獨立的緩衝與日誌目錄"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        # 計時器間隔設得很長，測試中只依筆數或手動寫入
+        self.buffer = GameSessionBuffer(self.tmp_dir.name, max_size=3, max_age=3600)
+        self.addCleanup(self.buffer.close)
+        patcher = mock.patch.object(session_buffer, '_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = Client()
+        self.username = 'write_behind_user'
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': self.username}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username=self.username)
+
+    def _submit(self, clicks):
+        """輔助方法：提交遊戲"""
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _journal_lines(self):
+        with open(self.buffer.journal_path, encoding='utf-8') as f:
+            return [line for line in f if line.strip()]
+
+    def test_submit_buffers_session_and_serves_history(self):
+        """測試用例：提交不立即 INSERT 遊戲記錄，歷史記錄包含緩衝中的記錄"""
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._submit(42)
+        self.assertFalse(any('INSERT INTO "game_gamesession"' in q['sql'] for q in ctx.captured_queries))
+        self.assertFalse(GameSession.objects.exists())
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).total_clicks, 42)
+
+        self.assertEqual([h['clicks'] for h in data['history']], [42])
+        history = json.loads(self.client.get('/api/history/').content)['history']
+        self.assertEqual([h['clicks'] for h in history], [42])
+        self.assertEqual(len(self._journal_lines()), 1)
+
+    def test_flush_by_size_writes_in_one_batch(self):
+        """測試用例：緩衝達到筆數上限時一次寫入，並截斷日誌"""
+        self._submit(1)
+        self._submit(2)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._submit(3)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "game_gamesession"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self._journal_lines(), [])
+        # 歷史記錄依遊戲時間排序，不重複
+        self.assertEqual([h['clicks'] for h in data['history']], [3, 2, 1])
+
+    def test_history_merges_buffer_and_database(self):
+        """測試用例：歷史記錄合併資料庫與緩衝中的記錄，依時間排序"""
+        for clicks in (1, 2, 3, 4):
+            self._submit(clicks)
+        history = json.loads(self.client.get('/api/history/?limit=3').content)['history']
+        self.assertEqual([h['clicks'] for h in history], [4, 3, 2])
+
+    def test_played_at_is_submit_time(self):
+        """測試用例：寫入資料庫的遊戲時間是提交時間，而不是寫入時間"""
+        self._submit(5)
+        submitted_at = self.buffer.pending_for_user(self.user.id)[0]['played_at']
+        self.buffer.flush()
+        self.assertEqual(GameSession.objects.get(user=self.user).played_at, submitted_at)
+
+    def test_recover_orphan_journal(self):
+        """測試用例：回收崩潰程序遺留的日誌，跳過已寫入資料庫的記錄"""
+        played_at = timezone.now() - timedelta(minutes=5)
+        written = GameSession.objects.create(user=self.user, clicks=7, played_at=played_at)
+        orphan_path = os.path.join(self.tmp_dir.name, '99999-deadbeef.journal')
+        with open(orphan_path, 'w', encoding='utf-8') as f:
+            for clicks, at in ((7, written.played_at), (8, played_at + timedelta(seconds=1))):
+                f.write(json.dumps({
+                    'user_id': self.user.id, 'clicks': clicks, 'game_duration': 10.0,
+                    'coins_earned': clicks, 'played_at': at.isoformat(),
+                }) + '\n')
+
+        recovered = self.buffer.recover_orphans()
+        if session_buffer.fcntl is None:
+            self.skipTest('此平台不支援 flock，不回收遺留日誌')
+        self.assertEqual(recovered, 1)
+        self.assertEqual(
+            sorted(GameSession.objects.filter(user=self.user).values_list('clicks', flat=True)),
+            [7, 8]
+        )
+        self.assertFalse(os.path.exists(orphan_path))
+
+    def test_close_flushes_and_removes_journal(self):
+        """測試用例：程序結束時寫入剩餘記錄並刪除日誌"""
+        self._submit(9)
+        self.buffer.close()
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(os.path.exists(self.buffer.journal_path))
+
+    def test_journal_failure_after_commit_still_succeeds(self):
+        """測試用例：計數器提交後日誌寫入失敗時仍返回成功（直接寫入資料庫），重送同一個 key 不重複累加"""
+        def submit():
+            return self.client.post(
+                '/api/submit-game/',
+                data=json.dumps({'clicks': 25, 'game_duration': 10.0}),
+                content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='journal-failure',
+            )
+
+        with mock.patch.object(self.buffer, 'add', side_effect=OSError('No space left on device')):
+            with self.assertLogs('game.session_buffer', level='ERROR'):
+                response = submit()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 1)
+
+        self.assertEqual(submit().status_code, 200)
+        profile = PlayerProfile.objects.get(user=self.user)
+        self.assertEqual((profile.total_clicks, profile.total_games_played), (25, 1))
+        self.assertEqual(GameSession.objects.filter(user=self.user).count(), 1)
@@ -0,0 +1,159 @@
+"""
+技術與非功能性測試 - 遊戲記錄分區與歸檔
+TC_TECH_007: archive_game_sessions 匯出舊月份為壓縮檔並移除；PostgreSQL 上依月份分區，歷史記錄先讀取當月分區
+"""
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
+import csv
+import gzip
+import json
+import os
+import tempfile
+from game.models import GameSession, PlayerDailyStats
+from game.partitions import (
+    add_months, current_month, drop_partition, ensure_partitions, is_partitioned, latest_sessions,
+    list_partitions, partition_name,
+)
+
+
+class SessionArchiveTestCase(TestCase):
+    """遊戲記錄歸檔測試類"""
+
+    def setUp(self):
+        """測試前準備：目前月份、上個月與一年多前的遊戲記錄"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.user = User.objects.create_user(username='archive_user')
+        this_month = current_month()
+        self.old_month = add_months(this_month, -14)
+        GameSession.objects.bulk_create([
+            GameSession(user=self.user, clicks=1, played_at=self.old_month + timedelta(days=2)),
+            GameSession(user=self.user, clicks=2, played_at=self.old_month + timedelta(days=3)),
+            GameSession(user=self.user, clicks=3, played_at=add_months(self.old_month, 1)),
+            GameSession(user=self.user, clicks=4, played_at=add_months(this_month, -1) + timedelta(days=1)),
+            GameSession(user=self.user, clicks=5, played_at=this_month + timedelta(minutes=1)),
+        ])
+        PlayerDailyStats.objects.create(user=self.user, day=self.old_month.date(), games_played=2)
+
+    def _archive(self, **options):
+        out = StringIO()
+        call_command('archive_game_sessions', output_dir=self.tmp_dir.name, stdout=out, **options)
+        return out.getvalue()
+
+    def test_archive_exports_and_removes_old_months(self):
+        """測試用例：保留月份之前的記錄逐月匯出為 gzip CSV 後移除，統計資料不受影響"""
+        output = self._archive(keep_months=12)
+        self.assertIn('已歸檔 3 筆', output)
+        self.assertEqual(sorted(GameSession.objects.values_list('clicks', flat=True)), [4, 5])
+        self.assertTrue(PlayerDailyStats.objects.filter(user=self.user).exists())
+
+        path = os.path.join(self.tmp_dir.name, f'game_sessions_{self.old_month:%Y_%m}.csv.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['clicks'] for row in rows], ['1', '2'])
+        self.assertEqual({row['user_id'] for row in rows}, {str(self.user.id)})
+        self.assertEqual(
+            datetime.fromisoformat(rows[0]['played_at']),
+            self.old_month + timedelta(days=2)
+        )
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 2)
+
+        # 再次執行沒有需要歸檔的記錄
+        self.assertIn('已歸檔 0 筆', self._archive(keep_months=12))
+
+    def test_dry_run_changes_nothing(self):
+        """測試用例：試運行只列出月份與筆數"""
+        output = self._archive(keep_months=1, dry_run=True)
+        self.assertIn('將歸檔 4 筆', output)
+        self.assertEqual(GameSession.objects.count(), 5)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_rerun_does_not_overwrite_previous_archive(self):
+        """測試用例：同月份再次歸檔時寫入新檔案，不覆蓋已匯出（已刪除）的記錄"""
+        self._archive(keep_months=12)
+        GameSession.objects.create(user=self.user, clicks=9, played_at=self.old_month + timedelta(days=5))
+        self._archive(keep_months=12)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.tmp_dir.name, f'game_sessions_{self.old_month:%Y_%m}_1.csv.gz')
+        ))
+        self.assertFalse(GameSession.objects.filter(clicks=9).exists())
+
+    def test_ensure_partitions_command_without_partitioning(self):
+        """測試用例：非分區表上建立分區的命令不修改任何資料"""
+        if is_partitioned():
+            self.skipTest('只在沒有分區的資料庫上檢查')
+        out = StringIO()
+        call_command('ensure_game_session_partitions', stdout=out)
+        self.assertIn('不需要建立分區', out.getvalue())
+        self.assertEqual(GameSession.objects.count(), 5)
+
+    def test_history_reads_latest_sessions(self):
+        """測試用例：最新記錄依時間由新到舊，跨越月份時合併較早的月份"""
+        recent = latest_sessions(self.user, 3, ('clicks',))
+        self.assertEqual([s['clicks'] for s in recent], [5, 4, 3])
+
+
+@skipUnless(connection.vendor == 'postgresql', '月份分區只在 PostgreSQL 上使用')
+class SessionPartitionTestCase(TestCase):
+    """PostgreSQL 遊戲記錄分區測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'partition_user'}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username='partition_user')
+
+    def test_table_partitioned_by_month(self):
+        """測試用例：遷移後遊戲記錄表是分區表，並已建立當月與未來月份的分區"""
+        self.assertTrue(is_partitioned())
+        # migrate 後（post_migrate）已建立，不需要執行歸檔命令
+        months = [month for month, _ in list_partitions()]
+        for offset in range(4):
+            self.assertIn(add_months(current_month(), offset), months)
+        self.assertEqual(ensure_partitions(3), [])
+
+    def test_ensure_partitions_command(self):
+        """測試用例：排程命令建立缺少的未來月份分區，與歸檔命令無關"""
+        next_month = add_months(current_month(), 1)
+        drop_partition(partition_name(next_month))
+        out = StringIO()
+        call_command('ensure_game_session_partitions', '--months-ahead=1', stdout=out)
+        self.assertIn(partition_name(next_month), out.getvalue())
+        self.assertIn(next_month, [month for month, _ in list_partitions()])
+
+    def test_submit_writes_current_partition(self):
+        """測試用例：提交的遊戲記錄寫入當月分區"""
+        self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': 12, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT clicks FROM {partition_name(current_month())} WHERE user_id = %s', [self.user.id])
+            self.assertEqual(cursor.fetchall(), [(12,)])
+
+    def test_history_reads_current_partition_first(self):
+        """測試用例：當月記錄足夠時只查詢當月（範圍條件讓規劃器只掃描當月分區）"""
+        GameSession.objects.bulk_create([
+            GameSession(user=self.user, clicks=i, played_at=current_month() + timedelta(minutes=i))
+            for i in range(3)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            recent = latest_sessions(self.user, 2, ('clicks',))
+        self.assertEqual([s['clicks'] for s in recent], [2, 1])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + ctx.captured_queries[0]['sql'])
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn(partition_name(current_month()), plan)
+        self.assertNotIn(partition_name(add_months(current_month(), 1)), plan)
@@ -0,0 +1,144 @@
+"""
+技術與非功能性測試 - ETag / 條件式 GET
+TC_TECH_008: 商店、成就、玩家資料與歷史記錄返回 ETag，資料未變更時以 304 回應且不執行主要查詢
+"""
+from django.test import TestCase, Client, RequestFactory
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+from game.models import Achievement, PlayerAchievement, PlayerProfile, PlayerPurchase, ShopItem
+
+READ_ENDPOINTS = ['/api/shop/', '/api/achievements/', '/api/profile/', '/api/history/?limit=10']
+
+
+class ConditionalGetTestCase(TestCase):
+    """條件式 GET 測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = self._login('etag_user')
+        self.user = User.objects.get(username='etag_user')
+        PlayerProfile.objects.filter(user=self.user).update(coins=1000)
+        self.item = ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=50, effect_value=2.0, max_level=10
+        )
+        self.achievement = Achievement.objects.create(
+            name='第一局', description='', achievement_type='total_games',
+            target_value=1, reward_coins=0
+        )
+
+    @staticmethod
+    def _login(username):
+        client = Client()
+        client.post(
+            '/api/login/',
+            data=json.dumps({'username': username}),
+            content_type='application/json'
+        )
+        return client
+
+    def _post(self, url, payload):
+        response = self.client.post(url, data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def _etags(self):
+        etags = {}
+        for url in READ_ENDPOINTS:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response['ETag']
+        return etags
+
+    def _revalidate(self, url, etag, client=None):
+        return (client or self.client).get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_data_returns_304(self):
+        """測試用例：If-None-Match 相同時返回 304，只查詢資料版本"""
+        etags = self._etags()
+        for url, etag in etags.items():
+            self.assertTrue(etag.startswith('"'))
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._revalidate(url, etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response['ETag'], etag)
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertEqual(response.content, b'')
+            tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+            for table in ('game_playerpurchase', 'game_playerachievement', 'game_gamesession'):
+                self.assertNotIn(table, tables, url)
+
+    def test_submit_changes_etags(self):
+        """測試用例：提交遊戲後所有讀取 API 的 ETag 改變"""
+        etags = self._etags()
+        self._post('/api/submit-game/', {'clicks': 10, 'game_duration': 10.0})
+        for url, etag in etags.items():
+            response = self._revalidate(url, etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+        achievements = json.loads(self.client.get('/api/achievements/').content)['achievements']
+        self.assertTrue(achievements[0]['unlocked'])
+
+    def test_unlock_without_reward_bumps_version(self):
+        """測試用例：沒有獎勵金幣的解鎖另外遞增資料版本（計數器更新之後才寫入解鎖記錄）"""
+        self._post('/api/submit-game/', {'clicks': 10, 'game_duration': 10.0})
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).data_version, 2)
+        self._post('/api/submit-game/', {'clicks': 10, 'game_duration': 10.0})
+        self.assertEqual(PlayerProfile.objects.get(user=self.user).data_version, 3)
+
+    def test_purchase_and_badges_change_etags(self):
+        """測試用例：購買物品與更換徽章後 ETag 改變"""
+        etags = self._etags()
+        self._post('/api/purchase/', {'item_id': self.item.id})
+        self.assertEqual(self._revalidate('/api/shop/', etags['/api/shop/']).status_code, 200)
+        self.assertEqual(self._revalidate('/api/profile/', etags['/api/profile/']).status_code, 200)
+
+        PlayerAchievement.objects.create(user=self.user, achievement=self.achievement)
+        profile_etag = self.client.get('/api/profile/')['ETag']
+        PlayerProfile.objects.filter(user=self.user).update(coins=5)  # 模擬並發的金幣更新
+        self._post('/api/update-badges/', {'badge_1_id': self.achievement.id})
+        response = self._revalidate('/api/profile/', profile_etag)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['badges'][0]['name'], '第一局')
+        # 更換徽章只寫入徽章欄位，不覆蓋金幣
+        self.assertEqual(data['profile']['coins'], 5)
+
+    def test_catalog_change_changes_etags(self):
+        """測試用例：商店物品變更後商店的 ETag 改變（匿名用戶同樣適用）"""
+        anonymous = Client()
+        shop_etag = anonymous.get('/api/shop/')['ETag']
+        self.assertEqual(self._revalidate('/api/shop/', shop_etag, anonymous).status_code, 304)
+        self.item.base_price = 80
+        self.item.save()
+        response = self._revalidate('/api/shop/', shop_etag, anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['items'][0]['next_level_price'], 80)
+
+    def test_etag_not_shared_between_users(self):
+        """測試用例：另一個帳號使用相同的 ETag 不會得到 304"""
+        etags = self._etags()
+        other = self._login('etag_other')
+        for url, etag in etags.items():
+            self.assertEqual(self._revalidate(url, etag, other).status_code, 200, url)
+
+    def test_errors_have_no_etag(self):
+        """測試用例：錯誤回應不帶 ETag"""
+        self.assertFalse(Client().get('/api/profile/').has_header('ETag'))
+        self.assertFalse(self.client.get('/api/history/?limit=0').has_header('ETag'))
+
+    def test_admin_changes_bump_version(self):
+        """測試用例：後台修改玩家的購買記錄後 ETag 改變"""
+        self._post('/api/purchase/', {'item_id': self.item.id})
+        shop_etag = self.client.get('/api/shop/')['ETag']
+        admin = site._registry[PlayerPurchase]
+        admin.delete_queryset(RequestFactory().post('/admin/'), PlayerPurchase.objects.filter(user=self.user))
+        response = self._revalidate('/api/shop/', shop_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['items'][0]['current_level'], 0)
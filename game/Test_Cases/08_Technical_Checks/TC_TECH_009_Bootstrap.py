@@ -0,0 +1,146 @@
+"""
+技術與非功能性測試 - 首次載入的 bootstrap 端點
+TC_TECH_009: /api/bootstrap/ 一個請求返回 profile、shop、achievements、history 四個端點的資料，
+查詢數固定（session、用戶與玩家資料 JOIN、全服排名），並比較首次載入的延遲
+
+延遲比較的輪數可透過環境變數調整，例如：
+    BOOTSTRAP_BENCHMARK_ROUNDS=200 python manage.py test game.Test_Cases.08_Technical_Checks
+"""
+from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+import os
+import statistics
+import time
+from game.models import Achievement, PlayerProfile, ShopItem
+
+FIRST_PAINT_URLS = ['/api/profile/', '/api/shop/', '/api/achievements/', '/api/history/?limit=10']
+
+
+class BootstrapTestCase(TestCase):
+    """bootstrap 端點測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        ShopItem.objects.create(
+            name='時間延長', item_type='time_extension', description='',
+            base_price=10, effect_value=2.0, max_level=10
+        )
+        self.pet = ShopItem.objects.create(
+            name='寵物夥伴', item_type='extra_button', description='',
+            base_price=20, effect_value=1.0, max_level=5
+        )
+        ShopItem.objects.create(
+            name='寵物能力', item_type='auto_clicker', description='',
+            base_price=30, effect_value=5.0, max_level=10
+        )
+        self.achievement = Achievement.objects.create(
+            name='單局10', description='測試成就', achievement_type='single_round',
+            target_value=10, reward_coins=5, icon='🎯'
+        )
+        Achievement.objects.create(
+            name='單局1000', description='測試成就', achievement_type='single_round',
+            target_value=1000, reward_coins=5
+        )
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'bootstrap_user'}),
+            content_type='application/json'
+        )
+        PlayerProfile.objects.filter(user__username='bootstrap_user').update(coins=1000)
+        self._post('/api/purchase/', {'item_id': self.pet.id})
+        for clicks in (12, 5):
+            self._post('/api/submit-game/', {'clicks': clicks, 'game_duration': 5.0})
+        self._post('/api/update-badges/', {'badge_1_id': self.achievement.id})
+
+    def _post(self, url, data):
+        # 執行交易提交後的回呼（寫入記錄快取），與實際請求相同
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def _get(self, url):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return json.loads(response.content)
+
+    def test_matches_separate_endpoints(self):
+        """測試用例：回應內容與四個獨立端點的資料相同"""
+        data = self._get('/api/bootstrap/')
+        profile = self._get('/api/profile/')
+        for key in ('profile', 'purchases', 'achievements', 'badges'):
+            self.assertEqual(data[key], profile[key], key)
+        self.assertEqual(data['shop_items'], self._get('/api/shop/')['items'])
+        self.assertEqual(data['achievement_list'], self._get('/api/achievements/')['achievements'])
+        self.assertEqual(data['history'], self._get('/api/history/?limit=10')['history'])
+
+        self.assertEqual(data['badges'][0]['id'], self.achievement.id)
+        self.assertEqual(data['purchases']['auto_clicker']['level'], 1)
+        self.assertEqual([session['clicks'] for session in data['history']], [5, 12])
+
+    def test_query_count(self):
+        """測試用例：目錄與記錄快取已載入時只有 session、用戶（JOIN 玩家資料）與全服排名三個查詢"""
+        self._get('/api/bootstrap/')
+        with CaptureQueriesContext(connection) as ctx:
+            self._get('/api/bootstrap/')
+        self.assertEqual(len(ctx.captured_queries), 3, [q['sql'] for q in ctx.captured_queries])
+        user_query = ctx.captured_queries[1]['sql']
+        self.assertIn('FROM "auth_user"', user_query)
+        self.assertIn('"game_playerprofile"', user_query)
+        self.assertIn('FROM "game_scoreranknode"', ctx.captured_queries[2]['sql'])
+
+        # 記錄快取未命中時多一個遊戲記錄查詢，仍不查詢購買與解鎖記錄
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self._get('/api/bootstrap/')
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        for table in ('game_playerpurchase', 'game_playerachievement'):
+            self.assertNotIn(table, tables)
+        self.assertEqual(
+            len([q for q in ctx.captured_queries if 'FROM "game_gamesession"' in q['sql']]), 1
+        )
+
+    def test_unchanged_data_returns_304(self):
+        """測試用例：If-None-Match 相同時返回 304，提交遊戲後 ETag 改變"""
+        response = self.client.get('/api/bootstrap/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/bootstrap/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self._post('/api/submit-game/', {'clicks': 3, 'game_duration': 5.0})
+        response = self.client.get('/api/bootstrap/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['history'][0]['clicks'], 3)
+
+    def test_requires_login(self):
+        """測試用例：未登入時返回 401"""
+        response = Client().get('/api/bootstrap/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', json.loads(response.content))
+
+    def _measure(self, urls, rounds):
+        """每輪依序請求 urls（模擬無瀏覽器快取的首次載入），返回 (延遲中位數毫秒, 每輪查詢數)"""
+        durations = []
+        for _ in range(rounds):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                for url in urls:
+                    self._get(url)
+                durations.append((time.perf_counter() - start) * 1000)
+        return statistics.median(durations), len(ctx.captured_queries)
+
+    def test_first_paint_latency(self):
+        """測試用例：bootstrap 的查詢數少於四個請求的總和，並輸出延遲比較"""
+        rounds = int(os.getenv('BOOTSTRAP_BENCHMARK_ROUNDS', '20'))
+        self._measure(FIRST_PAINT_URLS + ['/api/bootstrap/'], 1)  # 載入目錄與記錄快取
+
+        separate_ms, separate_queries = self._measure(FIRST_PAINT_URLS, rounds)
+        bootstrap_ms, bootstrap_queries = self._measure(['/api/bootstrap/'], rounds)
+        print(f'\n✓ 四個請求（profile/shop/achievements/history）：延遲中位數 {separate_ms:.2f}ms，查詢數 {separate_queries}')
+        print(f'✓ bootstrap 一個請求：延遲中位數 {bootstrap_ms:.2f}ms，查詢數 {bootstrap_queries}')
+        self.assertLess(bootstrap_queries, separate_queries)
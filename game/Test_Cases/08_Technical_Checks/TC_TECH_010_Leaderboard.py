@@ -0,0 +1,176 @@
+"""
+技術與非功能性測試 - 全服排行榜
+TC_TECH_010: /api/leaderboard/ 以 (分數 DESC, user_id) 索引讀取前 N 名，結果快取供所有觀看者共用；
+快取命中時不查詢資料庫，提交的分數達到門檻時才重建
+
+基準測試的玩家數量可透過環境變數調整，例如：
+    LEADERBOARD_BENCHMARK_PLAYERS=1000000 python manage.py test game.Test_Cases.08_Technical_Checks
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import json
+import os
+import statistics
+import time
+from unittest import mock
+from game import leaderboard
+from game.leaderboard import BOARDS, compute_leaderboard
+from game.models import PlayerProfile
+
+
+@override_settings(GAME_LEADERBOARD_SIZE=3)
+class LeaderboardTestCase(TestCase):
+    """排行榜測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for username, best, total in (('alice', 50, 500), ('bob', 80, 300), ('carol', 50, 900), ('dave', 10, 100)):
+            user = User.objects.create_user(username=username)
+            PlayerProfile.objects.create(user=user, best_clicks_per_round=best, total_clicks=total)
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'leaderboard_user'}),
+            content_type='application/json'
+        )
+
+    def _leaderboard(self, board=None, client=None):
+        url = '/api/leaderboard/' + (f'?board={board}' if board else '')
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return [(e['rank'], e['username'], e['score']) for e in json.loads(response.content)['entries']]
+
+    def _submit(self, clicks):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/submit-game/',
+                data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_rankings(self):
+        """測試用例：依分數由高到低排列，同分名次相同（同分時用戶 ID 小的在前），只列出前 N 名"""
+        self.assertEqual(self._leaderboard(), [(1, 'bob', 80), (2, 'alice', 50), (2, 'carol', 50)])
+        self.assertEqual(
+            self._leaderboard('total_clicks'), [(1, 'carol', 900), (2, 'alice', 500), (3, 'bob', 300)]
+        )
+        # 不需要登入
+        self.assertEqual(self._leaderboard(client=Client()), self._leaderboard())
+
+        response = self.client.get('/api/leaderboard/?board=coins')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_for_all_viewers(self):
+        """測試用例：快取命中時不查詢資料庫，資料未重建時返回 304"""
+        self._leaderboard()
+        with CaptureQueriesContext(connection) as ctx:
+            response = Client().get('/api/leaderboard/')
+        self.assertEqual(len(ctx.captured_queries), 0, [q['sql'] for q in ctx.captured_queries])
+        response = Client().get('/api/leaderboard/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_submit_below_cutoff_keeps_cache(self):
+        """測試用例：分數未達第 N 名的提交不重建排行榜"""
+        self._leaderboard()
+        etag = self.client.get('/api/leaderboard/')['ETag']
+        self._submit(20)
+        response = self.client.get('/api/leaderboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_submit_beating_cutoff_refreshes(self):
+        """測試用例：分數達到門檻的提交在交易提交後重建排行榜，只重建達到門檻的排行榜"""
+        self._leaderboard()
+        self._leaderboard('total_clicks')
+        total_etag = self.client.get('/api/leaderboard/?board=total_clicks')['ETag']
+        self._submit(60)
+        self.assertEqual(
+            self._leaderboard(), [(1, 'bob', 80), (2, 'leaderboard_user', 60), (3, 'alice', 50)]
+        )
+        response = self.client.get('/api/leaderboard/?board=total_clicks', HTTP_IF_NONE_MATCH=total_etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_refresh_during_rebuild_not_overwritten(self):
+        """測試用例：重建期間有分數達到門檻的提交時，重建的舊結果不會被之後的讀取使用"""
+        def stale_rebuild(board):
+            # 查詢完成後、寫入快取前，另一個請求提交了分數達到門檻的遊戲
+            result = original(board)
+            self._submit(60)
+            return result
+
+        original = leaderboard.compute_leaderboard
+        with mock.patch.object(leaderboard, 'compute_leaderboard', side_effect=stale_rebuild):
+            self.assertEqual(self._leaderboard(), [(1, 'bob', 80), (2, 'alice', 50), (2, 'carol', 50)])
+        self.assertEqual(
+            self._leaderboard(), [(1, 'bob', 80), (2, 'leaderboard_user', 60), (3, 'alice', 50)]
+        )
+
+    def test_deleted_user_removed(self):
+        """測試用例：刪除用戶後排行榜不再列出"""
+        self._leaderboard()
+        User.objects.get(username='bob').delete()
+        self.assertEqual(self._leaderboard(), [(1, 'alice', 50), (1, 'carol', 50), (3, 'dave', 10)])
+
+    def test_query_uses_index(self):
+        """測試用例：前 N 名的查詢由索引讀取，不排序整個資料表"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('查詢計畫格式依資料庫而不同，只在 SQLite 上檢查')
+        for board, field in BOARDS.items():
+            with CaptureQueriesContext(connection) as ctx:
+                compute_leaderboard(board)
+            sql = ctx.captured_queries[-1]['sql']
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            index_name = 'profile_best_round_idx' if field == 'best_clicks_per_round' else 'profile_total_clicks_idx'
+            self.assertIn(index_name, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class LeaderboardBenchmarkTestCase(TestCase):
+    """排行榜基準測試類：比較重建（索引查詢）與快取讀取的延遲"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_top_100_latency(self):
+        """測試用例：大量玩家時前 100 名的重建與快取讀取延遲"""
+        players = int(os.getenv('LEADERBOARD_BENCHMARK_PLAYERS', '20000'))
+        User.objects.bulk_create([User(username=f'lb_{i}') for i in range(players)], batch_size=5000)
+        user_ids = list(User.objects.filter(username__startswith='lb_').values_list('id', flat=True))
+        PlayerProfile.objects.bulk_create([
+            PlayerProfile(
+                user_id=user_id,
+                best_clicks_per_round=(user_id * 7919) % 5000,
+                total_clicks=(user_id * 104729) % 1000000,
+            )
+            for user_id in user_ids
+        ], batch_size=5000)
+
+        client = Client()
+        for board in BOARDS:
+            rebuild_ms = []
+            for _ in range(5):
+                cache.clear()
+                start_time = time.perf_counter()
+                response = client.get(f'/api/leaderboard/?board={board}')
+                rebuild_ms.append((time.perf_counter() - start_time) * 1000)
+            self.assertEqual(len(json.loads(response.content)['entries']), 100)
+
+            cached_ms = []
+            for _ in range(50):
+                start_time = time.perf_counter()
+                client.get(f'/api/leaderboard/?board={board}')
+                cached_ms.append((time.perf_counter() - start_time) * 1000)
+
+            print(
+                f'✓ {players:>9,} 個玩家（{board}）：重建延遲中位數 {statistics.median(rebuild_ms):.2f}ms，'
+                f'快取讀取延遲中位數 {statistics.median(cached_ms):.2f}ms'
+            )
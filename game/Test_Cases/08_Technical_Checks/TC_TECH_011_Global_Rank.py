@@ -0,0 +1,174 @@
+"""
+技術與非功能性測試 - 全服排名
+TC_TECH_011: 玩家資料的 global_rank 由 ScoreRankNode 樹狀陣列計算（一個查詢讀取最多 log2(n) 個節點），
+與 COUNT(*) WHERE best_clicks_per_round > x 的結果相同；最佳成績改變時在提交的交易內增量更新
+
+基準測試的玩家數量可透過環境變數調整，例如：
+    RANK_BENCHMARK_PLAYERS=1000000 python manage.py test game.Test_Cases.08_Technical_Checks
+"""
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+import json
+import os
+import random
+import statistics
+import time
+from game.models import PlayerProfile, ScoreRankNode
+from game.ranks import global_rank, move_best_score, rebuild_score_ranks
+
+
+def expected_rank(score):
+    """以 COUNT(*) 計算的排名（對照用）"""
+    if score <= 0:
+        return None
+    return PlayerProfile.objects.filter(best_clicks_per_round__gt=score).count() + 1
+
+
+def node_counts():
+    return dict(ScoreRankNode.objects.filter(players__gt=0).values_list('node', 'players'))
+
+
+@override_settings(GAME_RANK_MAX_SCORE=1023)
+class GlobalRankTestCase(TestCase):
+    """全服排名測試類"""
+
+    def setUp(self):
+        """測試前準備"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.client.post(
+            '/api/login/',
+            data=json.dumps({'username': 'rank_user'}),
+            content_type='application/json'
+        )
+        self.user = User.objects.get(username='rank_user')
+        # 建立時已有成績的玩家資料由 post_save 信號列入排名
+        for i, best in enumerate((80, 50, 50, 10, 2000)):
+            PlayerProfile.objects.create(user=User.objects.create_user(username=f'rival_{i}'), best_clicks_per_round=best)
+
+    def _submit(self, clicks):
+        response = self.client.post(
+            '/api/submit-game/',
+            data=json.dumps({'clicks': clicks, 'game_duration': 10.0}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def _profile(self, **headers):
+        return self.client.get('/api/profile/', **headers)
+
+    def test_rank_matches_count(self):
+        """測試用例：同分名次相同，超過最高分數的成績視為同分，沒有成績時沒有排名"""
+        self.assertIsNone(json.loads(self._profile().content)['profile']['global_rank'])
+        for score in (1, 10, 11, 49, 50, 51, 80, 81, 1022):
+            self.assertEqual(global_rank(score), expected_rank(score), score)
+        self.assertEqual(global_rank(50), 3)
+        # 最高分數（1023）以上與 2000 分同分
+        self.assertEqual(global_rank(1023), 1)
+        self.assertEqual(global_rank(5000), 1)
+
+    def test_submit_updates_rank(self):
+        """測試用例：刷新最佳成績的提交在同一個交易內更新排名，結果與重建相同"""
+        self._submit(60)
+        self.assertEqual(json.loads(self._profile().content)['profile']['global_rank'], 3)
+        self._submit(20)
+        self.assertEqual(json.loads(self._profile().content)['profile']['global_rank'], 3)
+        self._submit(90)
+        self.assertEqual(json.loads(self._profile().content)['profile']['global_rank'], 2)
+
+        incremental = node_counts()
+        self.assertEqual(rebuild_score_ranks(), 6)
+        self.assertEqual(node_counts(), incremental)
+
+    def test_submit_below_best_skips_rank(self):
+        """測試用例：未超過最佳成績的提交不鎖定玩家資料、不寫入排名節點"""
+        self._submit(60)
+        self.client.get('/api/bootstrap/')
+        with CaptureQueriesContext(connection) as ctx:
+            self._submit(30)
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('game_scoreranknode', sql)
+        self.assertNotIn('FOR UPDATE', sql)
+
+    def test_other_players_change_rank(self):
+        """測試用例：其他玩家超越時排名改變，玩家資料的 ETag 隨之改變；刪除用戶後從排名移除"""
+        self._submit(60)
+        etag = self._profile()['ETag']
+        self.assertEqual(self._profile(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        rival = PlayerProfile.objects.get(user__username='rival_3')
+        move_best_score(rival.best_clicks_per_round, 70)
+        PlayerProfile.objects.filter(pk=rival.pk).update(best_clicks_per_round=70)
+        response = self._profile(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['profile']['global_rank'], 4)
+
+        User.objects.filter(username__in=['rival_0', 'rival_4']).delete()
+        self.assertEqual(json.loads(self._profile().content)['profile']['global_rank'], 2)
+        self.assertEqual(global_rank(60), expected_rank(60))
+
+    def test_random_moves_match_rebuild(self):
+        """測試用例：隨機的成績變化增量更新後，每個分數的排名都與 COUNT(*) 相同"""
+        rng = random.Random(7)
+        profiles = list(PlayerProfile.objects.all())
+        for _ in range(200):
+            profile = rng.choice(profiles)
+            new_best = profile.best_clicks_per_round + rng.randint(0, 300)
+            move_best_score(profile.best_clicks_per_round, new_best)
+            profile.best_clicks_per_round = new_best
+        PlayerProfile.objects.bulk_update(profiles, ['best_clicks_per_round'])
+        for score in range(1, 1023, 7):
+            self.assertEqual(global_rank(score), expected_rank(score), score)
+
+    def test_rank_is_one_query(self):
+        """測試用例：查詢排名只讀取路徑上最多 log2(n) 個節點"""
+        with CaptureQueriesContext(connection) as ctx:
+            global_rank(1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertLessEqual(ctx.captured_queries[0]['sql'].count(','), 10)
+
+    def test_rebuild_command(self):
+        """測試用例：rebuild_score_ranks 命令由玩家資料重建節點"""
+        ScoreRankNode.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_score_ranks', stdout=out)
+        self.assertIn('5 位玩家列入排名', out.getvalue())
+        self.assertEqual(global_rank(50), 3)
+
+
+class GlobalRankBenchmarkTestCase(TestCase):
+    """全服排名基準測試類：比較樹狀陣列與 COUNT(*) 的延遲"""
+
+    def test_rank_latency(self):
+        """測試用例：大量玩家時低分玩家（需要計算最多較高分玩家）的排名延遲"""
+        players = int(os.getenv('RANK_BENCHMARK_PLAYERS', '50000'))
+        rng = random.Random(1)
+        User.objects.bulk_create([User(username=f'rank_{i}') for i in range(players)], batch_size=5000)
+        user_ids = User.objects.filter(username__startswith='rank_').values_list('id', flat=True)
+        PlayerProfile.objects.bulk_create([
+            PlayerProfile(user_id=user_id, best_clicks_per_round=rng.randint(1, 3000))
+            for user_id in user_ids
+        ], batch_size=5000)
+        rebuild_score_ranks()
+
+        for score in (5, 1500):
+            count_ms, tree_ms = [], []
+            for _ in range(20):
+                start_time = time.perf_counter()
+                expected = expected_rank(score)
+                count_ms.append((time.perf_counter() - start_time) * 1000)
+                start_time = time.perf_counter()
+                rank = global_rank(score)
+                tree_ms.append((time.perf_counter() - start_time) * 1000)
+            self.assertEqual(rank, expected)
+            print(
+                f'✓ {players:>9,} 個玩家（分數 {score}，排名 {rank:,}）：'
+                f'COUNT(*) 延遲中位數 {statistics.median(count_ms):.2f}ms，'
+                f'樹狀陣列延遲中位數 {statistics.median(tree_ms):.2f}ms'
+            )
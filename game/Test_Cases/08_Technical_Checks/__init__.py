@@ -5,10 +5,31 @@
 
 from .TC_TECH_001_Performance import PerformanceTestCase
 from .TC_TECH_002_Validation_Edge_Cases import ValidationEdgeCasesTestCase, FrontendUnitTestCase
+from .TC_TECH_003_Session_Index_Benchmark import SessionIndexBenchmarkTestCase
+from .TC_TECH_004_Submit_Concurrency_Benchmark import SubmitConcurrencyBenchmarkTestCase
+from .TC_TECH_005_Idempotency_Keys import IdempotencyKeyTestCase
+from .TC_TECH_006_Session_Write_Behind import SessionWriteBehindTestCase
+from .TC_TECH_007_Session_Archive import SessionArchiveTestCase, SessionPartitionTestCase
+from .TC_TECH_008_Conditional_Get import ConditionalGetTestCase
+from .TC_TECH_009_Bootstrap import BootstrapTestCase
+from .TC_TECH_010_Leaderboard import LeaderboardTestCase, LeaderboardBenchmarkTestCase
+from .TC_TECH_011_Global_Rank import GlobalRankTestCase, GlobalRankBenchmarkTestCase
 
 __all__ = [
     'PerformanceTestCase',
     'ValidationEdgeCasesTestCase',
     'FrontendUnitTestCase',
+    'SessionIndexBenchmarkTestCase',
+    'SubmitConcurrencyBenchmarkTestCase',
+    'IdempotencyKeyTestCase',
+    'SessionWriteBehindTestCase',
+    'SessionArchiveTestCase',
+    'SessionPartitionTestCase',
+    'ConditionalGetTestCase',
+    'BootstrapTestCase',
+    'LeaderboardTestCase',
+    'LeaderboardBenchmarkTestCase',
+    'GlobalRankTestCase',
+    'GlobalRankBenchmarkTestCase',
 ]
 
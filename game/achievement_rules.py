@@ -0,0 +1,134 @@
+"""
+成就規則登錄表
+
+每種 achievement_type 對應一個規則：rule.value(context) 計算玩家目前的數值（與 target_value 比較），
+rule.inputs 宣告規則依賴的玩家資料欄位或事件資料。提交遊戲、購買、對戰時呼叫端傳入本次變更的輸入
+（SUBMIT_INPUTS / PURCHASE_INPUTS / BATTLE_INPUTS），成就索引只對依賴這些輸入、
+目錄中有成就且尚有未解鎖門檻的類型計算數值；目錄中沒有的類型不增加任何請求的成本。
+
+新增類型以 register_rule 登錄（登錄後目錄重新編譯索引時生效）：
+- 只依賴玩家資料欄位的規則，成就進度 API 由玩家資料的一列計算，不需要額外查詢；
+- 宣告 profile_field 的規則（數值即玩家資料的一個欄位），backfill_achievements 可以集合式補發；
+- 依賴事件資料（例如每日統計）的規則只在該事件發生時查詢一次，成就進度 API 不提供進度。
+"""
+from datetime import timedelta
+from django.utils import timezone
+from .catalog import get_catalog
+from .daily_stats import utc_day
+from .models import PlayerDailyStats
+
+# 玩家資料中可作為規則輸入的欄位
+PROFILE_INPUTS = frozenset({
+    'coins', 'total_clicks', 'best_clicks_per_round', 'total_games_played', 'battle_wins', 'purchase_levels',
+})
+
+# 各事件變更的輸入（'daily_stats' 為提交遊戲時累加的每日統計）
+SUBMIT_INPUTS = frozenset({'coins', 'total_clicks', 'best_clicks_per_round', 'total_games_played', 'daily_stats'})
+PURCHASE_INPUTS = frozenset({'coins', 'purchase_levels'})
+BATTLE_INPUTS = frozenset({'coins', 'battle_wins'})
+
+RULES = {}
+
+
+class AchievementRule:
+    """一種成就類型的數值計算方式與依賴的輸入"""
+
+    __slots__ = ('achievement_type', 'inputs', 'value', 'profile_field')
+
+    def __init__(self, achievement_type, inputs, value, profile_field=None):
+        self.achievement_type = achievement_type
+        self.inputs = frozenset(inputs)
+        self.value = value
+        self.profile_field = profile_field
+
+    @property
+    def profile_only(self):
+        """數值只由玩家資料計算（不需要查詢）"""
+        return self.inputs <= PROFILE_INPUTS
+
+
+def register_rule(achievement_type, inputs, profile_field=None):
+    """登錄成就類型的規則（裝飾數值函式 value(context)）"""
+    def decorator(value):
+        RULES[achievement_type] = AchievementRule(achievement_type, inputs, value, profile_field)
+        return value
+    return decorator
+
+
+def register_profile_counter(achievement_type, field):
+    """登錄數值即玩家資料一個欄位的規則"""
+    register_rule(achievement_type, (field,), profile_field=field)(
+        lambda context: getattr(context.profile, field)
+    )
+
+
+def profile_counter_fields():
+    """成就類型 -> 玩家資料欄位（宣告 profile_field 的規則，可在 SQL 中與目標值比較）"""
+    return {rule.achievement_type: rule.profile_field for rule in RULES.values() if rule.profile_field}
+
+
+def profile_values(profile):
+    """只依賴玩家資料的規則的目前數值（成就進度使用，不查詢資料庫）"""
+    context = RuleContext(profile.user_id, profile)
+    return {
+        achievement_type: rule.value(context)
+        for achievement_type, rule in RULES.items() if rule.profile_only
+    }
+
+
+class RuleContext:
+    """規則計算時的輸入：更新後的玩家資料，事件資料在第一次使用時查詢一次"""
+
+    def __init__(self, user_id, profile, index=None):
+        self.user_id = user_id
+        self.profile = profile
+        self.index = index
+        self._recent_days = None
+
+    @property
+    def recent_days(self):
+        """最近幾天（涵蓋 consecutive_days 的最大目標值）每天的遊戲局數 {UTC 日期: 局數}"""
+        if self._recent_days is None:
+            thresholds = self.index.thresholds.get('consecutive_days') if self.index else None
+            window = max(thresholds[-1] if thresholds else 1, 1)
+            today = utc_day(timezone.now())
+            self._recent_days = dict(
+                PlayerDailyStats.objects.filter(
+                    user_id=self.user_id, day__gt=today - timedelta(days=window), day__lte=today
+                ).values_list('day', 'games_played')
+            )
+        return self._recent_days
+
+
+register_profile_counter('total_clicks', 'total_clicks')
+# 單局成就以最佳單局判斷（提交時最佳單局已包含本次的點擊數）
+register_profile_counter('single_round', 'best_clicks_per_round')
+register_profile_counter('total_games', 'total_games_played')
+register_profile_counter('coins_held', 'coins')
+register_profile_counter('battle_wins', 'battle_wins')
+
+
+@register_rule('pets_owned', inputs=('purchase_levels',))
+def pets_owned(context):
+    """擁有的寵物數量（寵物夥伴的等級）"""
+    item = get_catalog().shop_item_of_type('extra_button')
+    if item is None:
+        return 0
+    return (context.profile.purchase_levels or {}).get(str(item.id), 0)
+
+
+@register_rule('games_in_a_day', inputs=('daily_stats',))
+def games_in_a_day(context):
+    """今天（UTC）的遊戲局數"""
+    return context.recent_days.get(utc_day(timezone.now()), 0)
+
+
+@register_rule('consecutive_days', inputs=('daily_stats',))
+def consecutive_days(context):
+    """到今天（UTC）為止連續遊戲的天數"""
+    day = utc_day(timezone.now())
+    streak = 0
+    while context.recent_days.get(day, 0) > 0:
+        streak += 1
+        day -= timedelta(days=1)
+    return streak
@@ -0,0 +1,279 @@
+"""
+成就門檻索引（程序內編譯快取）
+
+將成就目錄依 achievement_type 編譯成排序後的門檻列表，提交遊戲時以 bisect
+找出新跨越的門檻；每個玩家的已解鎖狀態以精簡的集合與「已檢查位置」快取，
+每次提交只檢查上次位置之後、新數值以下的門檻，成本與成就總數無關。
+
+每種類型的數值由 game.achievement_rules 的規則計算，事件只檢查規則依賴其變更輸入的類型。
+
+索引由目錄快取（game.catalog）中的成就編譯，每個目錄版本編譯一次；
+Achievement 變更時（post_save / post_delete）目錄失效，索引隨之重新編譯；
+PlayerAchievement 變更時只移除該玩家的狀態。
+
+玩家的已解鎖成就另以位元組保存在 PlayerProfile.achievement_bits（成就 ID n 對應第 n 個位元，
+等同以小端序編碼的整數），讀取 API 與解鎖狀態不需要查詢 PlayerAchievement；
+提交遊戲的解鎖以比較並交換寫入位元組，與 PlayerAchievement 的 bulk_create 在同一個交易內，
+其他寫入 PlayerAchievement 的路徑（後台、管理命令）由信號重新計算該玩家的位元組。
+"""
+from bisect import bisect_right
+from django.db import transaction
+from django.db.models import BinaryField, F, Func, Value
+from .achievement_rules import RULES
+from .catalog import get_catalog, invalidate_catalog
+from .counters import grant_achievements
+from .local_cache import LocalCache
+from .models import PlayerAchievement, PlayerProfile
+
+# 程序內最多快取的玩家解鎖狀態數量（LRU）
+UNLOCK_STATE_CACHE_SIZE = 10000
+
+_unlock_state_cache = LocalCache(maxsize=UNLOCK_STATE_CACHE_SIZE)
+
+
+def encode_unlocked(achievement_ids):
+    """成就 ID 集合編碼為位元組（不含結尾的 0 位元組，相同集合的編碼唯一）"""
+    value = 0
+    for achievement_id in achievement_ids:
+        value |= 1 << achievement_id
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def decode_unlocked(bits):
+    """位元組解碼為成就 ID 集合"""
+    value = int.from_bytes(bytes(bits or b''), 'little')
+    unlocked = set()
+    while value:
+        lowest = value & -value
+        unlocked.add(lowest.bit_length() - 1)
+        value ^= lowest
+    return unlocked
+
+
+def is_unlocked(bits, achievement_id):
+    """位元組中是否包含該成就（不需要解碼整個集合）"""
+    bits = bits or b''
+    position = achievement_id >> 3
+    return position < len(bits) and bool(bits[position] >> (achievement_id & 7) & 1)
+
+
+def add_unlocked(bits, achievement_id):
+    """位元組加入一個成就（已包含時返回相同的位元組）"""
+    value = int.from_bytes(bytes(bits or b''), 'little') | 1 << achievement_id
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+class AddUnlockedBit(Func):
+    """在 UPDATE 或查詢條件中將成就加入 achievement_bits，結果與 add_unlocked 相同
+
+    PostgreSQL 以 get_byte / set_byte 計算（位元組長度不足時補 0）；
+    SQLite 使用連線建立時註冊的 game_add_unlocked 函式（見 game.signals）。
+    """
+    function = 'game_add_unlocked'
+    output_field = BinaryField()
+
+    def __init__(self, achievement_id):
+        self.achievement_id = int(achievement_id)
+        super().__init__(F('achievement_bits'), Value(self.achievement_id))
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        bits, params = compiler.compile(self.source_expressions[0])
+        position, mask = self.achievement_id >> 3, 1 << (self.achievement_id & 7)
+        padded = (
+            f"(CASE WHEN length({bits}) > {position} THEN {bits} "
+            f"ELSE {bits} || decode(repeat('00', {position + 1} - length({bits})), 'hex') END)"
+        )
+        return f'set_byte({padded}, {position}, get_byte({padded}, {position}) | {mask})', params * 8
+
+
+def progress_percent(value, target_value):
+    """目前數值相對目標值的完成百分比（0-100，保留一位小數）"""
+    if target_value <= 0:
+        return 100.0
+    return round(min(value, target_value) * 100 / target_value, 1)
+
+
+class AchievementIndex:
+    """編譯後的成就目錄：每種類型一組排序後的門檻值"""
+
+    def __init__(self, achievements):
+        self.by_id = {}
+        self.thresholds = {}
+        self.ids = {}
+        self._types_by_inputs = {}
+        grouped = {}
+        for achievement in achievements:
+            if achievement.achievement_type not in RULES:
+                continue
+            self.by_id[achievement.id] = {
+                'id': achievement.id,
+                'name': achievement.name,
+                'description': achievement.description,
+                'icon': achievement.icon,
+                'reward_coins': achievement.reward_coins,
+            }
+            grouped.setdefault(achievement.achievement_type, []).append(
+                (achievement.target_value, achievement.id)
+            )
+        for achievement_type, entries in grouped.items():
+            entries.sort()
+            self.thresholds[achievement_type] = [target for target, _ in entries]
+            self.ids[achievement_type] = [achievement_id for _, achievement_id in entries]
+
+    def reached(self, achievement_type, value):
+        """目標值 <= value 的門檻數量（排序列表中的位置）"""
+        return bisect_right(self.thresholds.get(achievement_type, ()), value)
+
+    def types_for(self, inputs):
+        """目錄中有成就、且規則依賴 inputs（frozenset）中任一輸入的類型（依輸入組合快取）"""
+        types = self._types_by_inputs.get(inputs)
+        if types is None:
+            types = tuple(
+                achievement_type for achievement_type in self.ids
+                if RULES[achievement_type].inputs & inputs
+            )
+            self._types_by_inputs[inputs] = types
+        return types
+
+
+class UnlockState:
+    """單一玩家的已解鎖狀態
+
+    unlocked: 已解鎖的成就 ID 集合
+    checked: 每種類型已確認全部解鎖的門檻數量（排序列表的前綴長度）
+    """
+
+    __slots__ = ('index', 'unlocked', 'checked')
+
+    def __init__(self, index, unlocked):
+        self.index = index
+        self.unlocked = set(unlocked)
+        self.checked = {}
+        for achievement_type, ids in index.ids.items():
+            position = 0
+            while position < len(ids) and ids[position] in self.unlocked:
+                position += 1
+            self.checked[achievement_type] = position
+
+    def pending(self, types):
+        """types 中尚有未解鎖門檻的類型（全部解鎖的類型不需要計算數值）"""
+        return [
+            achievement_type for achievement_type in types
+            if self.checked.get(achievement_type, 0) < len(self.index.ids[achievement_type])
+        ]
+
+    def crossed(self, values):
+        """找出新跨越且尚未解鎖的成就 ID
+
+        Args:
+            values: 類型 -> 目前數值（例如 {'total_clicks': 1200, ...}）
+
+        Returns:
+            tuple: (成就 ID 列表, 類型 -> 新的已檢查位置)
+        """
+        crossed_ids = []
+        reached = {}
+        for achievement_type, value in values.items():
+            start = self.checked.get(achievement_type, 0)
+            end = self.index.reached(achievement_type, value)
+            if end <= start:
+                continue
+            reached[achievement_type] = end
+            crossed_ids.extend(
+                achievement_id
+                for achievement_id in self.index.ids[achievement_type][start:end]
+                if achievement_id not in self.unlocked
+            )
+        return crossed_ids, reached
+
+    def advance(self, reached, unlocked_ids):
+        """記錄新解鎖的成就與新的已檢查位置"""
+        self.unlocked.update(unlocked_ids)
+        for achievement_type, position in reached.items():
+            if position > self.checked.get(achievement_type, 0):
+                self.checked[achievement_type] = position
+
+
+def get_achievement_index():
+    """獲取編譯後的成就索引（目錄版本未變動時不查詢資料庫）"""
+    return get_catalog().achievement_index
+
+
+def get_unlock_state(user_id, index=None, bits=None):
+    """獲取玩家的已解鎖狀態
+
+    快取未命中或索引已重建時由已解鎖成就位元組重建；
+    呼叫端已有玩家資料時傳入 bits，否則查詢一次玩家資料的位元組欄位。
+    """
+    index = index or get_achievement_index()
+    state = _unlock_state_cache.get(user_id)
+    if state is None or state.index is not index:
+        if bits is None:
+            bits = PlayerProfile.objects.filter(user_id=user_id).values_list(
+                'achievement_bits', flat=True
+            ).first()
+        state = UnlockState(index, decode_unlocked(bits))
+        _unlock_state_cache.set(user_id, state)
+    return state
+
+
+def store_unlock_state(user_id, state):
+    """寫回玩家的已解鎖狀態（解鎖成就後呼叫）"""
+    _unlock_state_cache.set(user_id, state)
+
+
+def unlock_achievements(user, profile, achievement_ids, index):
+    """寫入新跨越的成就，返回 (新解鎖的成就 ID 列表, 更新後的 PlayerProfile)
+
+    以 profile 的位元組排除已解鎖的成就後，在一個交易內以比較並交換寫入位元組與獎勵金幣，
+    成功後 bulk_create 解鎖記錄；位元組已被並發的提交修改時重新讀取後重試，
+    每個成就只有一個請求能寫入位元並發放獎勵。
+    """
+    bits = bytes(profile.achievement_bits or b'')
+    while True:
+        unlocked = decode_unlocked(bits)
+        new_ids = [achievement_id for achievement_id in achievement_ids if achievement_id not in unlocked]
+        if not new_ids:
+            return [], profile
+        reward_coins = sum(index.by_id[achievement_id]['reward_coins'] for achievement_id in new_ids)
+        with transaction.atomic():
+            updated = grant_achievements(user, bits, encode_unlocked(unlocked.union(new_ids)), reward_coins)
+            if updated is not None:
+                PlayerAchievement.objects.bulk_create([
+                    PlayerAchievement(
+                        user=user,
+                        achievement_id=achievement_id,
+                        reward_claimed=(index.by_id[achievement_id]['reward_coins'] > 0)
+                    )
+                    for achievement_id in new_ids
+                ], ignore_conflicts=True)
+                # bulk_create 不發送信號，主動移除玩家狀態（交易回滾時快取一併失效）
+                invalidate_unlock_state(user.id)
+                return new_ids, updated
+        bits = PlayerProfile.objects.filter(user=user).values_list('achievement_bits', flat=True).first()
+        if bits is None:
+            return [], profile
+        bits = bytes(bits)
+
+
+def sync_achievement_bits(user_id):
+    """以解鎖記錄重新計算玩家的已解鎖成就位元組並遞增資料版本（後台或管理命令修改解鎖記錄後使用）"""
+    with transaction.atomic():
+        # 先遞增資料版本取得資料列鎖，與其他同步或提交的解鎖依序進行
+        if not PlayerProfile.objects.filter(user_id=user_id).update(data_version=F('data_version') + 1):
+            return
+        achievement_ids = PlayerAchievement.objects.filter(user_id=user_id).values_list(
+            'achievement_id', flat=True
+        )
+        PlayerProfile.objects.filter(user_id=user_id).update(achievement_bits=encode_unlocked(achievement_ids))
+
+
+def invalidate_achievement_index():
+    """成就目錄變更：目錄（與其中的索引）與所有玩家狀態失效"""
+    invalidate_catalog()
+    _unlock_state_cache.mark_dirty()
+
+
+def invalidate_unlock_state(user_id=None):
+    """玩家解鎖記錄變更：移除該玩家（或全部玩家）的狀態"""
+    _unlock_state_cache.mark_dirty(user_id)
@@ -1,24 +1,71 @@
 from django.contrib import admin
 from .models import (
     PlayerProfile, GameSession, ShopItem, 
-    PlayerPurchase, Achievement, PlayerAchievement
+    PlayerPurchase, Achievement, PlayerAchievement, UserSession, PlayerDailyStats
 )
+from .achievements import invalidate_unlock_state, sync_achievement_bits
+from .etags import bump_data_version
+from .history_cache import invalidate_history
+from .purchases import sync_purchase_levels
+from .ranks import move_best_score
+
+
+class PlayerDataAdmin(admin.ModelAdmin):
+    """玩家資料相關的後台：儲存或刪除後遞增玩家的資料版本，使讀取 API 的 ETag 失效"""
+
+    def player_data_changed(self, user_id):
+        bump_data_version(user_id)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.player_data_changed(obj.user_id)
+        if change and 'user' in form.changed_data and form.initial.get('user'):
+            self.player_data_changed(form.initial['user'])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.player_data_changed(obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_id in user_ids:
+            self.player_data_changed(user_id)
 
 
 @admin.register(PlayerProfile)
-class PlayerProfileAdmin(admin.ModelAdmin):
+class PlayerProfileAdmin(PlayerDataAdmin):
     list_display = ['user', 'coins', 'total_clicks', 'best_clicks_per_round', 'total_games_played']
     search_fields = ['user__username']
     list_filter = ['created_at']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # 修改最佳成績時更新全服排名（新增的玩家資料由 post_save 信號列入）
+        if change and 'best_clicks_per_round' in form.changed_data:
+            move_best_score(form.initial.get('best_clicks_per_round') or 0, obj.best_clicks_per_round)
+
 
 @admin.register(GameSession)
-class GameSessionAdmin(admin.ModelAdmin):
+class GameSessionAdmin(PlayerDataAdmin):
     list_display = ['user', 'clicks', 'game_duration', 'coins_earned', 'played_at']
     list_filter = ['played_at']
     search_fields = ['user__username']
     date_hierarchy = 'played_at'
 
+    # 後台修改遊戲記錄不改變遊戲局數，需要主動刪除玩家的記錄快取
+    def player_data_changed(self, user_id):
+        super().player_data_changed(user_id)
+        invalidate_history(user_id)
+
+
+@admin.register(PlayerDailyStats)
+class PlayerDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'day', 'games_played', 'total_clicks', 'coins_earned', 'best_clicks']
+    list_filter = ['day']
+    search_fields = ['user__username']
+    date_hierarchy = 'day'
+
 
 @admin.register(ShopItem)
 class ShopItemAdmin(admin.ModelAdmin):
@@ -27,11 +74,15 @@ class ShopItemAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlayerPurchase)
-class PlayerPurchaseAdmin(admin.ModelAdmin):
+class PlayerPurchaseAdmin(PlayerDataAdmin):
     list_display = ['user', 'shop_item', 'level', 'price_paid', 'purchased_at']
     list_filter = ['shop_item', 'purchased_at']
     search_fields = ['user__username']
 
+    # 後台修改購買記錄後，以購買記錄重新計算玩家資料的購買等級（同時遞增資料版本）
+    def player_data_changed(self, user_id):
+        sync_purchase_levels(user_id)
+
 
 @admin.register(Achievement)
 class AchievementAdmin(admin.ModelAdmin):
@@ -44,3 +95,17 @@ class PlayerAchievementAdmin(admin.ModelAdmin):
     list_display = ['user', 'achievement', 'unlocked_at', 'reward_claimed']
     list_filter = ['unlocked_at', 'reward_claimed']
     search_fields = ['user__username']
+
+    # 儲存與刪除由 post_save / post_delete 信號重新計算玩家的已解鎖成就位元組（同時遞增資料版本），
+    # 只有改變記錄的玩家時，信號不會處理原本的玩家
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'user' in form.changed_data and form.initial.get('user'):
+            sync_achievement_bits(form.initial['user'])
+            invalidate_unlock_state(form.initial['user'])
+
+
+@admin.register(UserSession)
+class UserSessionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'session_key', 'created_at']
+    search_fields = ['user__username']
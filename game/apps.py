@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        # 註冊信號處理（用戶 Session 索引維護、成就索引失效等）
+        from . import signals  # noqa: F401
@@ -0,0 +1,109 @@
+"""
+無狀態簽名登入憑證（可選模式，GAME_STATELESS_AUTH = True 時啟用）
+
+憑證以 HMAC 簽名（django.core.signing，使用 SECRET_KEY）攜帶用戶 ID、用戶名稱
+與撤銷計數（PlayerProfile.auth_epoch），解析時不需要查詢 django_session 與 auth_user。
+單一會話策略改為遞增撤銷計數：計數改變後，所有舊憑證立即失效。
+
+撤銷計數會快取在 Django cache 中（GAME_AUTH_EPOCH_CACHE_TIMEOUT 秒），
+快取未命中時才查詢一次 PlayerProfile。
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import F
+from .models import PlayerProfile
+
+TOKEN_SALT = 'game.auth_token'
+EPOCH_CACHE_KEY = 'game:auth_epoch:{user_id}'
+
+
+def stateless_auth_enabled():
+    """是否啟用無狀態簽名憑證模式"""
+    return getattr(settings, 'GAME_STATELESS_AUTH', False)
+
+
+def _epoch_cache_timeout():
+    return getattr(settings, 'GAME_AUTH_EPOCH_CACHE_TIMEOUT', 60)
+
+
+def issue_token(user, epoch):
+    """簽發登入憑證（壓縮的 JSON 陣列：[用戶ID, 用戶名稱, 撤銷計數] + 時間戳 + 簽名）"""
+    cache.set(EPOCH_CACHE_KEY.format(user_id=user.id), epoch, _epoch_cache_timeout())
+    return signing.dumps([user.id, user.username, epoch], salt=TOKEN_SALT, compress=True)
+
+
+def get_current_epoch(user_id):
+    """獲取用戶目前的撤銷計數（優先使用快取），用戶資料不存在時返回 None"""
+    cache_key = EPOCH_CACHE_KEY.format(user_id=user_id)
+    epoch = cache.get(cache_key)
+    if epoch is None:
+        epoch = PlayerProfile.objects.filter(user_id=user_id).values_list('auth_epoch', flat=True).first()
+        if epoch is not None:
+            cache.set(cache_key, epoch, _epoch_cache_timeout())
+    return epoch
+
+
+def revoke_tokens(user):
+    """遞增用戶的撤銷計數，使所有已簽發的憑證失效
+
+    Returns:
+        int: 新的撤銷計數
+    """
+    PlayerProfile.objects.filter(user=user).update(auth_epoch=F('auth_epoch') + 1)
+    epoch = PlayerProfile.objects.filter(user=user).values_list('auth_epoch', flat=True).first() or 0
+    cache.set(EPOCH_CACHE_KEY.format(user_id=user.id), epoch, _epoch_cache_timeout())
+    return epoch
+
+
+def get_token_from_request(request):
+    """從 Authorization: Bearer 標頭或 cookie 讀取憑證"""
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[len('Bearer '):].strip() or None
+    cookie_name = getattr(settings, 'GAME_AUTH_TOKEN_COOKIE_NAME', 'cf_auth')
+    return request.COOKIES.get(cookie_name)
+
+
+def user_from_token(token):
+    """驗證憑證並返回輕量的 User 物件（只包含 id 與 username），無效時返回 None
+
+    返回的 User 沒有從 auth_user 載入，只適合依 id/username 操作的 API 視圖，不可呼叫 save()。
+    """
+    try:
+        user_id, username, epoch = signing.loads(
+            token,
+            salt=TOKEN_SALT,
+            max_age=settings.SESSION_COOKIE_AGE,
+        )
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+    if get_current_epoch(user_id) != epoch:
+        return None
+
+    user = User(id=user_id, username=username)
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+def set_token_cookie(response, token):
+    """將憑證寫入 HttpOnly cookie（沿用 session cookie 的安全設定）"""
+    response.set_cookie(
+        getattr(settings, 'GAME_AUTH_TOKEN_COOKIE_NAME', 'cf_auth'),
+        token,
+        max_age=settings.SESSION_COOKIE_AGE,
+        httponly=True,
+        secure=settings.SESSION_COOKIE_SECURE,
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
+
+
+def delete_token_cookie(response):
+    """刪除憑證 cookie"""
+    response.delete_cookie(
+        getattr(settings, 'GAME_AUTH_TOKEN_COOKIE_NAME', 'cf_auth'),
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
@@ -0,0 +1,25 @@
+"""
+認證後端：載入 session 用戶時以 JOIN 一併取得玩家資料
+
+預設的 ModelBackend 每個請求以一個查詢讀取 auth_user，視圖再以另一個查詢讀取 PlayerProfile；
+PlayerModelBackend 以 select_related 在同一個查詢中取得兩者，
+get_or_create_profile 直接使用已載入的玩家資料（見 game.views）。
+
+session 用戶由 AuthenticationMiddleware 以 session 記錄的後端載入，這個後端對所有路徑（包含後台）生效：
+只改寫 get_user（LEFT JOIN，沒有玩家資料的管理員帳號不受影響），
+密碼登入、權限判斷與停用帳號的檢查都繼承自 ModelBackend。
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class PlayerModelBackend(ModelBackend):
+    """ModelBackend + 玩家資料 JOIN（登入與權限判斷與 ModelBackend 相同）"""
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('player_profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
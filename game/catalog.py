@@ -0,0 +1,133 @@
+"""
+靜態目錄快取（ShopItem 與 Achievement）
+
+商店物品與成就只在 init_game_data 或後台修改時變動。每個程序載入一次兩張表，
+編譯成不可變的查詢表（依 id、依類型），之後的請求直接從記憶體讀取，不查詢資料庫。
+
+失效機制：
+- ShopItem / Achievement 儲存或刪除時（post_save / post_delete）清除本程序的快取，
+  並在交易提交後更新 Django cache 中的版本戳記；其他程序在下次讀取時發現版本不同即重新載入
+- 未設定共用的快取（多程序各自的 LocMemCache）時，版本戳記無法跨程序傳遞，
+  快取在 GAME_CATALOG_TTL 秒後仍會重新載入，限制過期資料的最長時間
+"""
+from collections import namedtuple
+from types import MappingProxyType
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .local_cache import LocalCache
+from .models import Achievement, ShopItem
+
+CATALOG_VERSION_KEY = 'game:catalog:version'
+
+ShopItemEntry = namedtuple('ShopItemEntry', [
+    'id', 'name', 'item_type', 'description', 'base_price', 'effect_value', 'max_level',
+])
+AchievementEntry = namedtuple('AchievementEntry', [
+    'id', 'name', 'description', 'achievement_type', 'target_value', 'reward_coins', 'icon',
+])
+
+_catalog_cache = LocalCache(maxsize=1)
+
+
+def _ttl():
+    return getattr(settings, 'GAME_CATALOG_TTL', 300)
+
+
+class Catalog:
+    """某個版本的商店物品與成就目錄（載入後不再修改）"""
+
+    def __init__(self, version, shop_items, achievements):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # 依 id 排序，與原本 ShopItem.objects.all() / filter(...).first() 的順序一致
+        self.shop_items = tuple(sorted(shop_items, key=lambda item: item.id))
+        self.shop_items_by_id = MappingProxyType({item.id: item for item in self.shop_items})
+        first_by_type = {}
+        for item in self.shop_items:
+            first_by_type.setdefault(item.item_type, item)
+        self.shop_items_by_type = MappingProxyType(first_by_type)
+
+        self.achievements = tuple(sorted(achievements, key=lambda achievement: achievement.id))
+        self.achievements_by_id = MappingProxyType({a.id: a for a in self.achievements})
+        grouped = {}
+        for achievement in self.achievements:
+            grouped.setdefault(achievement.achievement_type, []).append(achievement)
+        self.achievements_by_type = MappingProxyType({
+            achievement_type: tuple(entries) for achievement_type, entries in grouped.items()
+        })
+        self._achievement_index = None
+        # 內容摘要（ETag 使用）：版本戳記無法跨程序傳遞時，內容改變仍會產生不同的摘要
+        self.digest = hashlib.sha256(
+            repr((self.shop_items, self.achievements)).encode('utf-8')
+        ).hexdigest()[:16]
+
+    def shop_item(self, item_id):
+        """依 id 獲取商店物品，不存在時返回 None"""
+        return self.shop_items_by_id.get(item_id)
+
+    def shop_item_of_type(self, item_type):
+        """某種類型的商店物品（同類型有多個時取 id 最小的），不存在時返回 None"""
+        return self.shop_items_by_type.get(item_type)
+
+    def achievement(self, achievement_id):
+        """依 id 獲取成就，不存在時返回 None"""
+        return self.achievements_by_id.get(achievement_id)
+
+    @property
+    def achievement_index(self):
+        """由這個版本的成就編譯的門檻索引（第一次使用時編譯）"""
+        if self._achievement_index is None:
+            from .achievements import AchievementIndex
+            self._achievement_index = AchievementIndex(self.achievements)
+        return self._achievement_index
+
+    def expired(self, version):
+        return version != self.version or time.monotonic() - self.loaded_at >= _ttl()
+
+
+def _current_version():
+    """共用快取中的目錄版本戳記（不存在時建立一個）"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def load_catalog(version):
+    """從資料庫載入目錄（兩個查詢）"""
+    shop_items = [
+        ShopItemEntry(*row)
+        for row in ShopItem.objects.values_list(*ShopItemEntry._fields)
+    ]
+    achievements = [
+        AchievementEntry(*row)
+        for row in Achievement.objects.values_list(*AchievementEntry._fields)
+    ]
+    return Catalog(version, shop_items, achievements)
+
+
+def get_catalog():
+    """獲取目前的目錄（版本未變動時不查詢資料庫）"""
+    # 先讀取版本再載入資料：載入期間有新的修改時，下次讀取會發現版本不同
+    version = _current_version()
+    catalog = _catalog_cache.get('catalog')
+    if catalog is None or catalog.expired(version):
+        catalog = load_catalog(version)
+        _catalog_cache.set('catalog', catalog)
+    return catalog
+
+
+def _bump_version():
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_catalog():
+    """商店物品或成就變更：本程序的目錄立即失效，交易提交後更新版本戳記通知其他程序"""
+    _catalog_cache.mark_dirty()
+    _bump_version()
+    transaction.on_commit(_bump_version)
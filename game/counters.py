@@ -0,0 +1,121 @@
+"""
+玩家資料計數器的原子更新（不使用 select_for_update 的讀取-修改-寫入）
+
+以單一條件 UPDATE 搭配 F() 表達式（最佳成績使用 Greatest）直接在資料庫中累加，
+並以 UPDATE ... RETURNING 取回更新後的整列資料，資料列鎖只在這一個語句期間持有。
+同一玩家的並發提交不再互相等待讀取，成就判斷可以在鎖外依返回值進行。
+
+不支援 UPDATE ... RETURNING 的資料庫會退回 UPDATE + SELECT（同一個交易內）。
+每次更新同時遞增 data_version，使讀取 API 的 ETag 失效（見 game.etags）。
+"""
+from django.db import connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+from .models import PlayerProfile
+
+
+def _supports_update_returning(connection):
+    # PostgreSQL 與 SQLite 3.35+ 的 UPDATE 與 INSERT 同樣支援 RETURNING
+    return (
+        connection.vendor in ('postgresql', 'sqlite')
+        and connection.features.can_return_columns_from_insert
+    )
+
+
+def _convert_row(connection, fields, row):
+    """套用資料庫後端與欄位的轉換器（例如 SQLite 的日期時間字串）"""
+    values = []
+    for field, value in zip(fields, row):
+        expression = field.get_col(field.model._meta.db_table)
+        converters = (
+            connection.ops.get_db_converters(expression)
+            + expression.get_db_converters(connection)
+        )
+        for converter in converters:
+            value = converter(value, expression, connection)
+        values.append(value)
+    return values
+
+
+def _update_returning(user, where=None, **updates):
+    """對玩家資料執行單一 UPDATE 並返回更新後的 PlayerProfile
+
+    where 為額外的更新條件（例如 coins__gte），資料不存在或不符合條件時返回 None。
+    """
+    updates.setdefault('updated_at', timezone.now())
+    updates.setdefault('data_version', F('data_version') + 1)
+    queryset = PlayerProfile.objects.filter(user=user, **(where or {}))
+    connection = connections[queryset.db]
+
+    if not _supports_update_returning(connection):
+        with transaction.atomic(using=queryset.db):
+            if not queryset.update(**updates):
+                return None
+            # 更新後可能已不符合 where 條件，以用戶重新讀取
+            return PlayerProfile.objects.using(queryset.db).get(user=user)
+
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(updates)
+    sql, params = query.get_compiler(queryset.db).as_sql()
+    fields = PlayerProfile._meta.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {columns}', params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return PlayerProfile.from_db(
+        queryset.db,
+        [field.attname for field in fields],
+        _convert_row(connection, fields, row),
+    )
+
+
+def apply_game_result(user, clicks, coins_earned, games_played=1, best_clicks=None):
+    """原子地累加遊戲結果，返回更新後的 PlayerProfile
+
+    coins / total_clicks / total_games_played 以 F() 累加，
+    best_clicks_per_round 以 Greatest 取較大值，整個更新只有一個語句。
+    批量提交多局時傳入合計的點擊數與金幣、局數與其中的最佳點擊數。
+    """
+    if best_clicks is None:
+        best_clicks = clicks
+    updates = {
+        'coins': F('coins') + coins_earned,
+        'total_clicks': F('total_clicks') + clicks,
+        'total_games_played': F('total_games_played') + games_played,
+        'best_clicks_per_round': Greatest('best_clicks_per_round', Value(best_clicks)),
+    }
+    profile = _update_returning(user, **updates)
+    if profile is None:
+        # 玩家資料不存在（舊帳號），建立後再更新一次
+        PlayerProfile.objects.get_or_create(user=user)
+        profile = _update_returning(user, **updates)
+    return profile
+
+
+def credit_coins(user, amount):
+    """原子地增加金幣（例如成就獎勵），返回更新後的 PlayerProfile"""
+    return _update_returning(user, coins=F('coins') + amount)
+
+
+def debit_coins(user, amount, **updates):
+    """條件式扣除金幣（金幣不少於 amount 時才扣除），返回更新後的 PlayerProfile
+
+    updates 為同一個 UPDATE 中一併修改的欄位（例如購買等級）；
+    金幣不足或玩家資料不存在時不修改任何資料並返回 None。
+    """
+    return _update_returning(user, where={'coins__gte': amount}, coins=F('coins') - amount, **updates)
+
+
+def grant_achievements(user, old_bits, new_bits, reward_coins):
+    """以比較並交換寫入已解鎖成就位元組並發放獎勵金幣，返回更新後的 PlayerProfile
+
+    只有 achievement_bits 仍為 old_bits 時才更新；已被並發的解鎖修改（或玩家資料不存在）時返回 None。
+    """
+    return _update_returning(
+        user, where={'achievement_bits': old_bits},
+        achievement_bits=new_bits, coins=F('coins') + reward_coins,
+    )
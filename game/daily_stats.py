@@ -0,0 +1,119 @@
+"""
+玩家每日統計（PlayerDailyStats）的增量更新與查詢
+
+提交遊戲時把本次的局數、點擊、金幣、時長依 (用戶, UTC 日期) 彙總後，以單一
+INSERT ... ON CONFLICT DO UPDATE 累加到每日統計（最佳成績取較大值），
+不需要先查詢資料列是否存在。不支援 ON CONFLICT 的資料庫退回 UPDATE，影響 0 列時再 INSERT。
+
+每日/每週統計由 (user, day) 唯一索引讀取最多數百列，不需要掃描 GameSession。
+"""
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Greatest
+from .models import PlayerDailyStats
+
+STAT_FIELDS = ('games_played', 'total_clicks', 'coins_earned', 'best_clicks', 'total_duration')
+
+
+def utc_day(moment):
+    """遊戲時間對應的 UTC 日期"""
+    return moment.astimezone(dt_timezone.utc).date()
+
+
+def aggregate_sessions(sessions):
+    """將遊戲記錄依 (user_id, UTC 日期) 彙總
+
+    Returns:
+        dict: {(user_id, day): {'games_played': ..., 'total_clicks': ..., ...}}
+    """
+    totals = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    for session in sessions:
+        row = totals[(session.user_id, utc_day(session.played_at))]
+        row['games_played'] += 1
+        row['total_clicks'] += session.clicks
+        row['coins_earned'] += session.coins_earned
+        row['best_clicks'] = max(row['best_clicks'], session.clicks)
+        row['total_duration'] += session.game_duration
+    return dict(totals)
+
+
+def _upsert_sql(connection, row_count):
+    """累加用的 INSERT ... ON CONFLICT DO UPDATE 語句"""
+    qn = connection.ops.quote_name
+    table = qn(PlayerDailyStats._meta.db_table)
+    user_column = qn(PlayerDailyStats._meta.get_field('user').column)
+    columns = [user_column, qn('day')] + [qn(field) for field in STAT_FIELDS]
+    greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+    updates = []
+    for field in STAT_FIELDS:
+        column = qn(field)
+        if field == 'best_clicks':
+            updates.append(f'{column} = {greatest}({table}.{column}, EXCLUDED.{column})')
+        else:
+            updates.append(f'{column} = {table}.{column} + EXCLUDED.{column}')
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * row_count)
+    return (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES {placeholders} '
+        f'ON CONFLICT ({user_column}, {qn("day")}) DO UPDATE SET {", ".join(updates)}'
+    )
+
+
+def _increment_fallback(key, row):
+    user_id, day = key
+    queryset = PlayerDailyStats.objects.filter(user_id=user_id, day=day)
+    updates = {field: F(field) + row[field] for field in STAT_FIELDS if field != 'best_clicks'}
+    updates['best_clicks'] = Greatest('best_clicks', Value(row['best_clicks']))
+    if queryset.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            PlayerDailyStats.objects.create(user_id=user_id, day=day, **row)
+    except IntegrityError:
+        # 並發的提交已建立同一天的資料列
+        queryset.update(**updates)
+
+
+def record_daily_stats(sessions):
+    """將新的遊戲記錄累加到每日統計（通常只有一個 (用戶, 日期)，即一個語句）"""
+    totals = aggregate_sessions(sessions)
+    if not totals:
+        return
+    db = router.db_for_write(PlayerDailyStats)
+    connection = connections[db]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        with transaction.atomic(using=db):
+            for key, row in totals.items():
+                _increment_fallback(key, row)
+        return
+
+    params = []
+    for (user_id, day), row in totals.items():
+        params.extend([user_id, connection.ops.adapt_datefield_value(day)] + [row[field] for field in STAT_FIELDS])
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(connection, len(totals)), params)
+
+
+def daily_stats(user_id, start_day, end_day):
+    """玩家在日期範圍內（含首尾）每一天的統計，依日期排序"""
+    return list(
+        PlayerDailyStats.objects
+        .filter(user_id=user_id, day__gte=start_day, day__lte=end_day)
+        .order_by('day')
+        .values('day', *STAT_FIELDS)
+    )
+
+
+def summarize_stats(user_id, start_day, end_day):
+    """玩家在日期範圍內（含首尾）的合計統計（例如一週）"""
+    summary = PlayerDailyStats.objects.filter(
+        user_id=user_id, day__gte=start_day, day__lte=end_day
+    ).aggregate(
+        games_played=Sum('games_played'),
+        total_clicks=Sum('total_clicks'),
+        coins_earned=Sum('coins_earned'),
+        best_clicks=Max('best_clicks'),
+        total_duration=Sum('total_duration'),
+    )
+    return {field: value or 0 for field, value in summary.items()}
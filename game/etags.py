@@ -0,0 +1,55 @@
+"""
+讀取 API 的 ETag / 條件式 GET（商店、成就、玩家資料、歷史記錄）
+
+ETag 由低成本的版本資訊組成，不需要先產生回應內容：
+- 目錄摘要：商店物品與成就目錄的內容摘要（程序內快取，不查詢資料庫）
+- 玩家資料版本：PlayerProfile.data_version，提交遊戲、購買、解鎖成就、更換徽章、
+  回溯商店等級與後台修改玩家資料時遞增（與資料修改在同一個交易內）
+- 用戶 ID：同一瀏覽器換帳號登入時不會匹配上一個帳號的 ETag
+
+請求的 If-None-Match 與目前的 ETag 相同時直接返回 304，不執行主要的查詢。
+"""
+import hashlib
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .models import PlayerProfile
+
+
+def make_etag(*parts):
+    """由版本資訊產生強 ETag（已加上引號）"""
+    source = ':'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.sha256(source.encode('utf-8')).hexdigest()[:32]
+
+
+def player_data_version(user):
+    """玩家資料版本（只查詢一個欄位），玩家資料不存在時返回 None"""
+    return PlayerProfile.objects.filter(user=user).values_list('data_version', flat=True).first()
+
+
+def bump_data_version(user_id):
+    """遞增玩家資料版本，使該玩家讀取 API 的 ETag 失效"""
+    PlayerProfile.objects.filter(user_id=user_id).update(data_version=F('data_version') + 1)
+
+
+def _set_validator(response, etag):
+    response['ETag'] = etag
+    # 玩家資料只允許瀏覽器保存，每次使用前都需要以 If-None-Match 重新驗證
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag):
+    """If-None-Match 與 etag 相同時返回 304 回應，否則返回 None"""
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is None or response.status_code != 304:
+        return None
+    return _set_validator(response, etag)
+
+
+def with_etag(response, etag):
+    """為成功的回應加上 ETag（錯誤回應不加，避免被當成可重新驗證的內容）"""
+    if etag is not None and response.status_code == 200:
+        _set_validator(response, etag)
+    return response
@@ -0,0 +1,120 @@
+"""
+玩家最近遊戲記錄快取（每位玩家一個固定長度的環形緩衝）
+
+快取存放在 Django cache 框架中（GAME_HISTORY_CACHE 指定 CACHES 別名，可換成 Redis / Memcached），
+內容是最新的 GAME_HISTORY_CACHE_SIZE 筆序列化後的記錄與對應的遊戲局數：
+- 提交遊戲後把新的記錄放到最前面、截去超出長度的舊記錄
+- /api/history/ 的 limit 在緩衝長度以內時直接由快取返回，不查詢資料庫；
+  超出時改用 game_session_user_played_idx 索引查詢
+- 只在交易提交後（transaction.on_commit）寫入快取，回滾的寫入不會進入快取
+- 快取中的局數與提交後的局數不連續（並發提交、後台修改資料）時刪除快取，下次讀取時重建
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+HISTORY_CACHE_KEY = 'game:history:{user_id}'
+
+
+def _cache():
+    return caches[getattr(settings, 'GAME_HISTORY_CACHE', 'default')]
+
+
+def history_cache_size():
+    """每位玩家快取的記錄筆數"""
+    return getattr(settings, 'GAME_HISTORY_CACHE_SIZE', 20)
+
+
+def _timeout():
+    return getattr(settings, 'GAME_HISTORY_CACHE_TIMEOUT', 60 * 60)
+
+
+def _key(user_id):
+    return HISTORY_CACHE_KEY.format(user_id=user_id)
+
+
+def history_row(session):
+    """將遊戲記錄（GameSession 或 values() 的字典）序列化為 API 格式"""
+    if not isinstance(session, dict):
+        session = {
+            'clicks': session.clicks,
+            'game_duration': session.game_duration,
+            'coins_earned': session.coins_earned,
+            'played_at': session.played_at,
+        }
+    return {
+        'clicks': session['clicks'],
+        'game_duration': session['game_duration'],
+        'coins_earned': session['coins_earned'],
+        'played_at': session['played_at'].isoformat(),
+    }
+
+
+def get_cached_history(user_id, limit, games_played=None):
+    """從快取獲取最新的 limit 筆記錄，快取未命中或筆數不足時返回 None
+
+    Args:
+        games_played: 已知的目前遊戲局數（提交遊戲後），與快取不一致時視為未命中
+            （交易尚未提交時快取還沒有包含剛寫入的記錄）
+    """
+    entry = _cache().get(_key(user_id))
+    if entry is None:
+        return None
+    if games_played is not None and entry['games'] != games_played:
+        return None
+    rows = entry['rows']
+    if limit > len(rows) and not entry['complete']:
+        return None
+    return rows[:limit]
+
+
+def store_history(user_id, rows, games_played, complete):
+    """交易提交後寫入從資料庫重建的快取（已存在時不覆蓋較新的內容）
+
+    Args:
+        rows: 最新的記錄（已序列化，依時間由新到舊）
+        games_played: 讀取記錄之前查詢到的遊戲局數
+        complete: rows 是否已包含該玩家的所有記錄
+    """
+    size = history_cache_size()
+    entry = {'rows': rows[:size], 'games': games_played, 'complete': complete and len(rows) <= size}
+    transaction.on_commit(lambda: _cache().add(_key(user_id), entry, _timeout()))
+
+
+def push_history(user_id, sessions, games_played):
+    """交易提交後把新的遊戲記錄放入快取
+
+    Args:
+        sessions: 新的 GameSession 列表（依遊戲順序排列）
+        games_played: 寫入後的遊戲局數（PlayerProfile.total_games_played）
+    """
+    new_rows = [history_row(session) for session in reversed(sessions)]
+
+    def push():
+        cache = _cache()
+        key = _key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            return
+        if entry['games'] != games_played - len(new_rows):
+            # 錯過了其他提交或後台修改，無法確定快取內容正確
+            cache.delete(key)
+            return
+        rows = new_rows + entry['rows']
+        size = history_cache_size()
+        cache.set(key, {
+            'rows': rows[:size],
+            'games': games_played,
+            'complete': entry['complete'] and len(rows) <= size,
+        }, _timeout())
+
+    # 遊戲結果已提交，快取寫入失敗只記錄日誌，不讓請求返回錯誤
+    transaction.on_commit(push, robust=True)
+
+
+def invalidate_history(user_id):
+    """刪除玩家的記錄快取（立即刪除，並在交易提交後再刪除一次，避免交易期間被重建）"""
+    cache = _cache()
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,197 @@
+"""
+Idempotency-Key 請求去重（提交遊戲結果、購買物品）
+
+用戶端在請求標頭帶上 Idempotency-Key，網路逾時後可以用同一個 key 重試：
+- 第一次請求先寫入一筆「處理中」記錄（唯一約束 user + key 雜湊），處理完成後存入回應
+- 重複的請求只需一次 SELECT 即返回已存的回應，不進入 transaction.atomic()、不鎖定任何資料列
+- 第一次請求仍在處理中時返回 409，用戶端稍後重試即可；處理中記錄只保留 GAME_IDEMPOTENCY_LEASE 秒，
+  程序在處理中途結束（或保存回應失敗）時，租約到期後同一個 key 可以重新處理，不會被擋住一整天
+- 同一個 key 搭配不同的請求內容返回 422
+- 視圖的變更提交後（mark_committed）一律保存回應，之後的步驟失敗返回的錯誤也會保存：
+  釋放 key 會讓用戶端以同一個 key 重試，已提交的遊戲結果或購買會被重複套用
+
+保存回應的記錄在 GAME_IDEMPOTENCY_TTL 秒後失效；每隔 GAME_IDEMPOTENCY_PURGE_INTERVAL 秒
+以批量 DELETE 清除過期記錄，並將總數限制在 GAME_IDEMPOTENCY_MAX_RECORDS 以內。
+"""
+from datetime import timedelta
+from functools import wraps
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+_last_purge = 0.0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _hash(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+
+def _is_final(status_code):
+    """是否保存此回應：伺服器錯誤與並發衝突（409/429）可以重試，不保存"""
+    return status_code < 500 and status_code not in (409, 429)
+
+
+def mark_committed(request):
+    """視圖的變更（扣款、累加計數器等）已提交：之後無論回應為何都保存，不釋放 key"""
+    request._idempotency_committed = True
+
+
+def _committed(request):
+    return getattr(request, '_idempotency_committed', False)
+
+
+def _store(records, status_code, response_body):
+    records.update(
+        status_code=status_code,
+        response_body=response_body,
+        expires_at=timezone.now() + timedelta(seconds=_setting('GAME_IDEMPOTENCY_TTL', 60 * 60 * 24)),
+    )
+
+
+def _find_record(user, key_hash):
+    return (
+        IdempotencyRecord.objects
+        .filter(user_id=user.id, key_hash=key_hash, expires_at__gt=timezone.now())
+        .values('request_hash', 'status_code', 'response_body')
+        .first()
+    )
+
+
+def _replay(record, request_hash):
+    """返回已存的回應（或處理中 / 內容不符的錯誤）"""
+    if record['request_hash'] != request_hash:
+        return JsonResponse({
+            'error': 'Idempotency-Key 已用於不同的請求內容',
+            'error_type': 'idempotency_mismatch',
+        }, status=422)
+    if record['status_code'] is None:
+        return JsonResponse({
+            'error': '相同的請求正在處理中，請稍後再試',
+            'error_type': 'idempotency_in_progress',
+        }, status=409)
+    response = HttpResponse(
+        record['response_body'],
+        status=record['status_code'],
+        content_type='application/json',
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user, key_hash, request_hash):
+    """寫入處理中記錄（短租約），返回是否取得此 key（已存在時返回 False）"""
+    expires_at = timezone.now() + timedelta(seconds=_setting('GAME_IDEMPOTENCY_LEASE', 60))
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(
+                    user_id=user.id,
+                    key_hash=key_hash,
+                    request_hash=request_hash,
+                    expires_at=expires_at,
+                )
+            return True
+        except IntegrityError:
+            # 已過期但尚未清除的記錄：刪除後重新取得
+            deleted, _ = IdempotencyRecord.objects.filter(
+                user_id=user.id, key_hash=key_hash, expires_at__lte=timezone.now()
+            ).delete()
+            if not deleted:
+                return False
+    return False
+
+
+def purge_idempotency_records():
+    """批量刪除過期記錄，並刪除超出數量上限的最舊記錄（處理中的記錄不受上限影響）
+
+    Returns:
+        int: 刪除的記錄數
+    """
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+    max_records = _setting('GAME_IDEMPOTENCY_MAX_RECORDS', 100000)
+    boundary = list(
+        IdempotencyRecord.objects.order_by('-id')
+        .values_list('id', flat=True)[max_records:max_records + 1]
+    )
+    if boundary:
+        overflow, _ = IdempotencyRecord.objects.filter(
+            id__lte=boundary[0], status_code__isnull=False
+        ).delete()
+        deleted += overflow
+    return deleted
+
+
+def _maybe_purge():
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= _setting('GAME_IDEMPOTENCY_PURGE_INTERVAL', 300):
+        _last_purge = now
+        purge_idempotency_records()
+
+
+def idempotent(endpoint):
+    """視圖裝飾器：支援 Idempotency-Key 標頭（未帶標頭或未登入時直接執行視圖）
+
+    Args:
+        endpoint: 端點名稱，與 key 一起雜湊，同一個 key 在不同端點互不影響
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key or not request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({'error': '無效的 Idempotency-Key'}, status=400)
+
+            user = request.user
+            key_hash = _hash(f'{endpoint}:{key}')
+            request_hash = _hash(request.body)
+
+            record = _find_record(user, key_hash)
+            if record is not None:
+                return _replay(record, request_hash)
+            if not _claim(user, key_hash, request_hash):
+                record = _find_record(user, key_hash)
+                if record is not None:
+                    return _replay(record, request_hash)
+                return JsonResponse({
+                    'error': '相同的請求正在處理中，請稍後再試',
+                    'error_type': 'idempotency_in_progress',
+                }, status=409)
+
+            records = IdempotencyRecord.objects.filter(user_id=user.id, key_hash=key_hash)
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                if _committed(request):
+                    _store(records, 500, json.dumps({
+                        'error': '請求已完成，但產生回應時發生錯誤',
+                        'error_type': 'idempotency_committed',
+                    }, ensure_ascii=False))
+                else:
+                    records.delete()
+                raise
+            if _is_final(response.status_code) or _committed(request):
+                _store(records, response.status_code, response.content.decode('utf-8'))
+            else:
+                # 可重試的錯誤：釋放 key，讓用戶端以同一個 key 重試
+                records.delete()
+            _maybe_purge()
+            return response
+        return wrapper
+    return decorator
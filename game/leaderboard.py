@@ -0,0 +1,136 @@
+"""
+全服排行榜（最佳單局、累計點擊）的前 K 名快取
+
+排行榜依 PlayerProfile 的分數欄位由高到低排列（同分時用戶 ID 小的在前），
+由 (分數 DESC, user_id) 索引（profile_best_round_idx / profile_total_clicks_idx）
+讀取前 GAME_LEADERBOARD_SIZE 名，不需要排序整個資料表。
+
+前 K 名與第 K 名的分數（門檻）存放在 Django cache 中（GAME_LEADERBOARD_CACHE 指定 CACHES 別名），
+所有觀看者共用同一份結果，每次失效後只重新查詢一次：
+- 每個排行榜在快取中有一個世代計數器，前 K 名與門檻存放在包含世代的 key 下；
+  失效時以 incr 遞增世代，不刪除快取：重建期間有新的提交時，重建的結果寫入舊世代的 key，
+  之後的讀取不會拿到過期的前 K 名
+- 提交遊戲後分數達到門檻時，在交易提交後遞增該排行榜的世代（下次讀取時重建）
+- 分數未達門檻的提交只讀取門檻，不影響快取；門檻不存在（可能正在重建）時視為達到門檻
+- 刪除用戶時遞增世代；後台修改分數等其他寫入不主動失效，最多在 GAME_LEADERBOARD_CACHE_TIMEOUT 秒後更新
+- 世代計數器需要所有程序共用的快取（Redis / Memcached）才能跨程序失效；
+  使用程序內快取時，其他程序最多在 GAME_LEADERBOARD_CACHE_TIMEOUT 秒後更新
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+import uuid
+from .models import PlayerProfile
+
+# 排行榜類型 -> PlayerProfile 的分數欄位
+BOARDS = {
+    'best_round': 'best_clicks_per_round',
+    'total_clicks': 'total_clicks',
+}
+
+GENERATION_CACHE_KEY = 'game:leaderboard:{board}:generation'
+LEADERBOARD_CACHE_KEY = 'game:leaderboard:{board}:{generation}'
+CUTOFF_CACHE_KEY = 'game:leaderboard:{board}:{generation}:cutoff'
+
+
+def _cache():
+    return caches[getattr(settings, 'GAME_LEADERBOARD_CACHE', 'default')]
+
+
+def leaderboard_size():
+    """排行榜快取的名次數量（K）"""
+    return getattr(settings, 'GAME_LEADERBOARD_SIZE', 100)
+
+
+def _timeout():
+    return getattr(settings, 'GAME_LEADERBOARD_CACHE_TIMEOUT', 5 * 60)
+
+
+def _keys(board, generation):
+    return (
+        LEADERBOARD_CACHE_KEY.format(board=board, generation=generation),
+        CUTOFF_CACHE_KEY.format(board=board, generation=generation),
+    )
+
+
+def _generation(cache, board):
+    """共用快取中排行榜的世代（不存在時以隨機的起始值建立，避免重用被淘汰前的世代）"""
+    key = GENERATION_CACHE_KEY.format(board=board)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().int >> 66, None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump_generations(boards):
+    cache = _cache()
+    for board in boards:
+        try:
+            cache.incr(GENERATION_CACHE_KEY.format(board=board))
+        except ValueError:
+            # 世代不存在：快取中沒有可以讀取到的排行榜
+            pass
+
+
+def compute_leaderboard(board):
+    """以索引查詢前 K 名（分數為 0 的玩家不列入），同分的名次相同
+
+    Returns:
+        dict: {'entries': [{'rank', 'user_id', 'username', 'score'}, ...],
+               'cutoff': 進入排行榜需要的分數, 'version': 每次重建不同的版本（ETag 使用）}
+    """
+    field = BOARDS[board]
+    size = leaderboard_size()
+    rows = (
+        PlayerProfile.objects.filter(**{f'{field}__gt': 0})
+        .order_by(f'-{field}', 'user_id')
+        .values_list('user_id', 'user__username', field)[:size]
+    )
+    entries = []
+    for position, (user_id, username, score) in enumerate(rows, start=1):
+        rank = entries[-1]['rank'] if entries and entries[-1]['score'] == score else position
+        entries.append({'rank': rank, 'user_id': user_id, 'username': username, 'score': score})
+    # 未滿 K 名時任何正分都能進入排行榜
+    cutoff = entries[-1]['score'] if len(entries) >= size else 1
+    return {'entries': entries, 'cutoff': cutoff, 'version': uuid.uuid4().hex}
+
+
+def get_leaderboard(board):
+    """獲取排行榜（快取未命中時查詢一次並寫入目前世代的快取）"""
+    cache = _cache()
+    # 先讀取世代再查詢資料庫：查詢期間有新的失效時，結果寫入舊世代的 key，不會被讀取到
+    key, cutoff_key = _keys(board, _generation(cache, board))
+    leaderboard = cache.get(key)
+    if leaderboard is None:
+        leaderboard = compute_leaderboard(board)
+        cache.set_many({key: leaderboard, cutoff_key: leaderboard['cutoff']}, _timeout())
+    return leaderboard
+
+
+def refresh_leaderboards(profile):
+    """提交遊戲後分數達到門檻的排行榜，在交易提交後遞增世代（一次讀取所有排行榜的世代與門檻）"""
+    cache = _cache()
+    generation_keys = {GENERATION_CACHE_KEY.format(board=board): board for board in BOARDS}
+    generations = cache.get_many(list(generation_keys))
+    cutoff_keys = {
+        _keys(generation_keys[key], generation)[1]: generation_keys[key]
+        for key, generation in generations.items()
+    }
+    if not cutoff_keys:
+        return
+    cutoffs = cache.get_many(list(cutoff_keys))
+    # 有世代但沒有門檻時可能正在重建（查詢結果不包含這次提交），一律遞增世代
+    stale = [
+        board for cutoff_key, board in cutoff_keys.items()
+        if cutoff_key not in cutoffs or getattr(profile, BOARDS[board]) >= cutoffs[cutoff_key]
+    ]
+    if stale:
+        # 遊戲結果已提交，快取失效失敗只記錄日誌（最多在 GAME_LEADERBOARD_CACHE_TIMEOUT 秒後更新）
+        transaction.on_commit(lambda: _bump_generations(stale), robust=True)
+
+
+def invalidate_leaderboards():
+    """所有排行榜失效：立即遞增世代，交易提交後再遞增一次（避免提交前讀取到舊資料的重建被保留）"""
+    _bump_generations(BOARDS)
+    transaction.on_commit(lambda: _bump_generations(BOARDS))
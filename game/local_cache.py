@@ -0,0 +1,80 @@
+"""
+程序內（per-process）快取，能感知資料庫交易
+
+一般的程序內快取在交易回滾後可能保留未提交的資料。本快取在資料被修改時
+記錄修改所在的交易（mark_dirty），之後在同一個最外層交易內建立的快取項目
+只在該交易範圍內有效；交易結束（提交或回滾）後自動失效。
+在交易外建立的項目（讀取的都是已提交資料）則一直有效，直到被明確移除。
+"""
+from collections import OrderedDict
+import threading
+from django.db import connection, transaction
+
+
+def _current_scope():
+    """目前連線的交易範圍（由外到內的 atomic 區塊）"""
+    return tuple(connection.atomic_blocks)
+
+
+def _scope_active(scope):
+    """建立快取時的交易範圍是否仍然有效（仍在同一組 atomic 區塊內）"""
+    current = connection.atomic_blocks
+    return len(scope) <= len(current) and all(a is b for a, b in zip(scope, current))
+
+
+class LocalCache:
+    """能感知交易的程序內 LRU 快取"""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty_scope = ()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, scope = entry
+            if not _scope_active(scope):
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        # 快取只在「修改所在的交易」與目前交易的共同範圍內有效：
+        # 修改所在的 savepoint 釋放後，修改併入外層交易，仍然只在外層交易內可見；
+        # 沒有共同範圍（最外層交易沒有修改過相關資料）時，讀取的都是已提交資料
+        scope = []
+        for dirty_block, block in zip(self._dirty_scope, connection.atomic_blocks):
+            if dirty_block is not block:
+                break
+            scope.append(block)
+        scope = tuple(scope)
+        with self._lock:
+            self._data[key] = (value, scope)
+            self._data.move_to_end(key)
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def mark_dirty(self, key=None):
+        """相關資料被修改：移除快取項目（key 為 None 時清空全部）
+
+        在交易內修改時，記錄修改所在的交易，並在提交後再移除一次，
+        避免其他執行緒在提交前以舊資料重建快取。
+        """
+        invalidate = self.clear if key is None else (lambda: self.delete(key))
+        invalidate()
+        if connection.in_atomic_block:
+            self._dirty_scope = _current_scope()
+            transaction.on_commit(invalidate)
@@ -0,0 +1,31 @@
+"""
+管理命令共用的檢查點（checkpoint）工具
+
+長時間執行的批次命令以 JSON 檔案記錄進度，中斷（或時間預算用完）後可從檢查點續跑。
+"""
+import json
+import os
+
+
+def load_checkpoint(path):
+    """讀取檢查點，檔案不存在或路徑為空時返回空字典"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, data):
+    """寫入檢查點（先寫入暫存檔再替換，避免中斷時留下不完整的檔案）"""
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def clear_checkpoint(path):
+    """全部處理完成後刪除檢查點"""
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from game.models import GameSession
+from game.partitions import (
+    add_months, current_month, drop_partition, ensure_partitions, export_sessions,
+    is_partitioned, list_partitions, month_queryset, month_start,
+)
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        '歸檔舊的遊戲記錄：每個月匯出為一個 gzip 壓縮的 CSV 檔，'
+        'PostgreSQL 分區表上卸離並刪除該月分區，其他資料庫分批刪除已匯出的記錄；'
+        '同時建立未來月份的分區。玩家資料計數器與每日統計不受影響'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=getattr(settings, 'GAME_SESSION_ARCHIVE_KEEP_MONTHS', 12),
+            help='保留最近幾個月（含當月）的遊戲記錄（預設: GAME_SESSION_ARCHIVE_KEEP_MONTHS）'
+        )
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            default=getattr(settings, 'GAME_SESSION_ARCHIVE_DIR', ''),
+            help='歸檔檔案目錄（預設: GAME_SESSION_ARCHIVE_DIR）'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=getattr(settings, 'GAME_SESSION_PARTITION_MONTHS_AHEAD', 3),
+            help='預先建立未來幾個月的分區（預設: GAME_SESSION_PARTITION_MONTHS_AHEAD）'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='沒有分區時每批刪除的記錄數（預設: 1000）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只列出會歸檔的月份與筆數，不匯出、不刪除'
+        )
+
+    def _archive_path(self, output_dir, month, replace):
+        """歸檔檔名；分批刪除中斷後重新執行時，不覆蓋已匯出（且可能已刪除）的檔案"""
+        path = os.path.join(output_dir, f'game_sessions_{month:%Y_%m}.csv.gz')
+        suffix = 1
+        while not replace and os.path.exists(path):
+            path = os.path.join(output_dir, f'game_sessions_{month:%Y_%m}_{suffix}.csv.gz')
+            suffix += 1
+        return path
+
+    def _delete_exported(self, queryset, chunk_size):
+        """依 id 分批刪除已匯出的記錄（每批一個短交易）"""
+        deleted = 0
+        while True:
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            with transaction.atomic():
+                count, _ = GameSession.objects.filter(id__in=ids).delete()
+            deleted += count
+
+    def handle(self, *args, **options):
+        keep_months = options['keep_months']
+        output_dir = options['output_dir']
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+
+        if keep_months < 1:
+            self.stderr.write(self.style.ERROR('--keep-months 必須大於0'))
+            return
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size 必須大於0'))
+            return
+        if not output_dir:
+            self.stderr.write(self.style.ERROR('請以 --output-dir 或 GAME_SESSION_ARCHIVE_DIR 指定歸檔目錄'))
+            return
+
+        partitioned = is_partitioned()
+        if dry_run:
+            self.stdout.write(self.style.WARNING('試運行模式：不會匯出或刪除任何資料'))
+        elif partitioned:
+            for name in ensure_partitions(options['months_ahead']):
+                self.stdout.write(f'已建立分區 {name}')
+
+        cutoff = add_months(current_month(), 1 - keep_months)
+        partitions = {month: name for month, name in list_partitions() if month < cutoff}
+        months = set(partitions)
+        # 沒有分區（或落在預設分區）的舊資料，依月份逐月處理
+        oldest = GameSession.objects.filter(played_at__lt=cutoff).aggregate(oldest=Min('played_at'))['oldest']
+        if oldest is not None:
+            month = month_start(oldest)
+            while month < cutoff:
+                months.add(month)
+                month = add_months(month, 1)
+
+        if not dry_run and months:
+            os.makedirs(output_dir, exist_ok=True)
+
+        start_time = time.monotonic()
+        total = 0
+        for month in sorted(months):
+            queryset = month_queryset(month)
+            partition = partitions.get(month)
+            if not partition:
+                # 只刪除已匯出的記錄（匯出期間才寫入的舊記錄留到下次歸檔）
+                max_id = queryset.aggregate(max_id=Max('id'))['max_id']
+                queryset = queryset.filter(id__lte=max_id or 0)
+            if dry_run:
+                count = queryset.count()
+                self.stdout.write(f'{month:%Y-%m}：{count:,} 筆')
+                total += count
+                continue
+
+            # 分區中的資料在歸檔前不會再變動，重新執行時直接覆蓋同名檔案
+            path = self._archive_path(output_dir, month, replace=partition is not None)
+            exported = export_sessions(queryset, path) if queryset.exists() else 0
+            if not exported and not partition:
+                continue
+            if exported:
+                self.stdout.write(f'{month:%Y-%m}：已匯出 {exported:,} 筆到 {path}')
+            if partition:
+                drop_partition(partition)
+                self.stdout.write(f'{month:%Y-%m}：已卸離並刪除分區 {partition}')
+            else:
+                self._delete_exported(queryset, chunk_size)
+            total += exported
+
+        elapsed = time.monotonic() - start_time
+        action = '將歸檔' if dry_run else '已歸檔'
+        self.stdout.write(self.style.SUCCESS(
+            f'完成！{action} {total:,} 筆 {cutoff:%Y-%m} 之前的遊戲記錄，耗時 {elapsed:.2f} 秒'
+        ))
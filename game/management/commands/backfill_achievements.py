@@ -0,0 +1,167 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from game.achievement_rules import profile_counter_fields
+from game.achievements import AddUnlockedBit, invalidate_unlock_state
+from game.management.checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from game.models import Achievement, PlayerAchievement, PlayerProfile
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        '為已達成條件的玩家補發成就（例如 init_game_data 新增成就後）。'
+        '依用戶 ID 分批，每個成就一個查詢以玩家資料的累計數值比較目標值，'
+        '解鎖記錄以 bulk_create（忽略衝突）寫入，位元組與獎勵金幣以一個 UPDATE 寫入；'
+        '可以重複執行，已解鎖的成就不會重複發放獎勵'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--achievement',
+            type=int,
+            action='append',
+            default=[],
+            help='只補發指定的成就 ID（可重複指定，預設: 全部支援的成就）'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='每批處理的玩家數量（預設: 5000）'
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            default=0,
+            help='最長執行秒數，用完後停止並保留檢查點（預設: 0，不限制）'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default='',
+            help='檢查點檔案路徑，用於中斷後從上次的用戶 ID 續跑'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='每批之間暫停的秒數，降低對線上資料庫的壓力（預設: 0）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只統計會補發的解鎖數量，不實際寫入'
+        )
+
+    def _achievements(self, achievement_ids):
+        """要補發的成就（只包含規則宣告了玩家資料欄位的類型，見 game.achievement_rules）"""
+        achievements = Achievement.objects.filter(achievement_type__in=profile_counter_fields()).order_by('id')
+        if achievement_ids:
+            achievements = achievements.filter(id__in=achievement_ids)
+        return list(achievements.values('id', 'achievement_type', 'target_value', 'reward_coins'))
+
+    def _backfill_achievement(self, user_ids, achievement, field, now, dry_run):
+        """補發一個成就給該批中達成條件的玩家，返回補發數量
+
+        一個查詢以玩家資料的累計數值比較目標值，並以位元組排除已解鎖的玩家；
+        解鎖記錄以 bulk_create（忽略衝突）寫入，位元組、獎勵與資料版本以一個 UPDATE 寫入。
+        UPDATE 同樣以位元組為條件：並發的提交已先解鎖的玩家不再發放獎勵，
+        之後的提交以比較並交換寫入位元組時會讀到新的位元組，不會重複解鎖。
+        """
+        unlock_bit = AddUnlockedBit(achievement['id'])
+        qualified = list(
+            PlayerProfile.objects.filter(
+                user_id__gte=user_ids[0], user_id__lte=user_ids[-1],
+                **{f'{field}__gte': achievement['target_value']}
+            ).exclude(achievement_bits=unlock_bit).values_list('user_id', flat=True)
+        )
+        if qualified and not dry_run:
+            # bulk_create 與 update 不發送信號，不會逐一重新計算玩家的位元組
+            PlayerAchievement.objects.bulk_create([
+                PlayerAchievement(
+                    user_id=user_id,
+                    achievement_id=achievement['id'],
+                    reward_claimed=(achievement['reward_coins'] > 0)
+                )
+                for user_id in qualified
+            ], batch_size=1000, ignore_conflicts=True)
+            PlayerProfile.objects.filter(user_id__in=qualified).exclude(achievement_bits=unlock_bit).update(
+                achievement_bits=unlock_bit,
+                coins=F('coins') + achievement['reward_coins'],
+                data_version=F('data_version') + 1,
+                updated_at=now,
+            )
+        return len(qualified)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        time_budget = options['time_budget']
+        checkpoint_path = options['checkpoint']
+        pause = options['sleep']
+        dry_run = options['dry_run']
+
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size 必須大於0'))
+            return
+
+        fields = profile_counter_fields()
+        achievements = self._achievements(options['achievement'])
+        if not achievements:
+            self.stdout.write(self.style.WARNING('沒有可補發的成就'))
+            return
+
+        last_user_id = load_checkpoint(checkpoint_path).get('last_user_id', 0)
+        if last_user_id:
+            self.stdout.write(f'從檢查點續跑：用戶 ID > {last_user_id}')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('試運行模式：不會寫入任何資料'))
+
+        start_time = time.monotonic()
+        total = 0
+        finished = False
+        while True:
+            user_ids = list(
+                PlayerProfile.objects.filter(user_id__gt=last_user_id)
+                .order_by('user_id').values_list('user_id', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                finished = True
+                break
+
+            # 每批使用獨立的短交易
+            now = timezone.now()
+            with transaction.atomic():
+                for achievement in achievements:
+                    field = fields[achievement['achievement_type']]
+                    total += self._backfill_achievement(user_ids, achievement, field, now, dry_run)
+            if not dry_run:
+                save_checkpoint(checkpoint_path, {'last_user_id': user_ids[-1]})
+
+            last_user_id = user_ids[-1]
+            elapsed = time.monotonic() - start_time
+            self.stdout.write(f'已處理至用戶 ID {last_user_id}，補發 {total:,} 個成就')
+
+            if time_budget and elapsed >= time_budget:
+                break
+            if pause:
+                time.sleep(pause)
+
+        if total and not dry_run:
+            # 本程序的玩家解鎖狀態快取已過期；其他程序的舊狀態在下次解鎖時由比較並交換排除
+            invalidate_unlock_state()
+
+        elapsed = time.monotonic() - start_time
+        action = '將補發' if dry_run else '已補發'
+        if finished:
+            if not dry_run:
+                clear_checkpoint(checkpoint_path)
+            self.stdout.write(self.style.SUCCESS(
+                f'完成！{action} {total:,} 個成就，耗時 {elapsed:.2f} 秒'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'時間預算已用完：{action} {total:,} 個成就，耗時 {elapsed:.2f} 秒，'
+                f'最後處理的用戶 ID: {last_user_id}'
+            ))
@@ -0,0 +1,134 @@
+from datetime import timezone as dt_timezone
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from game.daily_stats import STAT_FIELDS
+from game.management.checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from game.models import GameSession, PlayerDailyStats
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        '由既有的遊戲記錄重建玩家每日統計（依用戶 ID 分批，每批一個 GROUP BY 查詢與一次 upsert）。'
+        '每批以重新計算的結果覆蓋該批用戶的每日統計，可以重複執行；'
+        '建議在低流量時段執行，避免覆蓋同一時間提交的累加'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='每批處理的用戶數量（預設: 500）'
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            default=0,
+            help='最長執行秒數，用完後停止並保留檢查點（預設: 0，不限制）'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default='',
+            help='檢查點檔案路徑，用於中斷後從上次的用戶 ID 續跑'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='每批之間暫停的秒數，降低對線上資料庫的壓力（預設: 0）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只統計會寫入的每日統計筆數，不實際寫入'
+        )
+
+    def _aggregate(self, user_ids):
+        """一個 GROUP BY 查詢彙總該批用戶每個 UTC 日期的遊戲記錄"""
+        return list(
+            GameSession.objects
+            .filter(user_id__in=user_ids)
+            .annotate(day=TruncDate('played_at', tzinfo=dt_timezone.utc))
+            .order_by()  # 清除 Meta.ordering，避免 played_at 加入 GROUP BY
+            .values('user_id', 'day')
+            .annotate(
+                games_played=Count('id'),
+                total_clicks=Sum('clicks'),
+                coins_earned=Sum('coins_earned'),
+                best_clicks=Max('clicks'),
+                total_duration=Sum('game_duration'),
+            )
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        time_budget = options['time_budget']
+        checkpoint_path = options['checkpoint']
+        pause = options['sleep']
+        dry_run = options['dry_run']
+
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size 必須大於0'))
+            return
+
+        last_user_id = load_checkpoint(checkpoint_path).get('last_user_id', 0)
+        if last_user_id:
+            self.stdout.write(f'從檢查點續跑：用戶 ID > {last_user_id}')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('試運行模式：不會寫入任何資料'))
+
+        start_time = time.monotonic()
+        total = 0
+        finished = False
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_user_id)
+                .order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                finished = True
+                break
+
+            rows = self._aggregate(user_ids)
+            if not dry_run and rows:
+                # 每批使用獨立的短交易
+                with transaction.atomic():
+                    PlayerDailyStats.objects.bulk_create(
+                        [PlayerDailyStats(**row) for row in rows],
+                        batch_size=1000,
+                        update_conflicts=True,
+                        unique_fields=['user', 'day'],
+                        update_fields=list(STAT_FIELDS),
+                    )
+            if not dry_run:
+                save_checkpoint(checkpoint_path, {'last_user_id': user_ids[-1]})
+
+            total += len(rows)
+            last_user_id = user_ids[-1]
+            elapsed = time.monotonic() - start_time
+            rate = total / elapsed if elapsed > 0 else float(total)
+            self.stdout.write(f'已處理至用戶 ID {last_user_id}，{total:,} 筆每日統計（{rate:,.0f} 筆/秒）')
+
+            if time_budget and elapsed >= time_budget:
+                break
+            if pause:
+                time.sleep(pause)
+
+        elapsed = time.monotonic() - start_time
+        action = '將寫入' if dry_run else '已寫入'
+        if finished:
+            if not dry_run:
+                clear_checkpoint(checkpoint_path)
+            self.stdout.write(self.style.SUCCESS(
+                f'完成！{action} {total:,} 筆每日統計，耗時 {elapsed:.2f} 秒'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'時間預算已用完：{action} {total:,} 筆每日統計，耗時 {elapsed:.2f} 秒，'
+                f'最後處理的用戶 ID: {last_user_id}'
+            ))
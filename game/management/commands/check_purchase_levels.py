@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from game.models import PlayerProfile, PlayerPurchase
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        '檢查玩家資料的購買等級（purchase_levels）與購買記錄是否一致（依用戶 ID 分批，每批兩個查詢）。'
+        '加上 --fix 時以購買記錄覆蓋不一致的玩家資料並遞增資料版本'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='每批檢查的玩家數量（預設: 500）'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='以購買記錄修正不一致的玩家資料'
+        )
+        parser.add_argument(
+            '--verbose-limit',
+            type=int,
+            default=20,
+            help='最多列出幾位不一致的玩家（預設: 20）'
+        )
+
+    def _expected_levels(self, user_ids):
+        """一個查詢取得該批用戶由購買記錄計算的購買等級 {user_id: {"商店物品ID": 等級}}"""
+        levels_by_user = {user_id: {} for user_id in user_ids}
+        purchases = PlayerPurchase.objects.filter(user_id__in=user_ids, level__gt=0).values_list(
+            'user_id', 'shop_item_id', 'level'
+        )
+        for user_id, shop_item_id, level in purchases:
+            levels_by_user[user_id][str(shop_item_id)] = level
+        return levels_by_user
+
+    def _fix(self, profiles):
+        """以購買記錄重新計算並寫入（鎖定該批玩家資料，避免覆蓋同一時間的購買）"""
+        user_ids = [profile.user_id for profile in profiles]
+        with transaction.atomic():
+            locked = list(PlayerProfile.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id'))
+            expected = self._expected_levels(user_ids)
+            for profile in locked:
+                profile.purchase_levels = expected[profile.user_id]
+            PlayerProfile.objects.bulk_update(locked, ['purchase_levels'], batch_size=500)
+            PlayerProfile.objects.filter(user_id__in=user_ids).update(data_version=F('data_version') + 1)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fix = options['fix']
+        verbose_limit = options['verbose_limit']
+
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size 必須大於0'))
+            return
+
+        start_time = time.monotonic()
+        last_user_id = 0
+        checked = 0
+        mismatched = 0
+        while True:
+            profiles = list(
+                PlayerProfile.objects.filter(user_id__gt=last_user_id)
+                .order_by('user_id').only('user_id', 'purchase_levels')[:chunk_size]
+            )
+            if not profiles:
+                break
+
+            expected = self._expected_levels([profile.user_id for profile in profiles])
+            drifted = [
+                profile for profile in profiles
+                if (profile.purchase_levels or {}) != expected[profile.user_id]
+            ]
+            for profile in drifted:
+                if mismatched < verbose_limit:
+                    self.stdout.write(self.style.WARNING(
+                        f'用戶 ID {profile.user_id}: 玩家資料 {profile.purchase_levels}，'
+                        f'購買記錄 {expected[profile.user_id]}'
+                    ))
+                mismatched += 1
+            if fix and drifted:
+                self._fix(drifted)
+
+            checked += len(profiles)
+            last_user_id = profiles[-1].user_id
+
+        elapsed = time.monotonic() - start_time
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS(
+                f'完成！已檢查 {checked:,} 位玩家，購買等級全部一致，耗時 {elapsed:.2f} 秒'
+            ))
+        elif fix:
+            self.stdout.write(self.style.SUCCESS(
+                f'完成！已檢查 {checked:,} 位玩家，修正 {mismatched:,} 位不一致的玩家，耗時 {elapsed:.2f} 秒'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'已檢查 {checked:,} 位玩家，{mismatched:,} 位不一致（使用 --fix 修正），耗時 {elapsed:.2f} 秒'
+            ))
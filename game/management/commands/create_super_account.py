@@ -5,6 +5,9 @@ from game.models import (
     Achievement, PlayerAchievement
 )
 from django.db import transaction
+from game.pricing import cumulative_price
+from game.purchases import purchase_levels_from_records
+from game.ranks import move_best_score
 
 
 class Command(BaseCommand):
@@ -54,12 +57,14 @@ class Command(BaseCommand):
             
             if not profile_created:
                 # 如果資料已存在，更新為超級帳號數值
+                old_best = profile.best_clicks_per_round
                 profile.coins = coins
                 profile.total_clicks = 50000
                 profile.best_clicks_per_round = 500
                 profile.total_games_played = 200
                 profile.battle_wins = 50
                 profile.save()
+                move_best_score(old_best, profile.best_clicks_per_round)
                 self.stdout.write(self.style.SUCCESS(f'✓ 更新玩家資料'))
             else:
                 self.stdout.write(self.style.SUCCESS(f'✓ 創建玩家資料'))
@@ -70,10 +75,8 @@ class Command(BaseCommand):
             
             for item in shop_items:
                 # 計算購買到最高等級的總成本
-                # 價格計算：base_price * (level + 1)
-                cost = 0
-                for level in range(item.max_level):
-                    cost += item.base_price * (level + 1)
+                # 價格計算：base_price * (level + 1)，各級總和以等差數列公式計算
+                cost = cumulative_price(item.base_price, 0, item.max_level)
                 
                 # 獲取或創建購買記錄
                 purchase, purchase_created = PlayerPurchase.objects.get_or_create(
@@ -104,6 +107,9 @@ class Command(BaseCommand):
             else:
                 # 如果金幣不足，直接設置為足夠的金幣
                 profile.coins = coins
+            # 同步玩家資料的購買等級並遞增資料版本
+            profile.purchase_levels = purchase_levels_from_records(user.id)
+            profile.data_version += 1
             profile.save()
 
             # 解鎖所有成就
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from game.partitions import ensure_upcoming_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        '建立遊戲記錄表當月到未來月份的分區（PostgreSQL 分區表）。'
+        '與歸檔無關，建議每日排程執行，確保跨月前下個月的分區已經存在'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=getattr(settings, 'GAME_SESSION_PARTITION_MONTHS_AHEAD', 3),
+            help='預先建立未來幾個月的分區（預設: GAME_SESSION_PARTITION_MONTHS_AHEAD）'
+        )
+
+    def handle(self, *args, **options):
+        if options['months_ahead'] < 0:
+            self.stderr.write(self.style.ERROR('--months-ahead 不能小於0'))
+            return
+        created = ensure_upcoming_partitions(options['months_ahead'])
+        if not is_partitioned():
+            self.stdout.write('遊戲記錄表不是分區表（非 PostgreSQL），不需要建立分區')
+            return
+        for name in created:
+            self.stdout.write(f'已建立分區 {name}')
+        self.stdout.write(self.style.SUCCESS(f'完成！新建立 {len(created)} 個分區'))
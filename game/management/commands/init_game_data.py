@@ -150,14 +150,22 @@ class Command(BaseCommand):
             },
         ]
 
+        created_achievements = 0
         for ach_data in achievements:
             achievement, created = Achievement.objects.get_or_create(
                 name=ach_data['name'],
                 defaults=ach_data
             )
             if created:
+                created_achievements += 1
                 self.stdout.write(self.style.SUCCESS(f'Created achievement: {achievement.name}'))
             else:
                 self.stdout.write(self.style.WARNING(f'Achievement already exists: {achievement.name}'))
 
         self.stdout.write(self.style.SUCCESS('\nGame data initialization completed!'))
+        if created_achievements:
+            # 新成就只在玩家下一局時檢查，已達成條件的玩家需要補發
+            self.stdout.write(
+                'New achievements were added; run "python manage.py backfill_achievements" '
+                'to unlock them for players who already qualify.'
+            )
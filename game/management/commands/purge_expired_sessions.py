@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+from game.management.checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from game.models import UserSession
+import time
+
+
+class Command(BaseCommand):
+    help = '分批刪除過期的 session（依 session_key 排序，每批一個短交易，避免長時間鎖表）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='每批刪除的 session 數量（預設: 1000）'
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            default=0,
+            help='最長執行秒數，用完後停止並保留檢查點（預設: 0，不限制）'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default='',
+            help='檢查點檔案路徑，用於中斷後從上次的 session_key 續跑'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='每批之間暫停的秒數，降低對線上資料庫的壓力（預設: 0）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只統計會被刪除的 session，不實際刪除'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        time_budget = options['time_budget']
+        checkpoint_path = options['checkpoint']
+        pause = options['sleep']
+        dry_run = options['dry_run']
+
+        if chunk_size < 1:
+            self.stderr.write(self.style.ERROR('--chunk-size 必須大於0'))
+            return
+
+        now = timezone.now()
+        last_key = load_checkpoint(checkpoint_path).get('last_session_key', '')
+        if last_key:
+            self.stdout.write(f'從檢查點續跑：session_key > {last_key}')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('試運行模式：不會刪除任何資料'))
+
+        start_time = time.monotonic()
+        total = 0
+        finished = False
+        while True:
+            expired = Session.objects.filter(expire_date__lt=now)
+            if last_key:
+                expired = expired.filter(session_key__gt=last_key)
+            keys = list(
+                expired.order_by('session_key').values_list('session_key', flat=True)[:chunk_size]
+            )
+            if not keys:
+                finished = True
+                break
+
+            if dry_run:
+                deleted = len(keys)
+            else:
+                # 每批使用獨立的短交易，鎖定時間只與批次大小有關
+                with transaction.atomic():
+                    deleted, _ = Session.objects.filter(
+                        session_key__in=keys, expire_date__lt=now
+                    ).delete()
+                    UserSession.objects.filter(session_key__in=keys).delete()
+                save_checkpoint(checkpoint_path, {'last_session_key': keys[-1]})
+
+            total += deleted
+            last_key = keys[-1]
+            elapsed = time.monotonic() - start_time
+            rate = total / elapsed if elapsed > 0 else float(total)
+            self.stdout.write(f'已處理 {total:,} 筆過期 session（{rate:,.0f} 筆/秒）')
+
+            if time_budget and elapsed >= time_budget:
+                break
+            if pause:
+                time.sleep(pause)
+
+        elapsed = time.monotonic() - start_time
+        rate = total / elapsed if elapsed > 0 else float(total)
+        action = '將刪除' if dry_run else '已刪除'
+        if finished:
+            if not dry_run:
+                clear_checkpoint(checkpoint_path)
+            self.stdout.write(self.style.SUCCESS(
+                f'完成！{action} {total:,} 筆過期 session，耗時 {elapsed:.2f} 秒（{rate:,.0f} 筆/秒）'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'時間預算已用完：{action} {total:,} 筆過期 session，耗時 {elapsed:.2f} 秒'
+                f'（{rate:,.0f} 筆/秒），最後處理的 session_key: {last_key}'
+            ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from game.ranks import max_score, rebuild_score_ranks
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        '由玩家資料重建全服排名的樹狀陣列（一個 GROUP BY 查詢彙總最佳單局點擊數，重新寫入所有節點）。'
+        '部署排名功能後、修改 GAME_RANK_MAX_SCORE 後或直接修改資料庫中的最佳成績後執行'
+    )
+
+    def handle(self, *args, **options):
+        start_time = time.monotonic()
+        players = rebuild_score_ranks()
+        elapsed = time.monotonic() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f'完成！{players:,} 位玩家列入排名（最高分數 {max_score():,}），耗時 {elapsed:.2f} 秒'
+        ))
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_user_session_index(apps, schema_editor):
+    """為已存在的活躍 session 建立索引（只在遷移時解碼一次）"""
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.utils import timezone
+
+    Session = apps.get_model("sessions", "Session")
+    User = apps.get_model("auth", "User")
+    UserSession = apps.get_model("game", "UserSession")
+
+    store = SessionStore()
+    existing_user_ids = set(User.objects.values_list("id", flat=True))
+    batch = []
+    for session in Session.objects.filter(expire_date__gte=timezone.now()).iterator(
+        chunk_size=2000
+    ):
+        try:
+            user_id = int(store.decode(session.session_data).get("_auth_user_id"))
+        except (TypeError, ValueError):
+            continue
+        if user_id not in existing_user_ids:
+            continue
+        batch.append(UserSession(user_id=user_id, session_key=session.session_key))
+        if len(batch) >= 2000:
+            UserSession.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        UserSession.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0004_alter_gamesession_played_at_and_more"),
+        ("sessions", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserSession",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "session_key",
+                    models.CharField(
+                        max_length=40, unique=True, verbose_name="Session Key"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="登入時間"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="session_index",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "用戶 Session 索引",
+                "verbose_name_plural": "用戶 Session 索引",
+            },
+        ),
+        migrations.RunPython(backfill_user_session_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0005_usersession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playerprofile",
+            name="auth_epoch",
+            field=models.IntegerField(default=0, verbose_name="登入憑證版本"),
+        ),
+    ]
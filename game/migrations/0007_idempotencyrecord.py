@@ -0,0 +1,62 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0006_playerprofile_auth_epoch"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key_hash", models.CharField(max_length=64, verbose_name="Key 雜湊")),
+                (
+                    "request_hash",
+                    models.CharField(max_length=64, verbose_name="請求內容雜湊"),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="回應狀態碼"
+                    ),
+                ),
+                (
+                    "response_body",
+                    models.TextField(blank=True, default="", verbose_name="回應內容"),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(db_index=True, verbose_name="過期時間"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="idempotency_records",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "冪等請求記錄",
+                "verbose_name_plural": "冪等請求記錄",
+                "unique_together": {("user", "key_hash")},
+            },
+        ),
+    ]
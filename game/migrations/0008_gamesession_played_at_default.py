@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0007_idempotencyrecord"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="gamesession",
+            name="played_at",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="遊戲時間",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0008_gamesession_played_at_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="日期（UTC）")),
+                (
+                    "games_played",
+                    models.IntegerField(default=0, verbose_name="遊戲局數"),
+                ),
+                (
+                    "total_clicks",
+                    models.BigIntegerField(default=0, verbose_name="總點擊次數"),
+                ),
+                (
+                    "coins_earned",
+                    models.BigIntegerField(default=0, verbose_name="獲得金幣"),
+                ),
+                (
+                    "best_clicks",
+                    models.IntegerField(default=0, verbose_name="單局最佳點擊次數"),
+                ),
+                (
+                    "total_duration",
+                    models.FloatField(default=0, verbose_name="總遊戲時長（秒）"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "玩家每日統計",
+                "verbose_name_plural": "玩家每日統計",
+                "unique_together": {("user", "day")},
+            },
+        ),
+    ]
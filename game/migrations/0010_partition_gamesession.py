@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+TABLE = "game_gamesession"
+LEGACY_TABLE = "game_gamesession_legacy"
+SEQUENCE = "game_gamesession_id_seq"
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _month_start(moment):
+    return moment.astimezone(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def partition_game_sessions(apps, schema_editor):
+    """PostgreSQL：將遊戲記錄表改為依 played_at 按月分區的宣告式分區表
+
+    分區表的主鍵必須包含分區鍵，改為 (id, played_at)；id 仍由序列產生且唯一。
+    既有的索引與外鍵以原本的名稱重建在分區表上（每個分區各自擁有一份較小的索引）。
+    其他資料庫維持一般資料表，歸檔命令改用分批刪除。
+
+    既有資料在遷移中整表複製一次，資料量很大時請在維護時段執行。
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+        if cursor.fetchone()[0] == "p":
+            return
+
+        # 記錄既有的索引與外鍵定義（主鍵除外），刪除舊表後以相同名稱重建
+        cursor.execute(
+            """
+            SELECT indexdef FROM pg_indexes
+            WHERE tablename = %s AND indexname NOT IN (
+                SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass
+            )
+            """,
+            [TABLE, TABLE],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT min(played_at) FROM {TABLE}")
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE}) PARTITION BY RANGE (played_at)")
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_partitioned_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_partitioned_id_seq')"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, played_at)")
+
+        # 每月一個分區（最早的資料到未來 MONTHS_AHEAD 個月），範圍外的資料進入預設分區
+        current = _month_start(datetime.now(timezone.utc))
+        month = _month_start(oldest) if oldest is not None and oldest < current else current
+        last = _add_months(current, MONTHS_AHEAD)
+        while month <= last:
+            upper = _add_months(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            month = upper
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY_TABLE}")
+        cursor.execute(
+            f"SELECT setval('{TABLE}_partitioned_id_seq', COALESCE(max(id), 0) + 1, false) FROM {TABLE}"
+        )
+        cursor.execute(f"DROP TABLE {LEGACY_TABLE}")
+        cursor.execute(f"ALTER SEQUENCE {TABLE}_partitioned_id_seq RENAME TO {SEQUENCE}")
+
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0009_playerdailystats"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_game_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0010_partition_gamesession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playerprofile",
+            name="data_version",
+            field=models.BigIntegerField(
+                default=0, editable=False, verbose_name="資料版本"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+def fill_purchase_levels(apps, schema_editor):
+    """由既有的購買記錄填入玩家資料的購買等級（依用戶分批寫入）"""
+    PlayerProfile = apps.get_model("game", "PlayerProfile")
+    PlayerPurchase = apps.get_model("game", "PlayerPurchase")
+
+    def flush(levels_by_user):
+        profiles = list(PlayerProfile.objects.filter(user_id__in=levels_by_user))
+        for profile in profiles:
+            profile.purchase_levels = levels_by_user[profile.user_id]
+        PlayerProfile.objects.bulk_update(profiles, ["purchase_levels"], batch_size=500)
+
+    levels_by_user = {}
+    purchases = (
+        PlayerPurchase.objects.filter(level__gt=0)
+        .order_by("user_id")
+        .values_list("user_id", "shop_item_id", "level")
+    )
+    for user_id, shop_item_id, level in purchases.iterator(chunk_size=2000):
+        if user_id not in levels_by_user and len(levels_by_user) >= 500:
+            flush(levels_by_user)
+            levels_by_user = {}
+        levels_by_user.setdefault(user_id, {})[str(shop_item_id)] = level
+    if levels_by_user:
+        flush(levels_by_user)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0011_playerprofile_data_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playerprofile",
+            name="purchase_levels",
+            field=models.JSONField(
+                blank=True, default=dict, editable=False, verbose_name="購買等級"
+            ),
+        ),
+        migrations.RunPython(fill_purchase_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+def encode_unlocked(achievement_ids):
+    # 與 game.achievements.encode_unlocked 相同的編碼（遷移不引用應用程式碼）
+    value = 0
+    for achievement_id in achievement_ids:
+        value |= 1 << achievement_id
+    return value.to_bytes((value.bit_length() + 7) // 8, "little")
+
+
+def fill_achievement_bits(apps, schema_editor):
+    """由既有的解鎖記錄填入玩家資料的已解鎖成就位元組（依用戶分批寫入）"""
+    PlayerProfile = apps.get_model("game", "PlayerProfile")
+    PlayerAchievement = apps.get_model("game", "PlayerAchievement")
+
+    def flush(ids_by_user):
+        profiles = list(PlayerProfile.objects.filter(user_id__in=ids_by_user))
+        for profile in profiles:
+            profile.achievement_bits = encode_unlocked(ids_by_user[profile.user_id])
+        PlayerProfile.objects.bulk_update(profiles, ["achievement_bits"], batch_size=500)
+
+    ids_by_user = {}
+    unlocks = (
+        PlayerAchievement.objects.order_by("user_id")
+        .values_list("user_id", "achievement_id")
+    )
+    for user_id, achievement_id in unlocks.iterator(chunk_size=2000):
+        if user_id not in ids_by_user and len(ids_by_user) >= 500:
+            flush(ids_by_user)
+            ids_by_user = {}
+        ids_by_user.setdefault(user_id, []).append(achievement_id)
+    if ids_by_user:
+        flush(ids_by_user)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0012_playerprofile_purchase_levels"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="playerprofile",
+            name="achievement_bits",
+            field=models.BinaryField(
+                blank=True, default=b"", verbose_name="已解鎖成就"
+            ),
+        ),
+        migrations.RunPython(fill_achievement_bits, migrations.RunPython.noop),
+    ]
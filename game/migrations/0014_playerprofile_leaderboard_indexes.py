@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0013_playerprofile_achievement_bits"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="playerprofile",
+            index=models.Index(
+                fields=["-best_clicks_per_round", "user"], name="profile_best_round_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="playerprofile",
+            index=models.Index(
+                fields=["-total_clicks", "user"], name="profile_total_clicks_idx"
+            ),
+        ),
+    ]
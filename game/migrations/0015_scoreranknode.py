@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:25
+
+from collections import Counter
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_score_ranks(apps, schema_editor):
+    """由既有的玩家資料建立排名的樹狀陣列（與 game.ranks.rebuild_score_ranks 相同，遷移不引用應用程式碼）"""
+    PlayerProfile = apps.get_model("game", "PlayerProfile")
+    ScoreRankNode = apps.get_model("game", "ScoreRankNode")
+    size = getattr(settings, "GAME_RANK_MAX_SCORE", 2 ** 20 - 1)
+    tree = Counter()
+    counts = (
+        PlayerProfile.objects.filter(best_clicks_per_round__gt=0)
+        .values_list("best_clicks_per_round")
+        .annotate(players=Count("pk"))
+        .order_by()
+    )
+    for score, count in counts:
+        index = size + 1 - min(score, size)
+        while index <= size:
+            tree[index] += count
+            index += index & -index
+    ScoreRankNode.objects.bulk_create(
+        [ScoreRankNode(node=node, players=count) for node, count in sorted(tree.items())],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0014_playerprofile_leaderboard_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScoreRankNode",
+            fields=[
+                (
+                    "node",
+                    models.PositiveIntegerField(
+                        primary_key=True, serialize=False, verbose_name="節點"
+                    ),
+                ),
+                ("players", models.IntegerField(default=0, verbose_name="玩家人數")),
+            ],
+            options={
+                "verbose_name": "排名節點",
+                "verbose_name_plural": "排名節點",
+            },
+        ),
+        migrations.RunPython(fill_score_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0015_scoreranknode"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="shopitem",
+            name="item_type",
+            field=models.CharField(
+                choices=[
+                    ("time_extension", "遊戲時間延長"),
+                    ("extra_button", "購買寵物夥伴"),
+                    ("auto_clicker", "提升寵物夥伴能力"),
+                ],
+                max_length=20,
+                verbose_name="物品類型",
+            ),
+        ),
+    ]
@@ -15,6 +15,16 @@ class PlayerProfile(models.Model):
     badge_1_id = models.IntegerField(null=True, blank=True, verbose_name="徽章1")
     badge_2_id = models.IntegerField(null=True, blank=True, verbose_name="徽章2")
     badge_3_id = models.IntegerField(null=True, blank=True, verbose_name="徽章3")
+    # 簽名登入憑證的撤銷計數（每次登入/登出遞增，舊憑證即失效）
+    auth_epoch = models.IntegerField(default=0, verbose_name="登入憑證版本")
+    # 玩家資料版本（提交遊戲、購買、解鎖成就、更換徽章時遞增），作為讀取 API 的 ETag
+    data_version = models.BigIntegerField(default=0, editable=False, verbose_name="資料版本")
+    # 各商店物品的目前等級 {"商店物品ID": 等級}（PlayerPurchase 的反正規化副本，
+    # 玩家資料與商店只需讀取這一列；購買與回溯時在同一個交易內同步，check_purchase_levels 命令檢查一致性）
+    purchase_levels = models.JSONField(default=dict, blank=True, editable=False, verbose_name="購買等級")
+    # 已解鎖成就的位元組（成就 ID n 對應第 n // 8 個位元組的第 n % 8 位，去除結尾的 0 位元組），
+    # PlayerAchievement 的精簡副本：新增成就只會延長位元組，已有的位元不變（見 game.achievements）
+    achievement_bits = models.BinaryField(default=b'', blank=True, editable=False, verbose_name="已解鎖成就")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -24,6 +34,11 @@ class PlayerProfile(models.Model):
     class Meta:
         verbose_name = "玩家資料"
         verbose_name_plural = "玩家資料"
+        # 排行榜依分數由高到低讀取前 N 名（見 game.leaderboard）
+        indexes = [
+            models.Index(fields=['-best_clicks_per_round', 'user'], name='profile_best_round_idx'),
+            models.Index(fields=['-total_clicks', 'user'], name='profile_total_clicks_idx'),
+        ]
 
 
 class GameSession(models.Model):
@@ -32,7 +47,8 @@ class GameSession(models.Model):
     clicks = models.IntegerField(default=0, verbose_name="點擊次數")
     game_duration = models.FloatField(default=10.0, verbose_name="遊戲時長（秒）")
     coins_earned = models.IntegerField(default=0, verbose_name="獲得金幣")
-    played_at = models.DateTimeField(auto_now_add=True, verbose_name="遊戲時間", db_index=True)
+    # 使用 default 而非 auto_now_add：延遲寫入模式下保留提交時的時間，而不是寫入資料庫的時間
+    played_at = models.DateTimeField(default=timezone.now, verbose_name="遊戲時間", db_index=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.clicks} 點擊 - {self.played_at}"
@@ -46,6 +62,47 @@ class GameSession(models.Model):
         ]
 
 
+class PlayerDailyStats(models.Model):
+    """玩家每日統計（依 UTC 日期彙總遊戲記錄）
+
+    提交遊戲時以 upsert 累加（game.daily_stats），每日/每週統計只需讀取少量彙總資料列，
+    不需要掃描 GameSession；既有的遊戲記錄以 backfill_daily_stats 命令重建。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField(verbose_name="日期（UTC）")
+    games_played = models.IntegerField(default=0, verbose_name="遊戲局數")
+    total_clicks = models.BigIntegerField(default=0, verbose_name="總點擊次數")
+    coins_earned = models.BigIntegerField(default=0, verbose_name="獲得金幣")
+    best_clicks = models.IntegerField(default=0, verbose_name="單局最佳點擊次數")
+    total_duration = models.FloatField(default=0, verbose_name="總遊戲時長（秒）")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.day} - {self.games_played} 局"
+
+    class Meta:
+        verbose_name = "玩家每日統計"
+        verbose_name_plural = "玩家每日統計"
+        # 唯一約束同時是 upsert 的衝突目標與依用戶查詢日期範圍的索引
+        unique_together = ['user', 'day']
+
+
+class ScoreRankNode(models.Model):
+    """全服排名的樹狀陣列節點（最佳單局點擊數的玩家人數）
+
+    最佳成績改變時由 game.ranks 增量更新（與提交在同一個交易內），
+    查詢排名只讀取最多 log2(GAME_RANK_MAX_SCORE) 個節點；以 rebuild_score_ranks 命令由玩家資料重建。
+    """
+    node = models.PositiveIntegerField(primary_key=True, verbose_name="節點")
+    players = models.IntegerField(default=0, verbose_name="玩家人數")
+
+    def __str__(self):
+        return f"節點 {self.node} - {self.players} 位玩家"
+
+    class Meta:
+        verbose_name = "排名節點"
+        verbose_name_plural = "排名節點"
+
+
 class ShopItem(models.Model):
     """商店物品"""
     ITEM_TYPES = [
@@ -122,3 +179,43 @@ class PlayerAchievement(models.Model):
         verbose_name = "玩家成就"
         verbose_name_plural = "玩家成就"
         unique_together = ['user', 'achievement']
+
+
+class UserSession(models.Model):
+    """用戶 Session 索引（記錄 session_key 屬於哪個用戶）
+
+    單一會話策略需要找出某個用戶的所有 session，django_session 只存放編碼後的資料，
+    無法依用戶查詢。此索引在登入/登出時維護，讓清除舊會話只需一次索引查詢加一次批量刪除。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='session_index', db_index=True)
+    session_key = models.CharField(max_length=40, unique=True, verbose_name="Session Key")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="登入時間")
+
+    def __str__(self):
+        return f"{self.user.username} - {self.session_key}"
+
+    class Meta:
+        verbose_name = "用戶 Session 索引"
+        verbose_name_plural = "用戶 Session 索引"
+
+
+class IdempotencyRecord(models.Model):
+    """冪等請求記錄（Idempotency-Key 去重）
+
+    只存放 key 與請求內容的雜湊值，以及第一次處理的回應；status_code 為空表示仍在處理中。
+    記錄在 expires_at 之後失效，由 game.idempotency 定期批量刪除。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_records')
+    key_hash = models.CharField(max_length=64, verbose_name="Key 雜湊")
+    request_hash = models.CharField(max_length=64, verbose_name="請求內容雜湊")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="回應狀態碼")
+    response_body = models.TextField(blank=True, default='', verbose_name="回應內容")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="過期時間")
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key_hash[:12]}"
+
+    class Meta:
+        verbose_name = "冪等請求記錄"
+        verbose_name_plural = "冪等請求記錄"
+        unique_together = ['user', 'key_hash']
@@ -0,0 +1,169 @@
+"""
+GameSession 依月份分區與歸檔
+
+PostgreSQL 上遊戲記錄表是依 played_at 按月分區的宣告式分區表（遷移 0010），
+每個分區各自擁有 game_session_user_played_idx 等索引：
+- 提交遊戲只寫入當月分區，只維護當月分區的索引
+- 最近歷史記錄先查詢當月（分區裁剪只讀取當月分區），筆數不足才往前查詢
+- 舊的分區由 archive_game_sessions 命令匯出為壓縮的 CSV 後卸離並刪除
+- 未來月份的分區在每次 migrate 後（post_migrate 信號）與 ensure_game_session_partitions 命令
+  （建議每日排程）建立，不依賴歸檔命令；沒有對應分區的記錄寫入預設分區，建立分區時再移入
+
+其他資料庫（SQLite）沒有分區，讀取維持一般查詢，歸檔命令改為匯出後分批刪除。
+"""
+from datetime import datetime, timezone as dt_timezone
+import csv
+import gzip
+import os
+import re
+from django.conf import settings
+from django.db import connection, transaction
+from .models import GameSession
+
+TABLE = GameSession._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+EXPORT_FIELDS = ('id', 'user_id', 'clicks', 'game_duration', 'coins_earned', 'played_at')
+
+_PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+_partitioned = None
+
+
+def month_start(moment):
+    """時間所在月份的第一天零時（UTC）"""
+    return moment.astimezone(dt_timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def add_months(month, count):
+    """月份加減（month 為月初）"""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def current_month():
+    return month_start(datetime.now(dt_timezone.utc))
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned():
+    """遊戲記錄表是否為分區表（只在 PostgreSQL 上查詢一次系統目錄）"""
+    global _partitioned
+    if _partitioned is None:
+        if connection.vendor != 'postgresql':
+            _partitioned = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass', [TABLE])
+                _partitioned = cursor.fetchone()[0] == 'p'
+    return _partitioned
+
+
+def list_partitions():
+    """已掛載的月份分區，返回 [(月初, 分區名稱)]，依月份排序"""
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = %s::regclass',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((month, name))
+    return sorted(partitions)
+
+
+def ensure_partitions(months_ahead=3):
+    """建立當月到未來 months_ahead 個月的分區，返回新建立的分區名稱
+
+    預設分區中已有落在新分區範圍內的資料時，先移到新的資料表再掛載為分區。
+    """
+    if not is_partitioned():
+        return []
+    qn = connection.ops.quote_name
+    existing = {month for month, _ in list_partitions()}
+    created = []
+    month = current_month()
+    for _ in range(months_ahead + 1):
+        upper = add_months(month, 1)
+        if month not in existing:
+            name = partition_name(month)
+            bounds = f"FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+                )
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} '
+                    f'WHERE played_at >= %s AND played_at < %s RETURNING *) '
+                    f'INSERT INTO {qn(name)} SELECT * FROM moved',
+                    [month, upper],
+                )
+                cursor.execute(f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} FOR VALUES {bounds}')
+            created.append(name)
+        month = upper
+    return created
+
+
+def ensure_upcoming_partitions(months_ahead=None):
+    """建立當月到未來 GAME_SESSION_PARTITION_MONTHS_AHEAD 個月的分區（migrate 後與排程命令呼叫）
+
+    重新檢查資料表是否為分區表：同一個程序中 migrate 可能剛把資料表轉換為分區表。
+    """
+    global _partitioned
+    _partitioned = None
+    if months_ahead is None:
+        months_ahead = getattr(settings, 'GAME_SESSION_PARTITION_MONTHS_AHEAD', 3)
+    return ensure_partitions(months_ahead)
+
+
+def drop_partition(name):
+    """卸離並刪除分區（資料已匯出之後）"""
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(name)}')
+        cursor.execute(f'DROP TABLE {qn(name)}')
+
+
+def month_queryset(month):
+    """某個月份的遊戲記錄（分區表上只掃描該月分區）"""
+    return GameSession.objects.filter(played_at__gte=month, played_at__lt=add_months(month, 1))
+
+
+def export_sessions(queryset, path, chunk_size=2000):
+    """將遊戲記錄以串流方式匯出為 gzip 壓縮的 CSV（先寫入暫存檔再替換），返回匯出筆數"""
+    tmp_path = f'{path}.tmp'
+    count = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_FIELDS)
+        for row in queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+            writer.writerow(row[:-1] + (row[-1].isoformat(),))
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def latest_sessions(user, limit, fields):
+    """玩家最新的 limit 筆遊戲記錄（values() 字典，依時間由新到舊）
+
+    分區表上先只查詢當月分區；當月不足 limit 筆時才查詢較早的月份。
+    """
+    sessions = GameSession.objects.filter(user=user).order_by('-played_at')
+    if not is_partitioned():
+        return list(sessions[:limit].values(*fields))
+    month = current_month()
+    recent = list(month_queryset(month).filter(user=user).order_by('-played_at')[:limit].values(*fields))
+    if len(recent) < limit:
+        recent += list(sessions.filter(played_at__lt=month)[:limit - len(recent)].values(*fields))
+    return recent
@@ -0,0 +1,146 @@
+"""
+玩家帳號的登入/註冊快速路徑
+
+登入時以最少的語句取得（或建立）用戶與玩家資料：
+- 已存在的玩家：一次 JOIN 查詢同時取得 User 與 PlayerProfile
+- 新玩家：PostgreSQL 以單一語句（資料修改 CTE）INSERT ... ON CONFLICT DO NOTHING RETURNING
+  同時建立 User 與 PlayerProfile；SQLite 以 INSERT ... ON CONFLICT DO NOTHING RETURNING
+  建立 User 後再 INSERT PlayerProfile（同一個交易內）
+"""
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from .models import PlayerProfile
+
+
+def _insert_columns(instance):
+    """依模型欄位產生 INSERT 的欄位與參數（套用 auto_now_add 等 pre_save 行為）"""
+    columns = []
+    params = []
+    for field in instance._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        value = field.get_db_prep_save(field.pre_save(instance, add=True), connection=connection)
+        columns.append(connection.ops.quote_name(field.column))
+        params.append(value)
+    return columns, params
+
+
+def _mark_saved(instance, pk):
+    """將以原生 SQL 插入的物件標記為已儲存"""
+    instance.pk = pk
+    instance._state.adding = False
+    instance._state.db = connection.alias
+
+
+def _supports_insert_returning():
+    return (
+        connection.vendor in ('postgresql', 'sqlite')
+        and connection.features.can_return_columns_from_insert
+    )
+
+
+def _insert_player_postgresql(user, profile):
+    """PostgreSQL：單一語句建立 User 與 PlayerProfile，用戶名衝突時不返回任何資料列"""
+    user_columns, user_params = _insert_columns(user)
+    profile.user_id = 0  # 佔位，實際值由 CTE 提供
+    profile_columns, profile_params = _insert_columns(profile)
+    user_id_column = connection.ops.quote_name(PlayerProfile._meta.get_field('user').column)
+    profile_select = [
+        'new_user.id' if column == user_id_column else '%s'
+        for column in profile_columns
+    ]
+    profile_params = [
+        param for column, param in zip(profile_columns, profile_params)
+        if column != user_id_column
+    ]
+    sql = (
+        f'WITH new_user AS ('
+        f'INSERT INTO {connection.ops.quote_name(User._meta.db_table)} ({", ".join(user_columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(user_params))}) '
+        f'ON CONFLICT ({connection.ops.quote_name("username")}) DO NOTHING RETURNING id'
+        f') '
+        f'INSERT INTO {connection.ops.quote_name(PlayerProfile._meta.db_table)} ({", ".join(profile_columns)}) '
+        f'SELECT {", ".join(profile_select)} FROM new_user '
+        f'RETURNING id, {user_id_column}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, user_params + profile_params)
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    _mark_saved(user, row[1])
+    profile.user = user
+    _mark_saved(profile, row[0])
+    return True
+
+
+def _insert_player_sqlite(user, profile):
+    """SQLite：INSERT ... ON CONFLICT DO NOTHING RETURNING 建立 User，再建立 PlayerProfile"""
+    user_columns, user_params = _insert_columns(user)
+    sql = (
+        f'INSERT INTO {connection.ops.quote_name(User._meta.db_table)} ({", ".join(user_columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(user_params))}) '
+        f'ON CONFLICT ({connection.ops.quote_name("username")}) DO NOTHING RETURNING id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, user_params)
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    _mark_saved(user, row[0])
+    profile.user = user
+    profile.save(force_insert=True)
+    return True
+
+
+def _insert_player_fallback(user, profile):
+    """不支援 RETURNING 的資料庫：使用 ORM 建立（用戶名衝突時返回 False）"""
+    from django.db import IntegrityError
+    try:
+        with transaction.atomic():
+            user.save(force_insert=True)
+    except IntegrityError:
+        return False
+    profile.user = user
+    profile.save(force_insert=True)
+    return True
+
+
+def get_or_create_player(username):
+    """獲取或建立玩家（User + PlayerProfile）
+
+    Returns:
+        tuple: (user, profile, created)
+    """
+    user = (
+        User.objects.select_related('player_profile')
+        .filter(username=username)
+        .first()
+    )
+    if user is not None:
+        # 已存在的用戶：如果密碼為空，設置為不可用（確保超級帳號等無密碼用戶能正常登錄）
+        if not user.password:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        try:
+            profile = user.player_profile
+        except PlayerProfile.DoesNotExist:
+            profile, _ = PlayerProfile.objects.get_or_create(user=user)
+        return user, profile, False
+
+    # 新用戶：建立時直接設置不可用密碼，不需要額外的 UPDATE
+    user = User(username=username, password=make_password(None))
+    profile = PlayerProfile()
+    with transaction.atomic():
+        if not _supports_insert_returning():
+            inserted = _insert_player_fallback(user, profile)
+        elif connection.vendor == 'postgresql':
+            inserted = _insert_player_postgresql(user, profile)
+        else:
+            inserted = _insert_player_sqlite(user, profile)
+
+    if not inserted:
+        # 競爭條件：其他請求已建立同名用戶，改為讀取現有資料
+        return get_or_create_player(username)
+    return user, profile, True
@@ -0,0 +1,24 @@
+"""
+商店物品價格計算
+
+從等級 L 升級到 L + 1 的價格為 base_price × (L + 1)，
+從等級 a 連續升級到等級 b 的總價是等差數列的和，以公式直接計算（不需要逐級累加）：
+
+    base_price × (b(b + 1) / 2 − a(a + 1) / 2)
+"""
+
+
+def _triangular(n):
+    return n * (n + 1) // 2
+
+
+def level_price(base_price, current_level):
+    """從 current_level 升級一級的價格"""
+    return base_price * (current_level + 1)
+
+
+def cumulative_price(base_price, from_level, to_level):
+    """從 from_level 連續升級到 to_level 的總價（to_level 不大於 from_level 時為 0）"""
+    if to_level <= from_level:
+        return 0
+    return base_price * (_triangular(to_level) - _triangular(from_level))
@@ -0,0 +1,295 @@
+"""
+購買商店物品（樂觀並發，必要時退回鎖定路徑）
+
+一般的購買不鎖定玩家資料：
+1. 不加鎖讀取相關的購買等級，驗證條件並計算價格
+2. 在一個短交易內以條件 UPDATE 扣款（coins >= 價格時才扣，game.counters.debit_coins），
+   再以比較並交換（compare-and-set）更新等級：UPDATE ... WHERE level = 讀取時的等級；
+   第一次購買以 INSERT 建立記錄，唯一約束 (user, shop_item) 保證只有一個請求成功
+3. 等級已被並發的請求修改時整個交易回滾（扣款一併撤銷），重新讀取後重試
+
+重試 GAME_PURCHASE_CAS_RETRIES 次仍衝突，或玩家資料不存在（舊帳號）時，
+退回原本以 select_for_update 鎖定玩家資料的購買流程。
+
+PlayerProfile.purchase_levels 是各物品等級的反正規化副本（{"商店物品ID": 等級}），
+玩家資料與商店的讀取只需要這一列；扣款的 UPDATE 同時以 JSON 合併修改購買的物品等級，
+並發購買不同物品時不會互相覆蓋。PlayerPurchase 仍是購買記錄，並作為比較並交換的依據。
+"""
+from collections import namedtuple
+import json
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, JSONField, Value
+from .counters import debit_coins
+from .models import PlayerProfile, PlayerPurchase
+from .pricing import cumulative_price
+
+# profile 為購買後的玩家資料（用於檢查依賴金幣或購買等級的成就）
+PurchaseResult = namedtuple('PurchaseResult', ['old_level', 'new_level', 'price', 'coins', 'profile'])
+
+
+class PurchaseRejected(Exception):
+    """購買條件不成立（前置條件、等級或金幣不足），payload 是返回給用戶端的錯誤內容"""
+
+    def __init__(self, payload):
+        super().__init__(payload['error'])
+        self.payload = payload
+
+
+class PurchaseConflict(Exception):
+    """讀取後等級已被並發的請求修改"""
+
+
+class MergePurchaseLevels(Func):
+    """在 UPDATE 中將 patch 合併進 purchase_levels（值為 None 的鍵移除），只修改 patch 中的物品
+
+    SQLite 使用 json_patch、MySQL 使用 JSON_MERGE_PATCH（RFC 7396 合併，null 即移除），
+    PostgreSQL 以 jsonb || 合併後 jsonb_strip_nulls 移除 null。
+    """
+    function = 'JSON_MERGE_PATCH'
+    output_field = JSONField()
+
+    def __init__(self, patch):
+        patch = {str(shop_item_id): level for shop_item_id, level in patch.items()}
+        super().__init__(F('purchase_levels'), Value(json.dumps(patch)))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='json_patch', **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='jsonb_strip_nulls(%(expressions)s::jsonb)', arg_joiner=' || ',
+            **extra_context
+        )
+
+
+def profile_levels(purchase_levels):
+    """purchase_levels 欄位轉為 {shop_item_id: level}（只包含等級大於 0 的物品）"""
+    return {int(shop_item_id): level for shop_item_id, level in (purchase_levels or {}).items() if level}
+
+
+def set_purchase_levels(user_id, patch):
+    """修改玩家資料中部分物品的等級（等級 0 移除）並遞增資料版本（回溯商店等級時使用）"""
+    patch = {shop_item_id: level or None for shop_item_id, level in patch.items()}
+    PlayerProfile.objects.filter(user_id=user_id).update(
+        purchase_levels=MergePurchaseLevels(patch), data_version=F('data_version') + 1
+    )
+
+
+def purchase_levels_from_records(user_id):
+    """由購買記錄重新計算的 purchase_levels"""
+    return {
+        str(shop_item_id): level
+        for shop_item_id, level in PlayerPurchase.objects.filter(user_id=user_id, level__gt=0)
+        .values_list('shop_item_id', 'level')
+    }
+
+
+def sync_purchase_levels(user_id):
+    """以購買記錄覆蓋玩家資料的 purchase_levels 並遞增資料版本（後台修改購買記錄後使用）"""
+    PlayerProfile.objects.filter(user_id=user_id).update(
+        purchase_levels=purchase_levels_from_records(user_id), data_version=F('data_version') + 1
+    )
+
+
+def _insufficient_coins(coins, price):
+    return PurchaseRejected({
+        'error': '金幣不足',
+        'current_coins': coins,
+        'required_coins': price,
+        'shortage': price - coins
+    })
+
+
+def related_items(catalog, shop_item):
+    """購買時需要一併檢查或建立的相關物品 {item_type: ShopItemEntry}"""
+    if shop_item.item_type == 'auto_clicker':
+        # 提升寵物夥伴能力時，需要檢查寵物夥伴
+        related_type = 'extra_button'
+    elif shop_item.item_type == 'extra_button':
+        # 購買寵物夥伴時，可能需要創建寵物夥伴能力
+        related_type = 'auto_clicker'
+    else:
+        return {}
+    related = catalog.shop_item_of_type(related_type)
+    return {related_type: related} if related else {}
+
+
+def plan_purchase(shop_item, related, levels_by_id, levels=None, target_level=None):
+    """驗證購買條件並計算價格，返回 (目前等級, 目標等級, 總價)
+
+    levels_by_id 為玩家目前的購買等級 {shop_item_id: level}；
+    levels 與 target_level 都未提供時升級一級。條件不成立時拋出 PurchaseRejected。
+    """
+    current_level = levels_by_id.get(shop_item.id, 0)
+
+    # 對於寵物夥伴能力，檢查前置條件（需要寵物夥伴）
+    extra_button_item = related.get('extra_button')
+    if shop_item.item_type == 'auto_clicker' and extra_button_item:
+        if not levels_by_id.get(extra_button_item.id):
+            raise PurchaseRejected({'error': '需要先購買「購買寵物夥伴」才能提升寵物夥伴能力'})
+
+    if current_level >= shop_item.max_level:
+        raise PurchaseRejected({'error': '已達到最大等級'})
+
+    if target_level is None:
+        target_level = current_level + (levels or 1)
+    if target_level <= current_level:
+        raise PurchaseRejected({'error': f'目標等級必須大於目前等級 {current_level}'})
+    if target_level > shop_item.max_level:
+        raise PurchaseRejected({'error': f'目標等級不能超過最大等級 {shop_item.max_level}'})
+
+    # 計算價格（current_level 到 target_level 各級價格的總和）
+    return current_level, target_level, cumulative_price(shop_item.base_price, current_level, target_level)
+
+
+def _pet_skill_to_attach(shop_item, related, levels_by_id, current_level):
+    """第一次購買寵物夥伴時需要附加的寵物夥伴能力（已有或不需要時返回 None）"""
+    auto_clicker_item = related.get('auto_clicker')
+    if shop_item.item_type != 'extra_button' or current_level != 0 or not auto_clicker_item:
+        return None
+    if auto_clicker_item.id in levels_by_id:
+        return None
+    return auto_clicker_item
+
+
+def _level_patch(shop_item, target_level, attached_item):
+    patch = {shop_item.id: target_level}
+    if attached_item:
+        patch[attached_item.id] = 1
+    return patch
+
+
+def _attach_pet_skill(user, auto_clicker_item):
+    """自動附加1等級的寵物夥伴能力"""
+    if not auto_clicker_item:
+        return
+    PlayerPurchase.objects.bulk_create([
+        PlayerPurchase(
+            user=user,
+            shop_item_id=auto_clicker_item.id,
+            level=1,
+            price_paid=0  # 免費附加
+        )
+    ], ignore_conflicts=True)
+
+
+def _purchase_levels(user, shop_item, related):
+    ids = [shop_item.id] + [item.id for item in related.values()]
+    return dict(
+        PlayerPurchase.objects.filter(user=user, shop_item_id__in=ids).values_list('shop_item_id', 'level')
+    )
+
+
+def purchase_optimistic(user, shop_item, related, levels=None, target_level=None):
+    """不鎖定玩家資料的購買嘗試
+
+    Returns:
+        PurchaseResult，玩家資料不存在時返回 None（由鎖定路徑建立）
+
+    Raises:
+        PurchaseRejected: 購買條件不成立
+        PurchaseConflict: 等級或金幣已被並發的請求修改（交易已回滾，可以重試）
+    """
+    levels_by_id = _purchase_levels(user, shop_item, related)
+    current_level, target_level, price = plan_purchase(
+        shop_item, related, levels_by_id, levels, target_level
+    )
+    attached_item = _pet_skill_to_attach(shop_item, related, levels_by_id, current_level)
+    try:
+        with transaction.atomic():
+            profile = debit_coins(
+                user, price,
+                purchase_levels=MergePurchaseLevels(_level_patch(shop_item, target_level, attached_item)),
+            )
+            if profile is None:
+                coins = PlayerProfile.objects.filter(user=user).values_list('coins', flat=True).first()
+                if coins is None:
+                    return None
+                if coins >= price:
+                    # 扣款時金幣不足，之後並發的請求已增加金幣：依新的狀態重試
+                    raise PurchaseConflict()
+                raise _insufficient_coins(coins, price)
+
+            if current_level == 0:
+                PlayerPurchase.objects.create(
+                    user=user,
+                    shop_item_id=shop_item.id,
+                    level=target_level,
+                    price_paid=price
+                )
+            else:
+                updated = PlayerPurchase.objects.filter(
+                    user=user, shop_item_id=shop_item.id, level=current_level
+                ).update(level=target_level, price_paid=price)
+                if not updated:
+                    raise PurchaseConflict()
+            _attach_pet_skill(user, attached_item)
+    except IntegrityError:
+        # 並發的請求已建立同一物品的購買記錄
+        raise PurchaseConflict()
+    return PurchaseResult(current_level, target_level, price, profile.coins, profile)
+
+
+def purchase_locked(user, shop_item, related, levels=None, target_level=None):
+    """以 select_for_update 鎖定玩家資料的購買流程（樂觀路徑無法完成時使用）"""
+    with transaction.atomic():
+        # 使用 select_for_update 鎖定資料行，確保資料一致性
+        profile = PlayerProfile.objects.select_for_update().get_or_create(
+            user=user,
+            defaults={
+                'coins': 0,
+                'total_clicks': 0,
+                'best_clicks_per_round': 0,
+                'total_games_played': 0,
+                'battle_wins': 0,
+            }
+        )[0]
+
+        # 一次性查詢所有相關的購買記錄，避免多次查詢
+        levels_by_id = _purchase_levels(user, shop_item, related)
+        current_level, target_level, price = plan_purchase(
+            shop_item, related, levels_by_id, levels, target_level
+        )
+        if profile.coins < price:
+            raise _insufficient_coins(profile.coins, price)
+        attached_item = _pet_skill_to_attach(shop_item, related, levels_by_id, current_level)
+
+        # 扣除金幣並同步購買等級（資料列已鎖定，同時遞增資料版本）
+        profile.coins -= price
+        profile.purchase_levels = {
+            **(profile.purchase_levels or {}),
+            **{str(item_id): level for item_id, level in _level_patch(shop_item, target_level, attached_item).items()},
+        }
+        profile.data_version += 1
+        profile.save(update_fields=['coins', 'purchase_levels', 'data_version'])
+
+        # 更新或創建購買記錄（直接寫入目標等級）
+        # 修改購買等級的請求都持有玩家資料的資料列鎖直到提交，鎖內讀取的等級不會被並發修改
+        if current_level:
+            PlayerPurchase.objects.filter(user=user, shop_item_id=shop_item.id).update(
+                level=target_level, price_paid=price
+            )
+        else:
+            PlayerPurchase.objects.create(
+                user=user,
+                shop_item_id=shop_item.id,
+                level=target_level,
+                price_paid=price
+            )
+        _attach_pet_skill(user, attached_item)
+    return PurchaseResult(current_level, target_level, price, profile.coins, profile)
+
+
+def purchase_item(user, shop_item, related, levels=None, target_level=None):
+    """購買商店物品：先以樂觀並發重試，仍無法完成時退回鎖定路徑"""
+    for _ in range(getattr(settings, 'GAME_PURCHASE_CAS_RETRIES', 3)):
+        try:
+            result = purchase_optimistic(user, shop_item, related, levels, target_level)
+        except PurchaseConflict:
+            continue
+        if result is None:
+            break
+        return result
+    return purchase_locked(user, shop_item, related, levels, target_level)
@@ -0,0 +1,156 @@
+"""
+全服排名（最佳單局點擊數）的樹狀陣列
+
+以 COUNT(*) WHERE best_clicks_per_round > x 計算排名，需要掃描索引中所有分數較高的玩家。
+改為在 ScoreRankNode 資料表中保存一棵樹狀陣列（Fenwick tree），每個節點記錄一段分數區間的玩家人數：
+- 分數 s 對應索引 n + 1 - min(s, n)（n 為 GAME_RANK_MAX_SCORE），分數越高索引越小，
+  「分數高於 s 的人數」即索引 1..(n - s) 的前綴和，以一個主鍵查詢讀取路徑上最多 log2(n) 個節點
+- 玩家的最佳成績改變時，舊分數的路徑減 1、新分數的路徑加 1（兩條路徑共同的節點互相抵銷），
+  以一個 upsert 寫入，與提交遊戲在同一個交易內，排名不會與玩家資料不一致
+- 最佳成績為 0 的玩家不列入（沒有排名）；超過 n 的分數視為 n（同分）
+
+資料表即持久化的樹狀陣列，所有程序共用，不需要在程序間同步；
+部署後或修改 GAME_RANK_MAX_SCORE 後以 rebuild_score_ranks 命令由玩家資料重建。
+節點依索引排序寫入，並發的更新以相同順序鎖定節點，不會互相死鎖；
+低分（常見的分數）對應的索引接近 n，更新路徑很短，只有高分玩家才會更新上層的節點。
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from .models import PlayerProfile, ScoreRankNode
+
+
+def max_score():
+    """樹狀陣列涵蓋的最高分數（n），更高的分數視為同分"""
+    return getattr(settings, 'GAME_RANK_MAX_SCORE', 2 ** 20 - 1)
+
+
+def _index(score, size):
+    return size + 1 - min(score, size)
+
+
+def _update_path(index, size):
+    """單點更新時經過的節點"""
+    while index <= size:
+        yield index
+        index += index & -index
+
+
+def _prefix_path(index):
+    """前綴和（索引 1..index）經過的節點"""
+    while index > 0:
+        yield index
+        index -= index & -index
+
+
+def score_deltas(old_score, new_score):
+    """最佳成績由 old_score 變為 new_score 時各節點的人數變化 {節點: 變化量}（不含抵銷為 0 的節點）"""
+    size = max_score()
+    deltas = Counter()
+    if old_score > 0:
+        for node in _update_path(_index(old_score, size), size):
+            deltas[node] -= 1
+    if new_score > 0:
+        for node in _update_path(_index(new_score, size), size):
+            deltas[node] += 1
+    return {node: delta for node, delta in sorted(deltas.items()) if delta}
+
+
+def _upsert_sql(connection, row_count):
+    """累加用的 INSERT ... ON CONFLICT DO UPDATE 語句"""
+    qn = connection.ops.quote_name
+    table = qn(ScoreRankNode._meta.db_table)
+    node, players = qn('node'), qn('players')
+    placeholders = ', '.join(['(%s, %s)'] * row_count)
+    return (
+        f'INSERT INTO {table} ({node}, {players}) VALUES {placeholders} '
+        f'ON CONFLICT ({node}) DO UPDATE SET {players} = {table}.{players} + EXCLUDED.{players}'
+    )
+
+
+def _increment_fallback(node, delta):
+    queryset = ScoreRankNode.objects.filter(node=node)
+    if queryset.update(players=F('players') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ScoreRankNode.objects.create(node=node, players=delta)
+    except IntegrityError:
+        # 並發的更新已建立同一個節點
+        queryset.update(players=F('players') + delta)
+
+
+def move_best_score(old_score, new_score):
+    """玩家的最佳成績由 old_score 變為 new_score（0 表示不列入排名），在呼叫端的交易內更新節點"""
+    deltas = score_deltas(old_score, new_score)
+    if not deltas:
+        return
+    db = router.db_for_write(ScoreRankNode)
+    connection = connections[db]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        with transaction.atomic(using=db):
+            for node, delta in deltas.items():
+                _increment_fallback(node, delta)
+        return
+
+    params = []
+    for node, delta in deltas.items():
+        params.extend([node, delta])
+    with connection.cursor() as cursor:
+        cursor.execute(_upsert_sql(connection, len(deltas)), params)
+
+
+def players_above(score):
+    """最佳成績高於 score 的玩家人數（一個查詢，讀取最多 log2(n) 個節點）"""
+    size = max_score()
+    nodes = list(_prefix_path(size - min(score, size)))
+    if not nodes:
+        return 0
+    return ScoreRankNode.objects.filter(node__in=nodes).aggregate(total=Sum('players'))['total'] or 0
+
+
+def global_rank(score):
+    """最佳成績為 score 的全服排名（同分名次相同，與排行榜一致），沒有成績時返回 None"""
+    if score <= 0:
+        return None
+    return players_above(score) + 1
+
+
+def rebuild_score_ranks():
+    """由玩家資料重建整個樹狀陣列（一個 GROUP BY 查詢），返回列入排名的玩家人數
+
+    PostgreSQL 上先以 EXCLUSIVE 模式鎖定節點資料表（仍可讀取排名）再彙總玩家資料：
+    已寫入節點的提交先完成、彙總時已包含在內；之後刷新最佳成績的提交（包含要新增節點的）
+    等待重建完成後，才把變化量累加到重建的節點上，不會重複計算或遺漏。
+    其他資料庫只能鎖定既有的節點，無法阻擋並發的提交新增節點，請在停止提交遊戲的維護期間執行。
+    """
+    size = max_score()
+    db = router.db_for_write(ScoreRankNode)
+    connection = connections[db]
+    with transaction.atomic(using=db):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {connection.ops.quote_name(ScoreRankNode._meta.db_table)} IN EXCLUSIVE MODE'
+                )
+        else:
+            list(ScoreRankNode.objects.select_for_update().values_list('node', flat=True))
+        tree = Counter()
+        players = 0
+        counts = (
+            PlayerProfile.objects.filter(best_clicks_per_round__gt=0)
+            .values_list('best_clicks_per_round')
+            .annotate(players=Count('pk'))
+            .order_by()
+        )
+        for score, count in counts:
+            players += count
+            for node in _update_path(_index(score, size), size):
+                tree[node] += count
+        ScoreRankNode.objects.all().delete()
+        ScoreRankNode.objects.bulk_create(
+            [ScoreRankNode(node=node, players=count) for node, count in sorted(tree.items())],
+            batch_size=1000,
+        )
+    return players
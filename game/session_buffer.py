@@ -0,0 +1,263 @@
+"""
+GameSession 延遲寫入緩衝（可選模式，GAME_SESSION_WRITE_BEHIND = True 時啟用）
+
+提交遊戲時玩家資料計數器仍然同步更新，遊戲記錄則先放入程序內緩衝，
+累積到 GAME_SESSION_BUFFER_SIZE 筆或最舊的記錄超過 GAME_SESSION_BUFFER_MAX_AGE 秒後
+一次寫入（PostgreSQL 使用 COPY，其他資料庫使用 bulk_create），減少尖峰時段
+每次提交的 INSERT 與索引維護成本。
+
+- 每筆記錄先附加到本地日誌檔（fsync）再放入緩衝，寫入資料庫後截斷日誌
+- 程序結束時（atexit）寫入剩餘記錄；程序崩潰時日誌保留在 GAME_SESSION_JOURNAL_DIR，
+  下一個啟動的程序會回收（以 user_id + played_at 去除已寫入的記錄）
+- 最近歷史記錄由資料庫查詢結果加上本程序緩衝中的記錄合併而成
+  （其他程序緩衝中的記錄在寫入前不可見）
+"""
+import atexit
+import csv
+import glob
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+from .models import GameSession
+
+try:
+    import fcntl
+except ImportError:  # Windows：不支援 flock，不回收其他程序遺留的日誌
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('user_id', 'clicks', 'game_duration', 'coins_earned', 'played_at')
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    """是否啟用遊戲記錄延遲寫入模式"""
+    return getattr(settings, 'GAME_SESSION_WRITE_BEHIND', False)
+
+
+def _row_from_session(session):
+    return {field: getattr(session, field) for field in FIELDS}
+
+
+def _encode_row(row):
+    return json.dumps({**row, 'played_at': row['played_at'].isoformat()}) + '\n'
+
+
+def _decode_row(line):
+    row = json.loads(line)
+    row['played_at'] = parse_datetime(row['played_at'])
+    return row
+
+
+def _copy_rows(rows):
+    """PostgreSQL（psycopg2）：以 COPY 寫入，返回 False 表示不支援"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        raw_cursor = getattr(cursor, 'cursor', None)
+        if not hasattr(raw_cursor, 'copy_expert'):
+            return False
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for row in rows:
+            writer.writerow([row[field] if field != 'played_at' else row[field].isoformat() for field in FIELDS])
+        data.seek(0)
+        columns = ', '.join(connection.ops.quote_name(GameSession._meta.get_field(field).column) for field in FIELDS)
+        raw_cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(GameSession._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            data,
+        )
+    return True
+
+
+def write_rows(rows):
+    """將遊戲記錄一次寫入資料庫"""
+    if not _copy_rows(rows):
+        GameSession.objects.bulk_create([GameSession(**row) for row in rows], batch_size=1000)
+
+
+class GameSessionBuffer:
+    """程序內的遊戲記錄緩衝與本地日誌"""
+
+    def __init__(self, journal_dir, max_size=200, max_age=2.0):
+        self.journal_dir = journal_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self.journal_path = os.path.join(journal_dir, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.journal')
+        self._journal = open(self.journal_path, 'a+', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def add(self, sessions):
+        """加入未儲存的 GameSession 物件（先寫入日誌，再放入緩衝）"""
+        rows = [_row_from_session(session) for session in sessions]
+        with self._lock:
+            self._journal.write(''.join(_encode_row(row) for row in rows))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            should_flush = (
+                len(self._rows) >= self.max_size
+                or time.monotonic() - self._oldest >= self.max_age
+            )
+            if not should_flush and self._timer is None:
+                self._timer = threading.Timer(self.max_age, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if should_flush:
+            self.flush()
+
+    def pending_for_user(self, user_id):
+        """本程序緩衝中該用戶尚未寫入的記錄"""
+        with self._lock:
+            return [dict(row) for row in self._rows if row['user_id'] == user_id]
+
+    def flush(self):
+        """寫入緩衝中的所有記錄，返回寫入筆數（失敗時記錄保留在緩衝與日誌中）"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return 0
+            try:
+                write_rows(rows)
+            except Exception:
+                logger.exception('寫入緩衝的遊戲記錄失敗，保留至下次寫入')
+                with self._lock:
+                    self._rows = rows + self._rows
+                    self._oldest = time.monotonic()
+                return 0
+            with self._lock:
+                # 日誌只保留寫入期間新加入的記錄
+                self._journal.seek(0)
+                self._journal.truncate()
+                self._journal.write(''.join(_encode_row(row) for row in self._rows))
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            return len(rows)
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # 計時器執行緒使用獨立的資料庫連線，用完即關閉
+            connection.close()
+
+    def recover_orphans(self):
+        """回收其他已結束程序遺留的日誌，返回寫入筆數"""
+        if fcntl is None:
+            return 0
+        recovered = 0
+        for path in glob.glob(os.path.join(self.journal_dir, '*.journal')):
+            if path == self.journal_path:
+                continue
+            try:
+                with open(path, 'r+', encoding='utf-8') as journal:
+                    try:
+                        fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # 仍在運行的程序持有此日誌
+                    rows = [_decode_row(line) for line in journal if line.strip()]
+                    rows = _exclude_written(rows)
+                    if rows:
+                        write_rows(rows)
+                        recovered += len(rows)
+                    # 持有鎖時刪除，避免其他程序重複回收
+                    os.remove(path)
+            except (OSError, ValueError):
+                logger.exception('回收遊戲記錄日誌失敗: %s', path)
+        return recovered
+
+    def close(self):
+        """寫入剩餘記錄並關閉日誌（寫入失敗時保留日誌供下次回收）"""
+        if self._journal.closed:
+            return
+        self.flush()
+        with self._lock:
+            remaining = bool(self._rows)
+            self._journal.close()
+        if not remaining:
+            os.remove(self.journal_path)
+
+
+def _exclude_written(rows):
+    """排除已寫入資料庫的記錄（程序在寫入後、截斷日誌前崩潰）"""
+    if not rows:
+        return rows
+    played_at = [row['played_at'] for row in rows]
+    written = set(
+        GameSession.objects.filter(
+            user_id__in={row['user_id'] for row in rows},
+            played_at__gte=min(played_at),
+            played_at__lte=max(played_at),
+        ).values_list('user_id', 'played_at')
+    )
+    return [row for row in rows if (row['user_id'], row['played_at']) not in written]
+
+
+def get_session_buffer():
+    """獲取本程序的遊戲記錄緩衝（第一次使用時建立並回收遺留日誌）"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = GameSessionBuffer(
+                    journal_dir=settings.GAME_SESSION_JOURNAL_DIR,
+                    max_size=getattr(settings, 'GAME_SESSION_BUFFER_SIZE', 200),
+                    max_age=getattr(settings, 'GAME_SESSION_BUFFER_MAX_AGE', 2.0),
+                )
+                buffer.recover_orphans()
+                atexit.register(buffer.close)
+                _buffer = buffer
+    return _buffer
+
+
+def buffer_sessions(sessions):
+    """將提交的遊戲記錄放入本程序的緩衝（計數器已提交後呼叫，不拋出例外）
+
+    日誌寫入失敗（例如磁碟已滿）時改為直接寫入資料庫（排除已寫入的記錄）；
+    計數器已經提交，請求失敗會讓用戶端重送同一局而重複累加金幣與點擊，因此只記錄錯誤。
+    """
+    try:
+        get_session_buffer().add(sessions)
+        return
+    except OSError:
+        logger.exception('寫入遊戲記錄日誌失敗，改為直接寫入資料庫')
+    try:
+        rows = _exclude_written([_row_from_session(session) for session in sessions])
+        if rows:
+            write_rows(rows)
+    except Exception:
+        logger.exception('直接寫入遊戲記錄失敗，遺失 %d 筆遊戲記錄', len(sessions))
+
+
+def pending_sessions_for_user(user_id):
+    """本程序緩衝中該用戶尚未寫入的記錄（未啟用延遲寫入時為空列表）"""
+    if not write_behind_enabled() or _buffer is None:
+        return []
+    return _buffer.pending_for_user(user_id)
@@ -0,0 +1,42 @@
+"""
+用戶 Session 索引相關操作
+
+django_session 表只存放編碼後的 session 資料，無法直接依用戶查詢。
+這裡透過 UserSession 索引記錄 session_key 與用戶的對應關係，
+讓單一會話策略不需要掃描並解碼所有 session。
+"""
+from django.contrib.sessions.models import Session
+from .models import UserSession
+
+
+def record_user_session(user, session_key):
+    """記錄 session_key 屬於指定用戶（登入時呼叫，單一 INSERT ... ON CONFLICT DO UPDATE 語句）"""
+    if not session_key:
+        return
+    UserSession.objects.bulk_create(
+        [UserSession(user=user, session_key=session_key)],
+        update_conflicts=True,
+        unique_fields=['session_key'],
+        update_fields=['user'],
+    )
+
+
+def forget_session(session_key):
+    """移除 session_key 的索引記錄（登出時呼叫）"""
+    if not session_key:
+        return
+    UserSession.objects.filter(session_key=session_key).delete()
+
+
+def evict_user_sessions(user):
+    """清除指定用戶的所有 session
+
+    只執行兩條語句：以索引子查詢批量刪除 django_session，再刪除對應的索引記錄。
+
+    Returns:
+        int: 被刪除的 session 數量
+    """
+    indexed_keys = UserSession.objects.filter(user=user).values('session_key')
+    deleted_count, _ = Session.objects.filter(session_key__in=indexed_keys).delete()
+    UserSession.objects.filter(user=user).delete()
+    return deleted_count
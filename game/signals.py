@@ -0,0 +1,101 @@
+"""
+遊戲應用程式的信號處理（在 GameConfig.ready() 中註冊）
+"""
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from .achievements import add_unlocked, invalidate_achievement_index, invalidate_unlock_state, sync_achievement_bits
+from .catalog import invalidate_catalog
+from .history_cache import invalidate_history
+from .leaderboard import invalidate_leaderboards
+from .models import Achievement, PlayerAchievement, PlayerProfile, ShopItem
+from .partitions import ensure_upcoming_partitions
+from .ranks import move_best_score
+from .sessions import record_user_session, forget_session
+
+
+@receiver(connection_created, dispatch_uid='game_sqlite_functions')
+def on_connection_created(sender, connection, **kwargs):
+    """SQLite 連線註冊 AddUnlockedBit 使用的函式（PostgreSQL 以內建的位元組函式計算）"""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('game_add_unlocked', 2, add_unlocked, deterministic=True)
+
+
+@receiver(user_logged_in, dispatch_uid='game_record_user_session')
+def on_user_logged_in(sender, request, user, **kwargs):
+    """登入後記錄新的 session_key，維護用戶 Session 索引"""
+    session = getattr(request, 'session', None)
+    if session is not None:
+        record_user_session(user, session.session_key)
+
+
+@receiver(user_logged_out, dispatch_uid='game_forget_user_session')
+def on_user_logged_out(sender, request, user, **kwargs):
+    """登出前移除目前 session_key 的索引記錄"""
+    session = getattr(request, 'session', None)
+    if session is not None:
+        forget_session(session.session_key)
+
+
+@receiver(post_save, sender=Achievement, dispatch_uid='game_achievement_saved')
+@receiver(post_delete, sender=Achievement, dispatch_uid='game_achievement_deleted')
+def on_achievement_changed(sender, **kwargs):
+    """成就目錄變更後，目錄快取與成就門檻索引失效"""
+    invalidate_achievement_index()
+
+
+@receiver(post_save, sender=ShopItem, dispatch_uid='game_shop_item_saved')
+@receiver(post_delete, sender=ShopItem, dispatch_uid='game_shop_item_deleted')
+def on_shop_item_changed(sender, **kwargs):
+    """商店物品變更後，目錄快取失效（其他程序依版本戳記重新載入）"""
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=PlayerAchievement, dispatch_uid='game_player_achievement_saved')
+@receiver(post_delete, sender=PlayerAchievement, dispatch_uid='game_player_achievement_deleted')
+def on_player_achievement_changed(sender, instance, **kwargs):
+    """玩家解鎖記錄變更後，重新計算該玩家的已解鎖成就位元組並移除已解鎖狀態快取
+
+    提交遊戲的解鎖以 bulk_create 寫入（不發送信號），位元組已在同一個交易內更新。
+    """
+    sync_achievement_bits(instance.user_id)
+    invalidate_unlock_state(instance.user_id)
+
+
+@receiver(post_save, sender=PlayerProfile, dispatch_uid='game_player_profile_created')
+def on_player_profile_created(sender, instance, created, **kwargs):
+    """建立時已有最佳成績的玩家資料（例如 create_super_account）列入全服排名
+
+    提交遊戲以 UPDATE 修改最佳成績（不發送信號），排名在同一個交易內更新。
+    """
+    if created:
+        move_best_score(0, instance.best_clicks_per_round)
+
+
+@receiver(post_delete, sender=PlayerProfile, dispatch_uid='game_player_profile_deleted')
+def on_player_profile_deleted(sender, instance, **kwargs):
+    """刪除玩家資料（包含刪除用戶的連鎖刪除）後從全服排名移除"""
+    move_best_score(instance.best_clicks_per_round, 0)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='game_user_deleted')
+def on_user_deleted(sender, instance, **kwargs):
+    """刪除用戶（連同遊戲記錄）後移除該用戶的記錄快取，排行榜重建（已刪除的用戶不再列出）"""
+    invalidate_history(instance.id)
+    invalidate_leaderboards()
+
+
+@receiver(post_migrate, dispatch_uid='game_achievement_index_post_migrate')
+def on_post_migrate(sender, **kwargs):
+    """migrate / flush 直接修改資料表（不發送模型信號），清除目錄與成就快取"""
+    invalidate_achievement_index()
+
+
+@receiver(post_migrate, dispatch_uid='game_session_partitions_post_migrate')
+def on_game_migrated(sender, using, **kwargs):
+    """每次部署 migrate 後建立當月與未來月份的遊戲記錄分區（不依賴歸檔命令）"""
+    if sender.name == 'game' and using == DEFAULT_DB_ALIAS:
+        ensure_upcoming_partitions()
@@ -4,21 +4,49 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.sessions.models import Session
 from django.db import transaction
 from django.db import connection
+from django.db.models import F
 from django.db.utils import OperationalError, DatabaseError
 from django.utils import timezone
 import json
 import traceback
 import logging
 from .models import (
-    PlayerProfile, GameSession, ShopItem, 
-    PlayerPurchase, Achievement, PlayerAchievement
+    PlayerProfile, GameSession,
+    PlayerPurchase
+)
+from .sessions import evict_user_sessions
+from .players import get_or_create_player
+from .counters import apply_game_result
+from .daily_stats import record_daily_stats
+from .catalog import get_catalog
+from .etags import make_etag, not_modified, with_etag
+from .pricing import cumulative_price, level_price
+from .purchases import (
+    PurchaseRejected, profile_levels, purchase_item, related_items, set_purchase_levels, sync_purchase_levels
+)
+from .achievements import (
+    decode_unlocked, get_achievement_index, get_unlock_state, is_unlocked,
+    progress_percent, store_unlock_state, unlock_achievements,
+)
+from .achievement_rules import PURCHASE_INPUTS, RULES, SUBMIT_INPUTS, RuleContext, profile_values
+from .idempotency import idempotent, mark_committed
+from .leaderboard import BOARDS, get_leaderboard, refresh_leaderboards
+from .ranks import global_rank, move_best_score
+from .partitions import latest_sessions
+from .history_cache import get_cached_history, history_cache_size, history_row, push_history, store_history
+from .session_buffer import buffer_sessions, pending_sessions_for_user, write_behind_enabled
+from .auth_tokens import (
+    stateless_auth_enabled, issue_token, revoke_tokens,
+    set_token_cookie, delete_token_cookie,
 )
 
 logger = logging.getLogger(__name__)
 
+# 批量提交遊戲結果時，單次請求最多包含的局數
+MAX_BATCH_ROUNDS = 50
+
 
 def home(request):
     return render(request, 'game/home.html')
@@ -49,12 +77,23 @@ def handle_database_error(e):
         return str(e)
 
 
+def loaded_profile(user):
+    """認證後端（game.backends.PlayerModelBackend）已以 JOIN 載入的玩家資料，未載入或不存在時返回 None"""
+    if User.player_profile.is_cached(user):
+        return getattr(user, 'player_profile', None)
+    return None
+
+
 def get_or_create_profile(user):
     """獲取或創建玩家資料
     
     如果玩家資料不存在，則創建新的玩家資料，所有數值預設為0
     如果玩家資料已存在，則返回現有資料，不會修改任何數值
+    認證後端已以 JOIN 載入玩家資料時不再查詢
     """
+    profile = loaded_profile(user)
+    if profile is not None:
+        return profile
     profile, created = PlayerProfile.objects.get_or_create(
         user=user,
         defaults={
@@ -83,58 +122,38 @@ def api_login_or_register(request):
         if not username:
             return JsonResponse({'error': '用戶名不能為空'}, status=400)
         
-        # 嘗試獲取用戶，如果不存在則創建
-        user, created = User.objects.get_or_create(username=username)
-        if created:
-            # 新用戶：設置不可用密碼（在創建時設置，避免額外的 save）
-            user.set_unusable_password()
-            user.save(update_fields=['password'])  # 只更新 password 欄位
-        else:
-            # 已存在的用戶：如果密碼為空，設置為不可用
-            # 這樣可以確保超級帳號等無密碼用戶能正常登錄
-            if not user.password:
-                user.set_unusable_password()
-                user.save(update_fields=['password'])  # 只更新 password 欄位
-            
+        stateless = stateless_auth_enabled()
+        
+        # 獲取或創建用戶與玩家資料（快速路徑：已存在的玩家一次查詢，新玩家在同一交易內以最少語句建立）
+        user, profile, created = get_or_create_player(username)
+        if not created:
             # 單一會話策略：清除該用戶的其他活躍 session（只對已存在的用戶執行）
             # 這樣可以確保同一帳號只能在一處登入，避免多裝置同時操作造成的資料衝突
-            try:
-                # 獲取所有活躍的 session（未過期的）
-                active_sessions = Session.objects.filter(
-                    expire_date__gte=timezone.now()
-                )
-                
-                # 遍歷所有 session，找出屬於該用戶的 session 並刪除
-                deleted_count = 0
-                for session in active_sessions:
-                    try:
-                        session_data = session.get_decoded()
-                        # 檢查 session 中是否包含該用戶的 ID
-                        if session_data.get('_auth_user_id') == str(user.id):
-                            session.delete()
-                            deleted_count += 1
-                    except Exception as e:
-                        # 如果 session 資料解碼失敗，跳過該 session
-                        # 這可能是因為 session 資料格式不正確或已損壞
-                        logger.debug(f"無法解碼 session {session.session_key}: {e}")
-                        continue
-                
-                if deleted_count > 0:
-                    logger.info(f"用戶 {username} 登入時已清除 {deleted_count} 個其他活躍會話")
-            except Exception as e:
-                # 如果清除 session 失敗，記錄警告但繼續登入流程
-                # 這不會影響用戶登入，只是可能無法清除舊會話
-                logger.warning(
-                    f"清除用戶 {username} 的其他會話時發生錯誤: {e}",
-                    exc_info=True
-                )
+            # 無狀態模式不使用 session，改為在下方遞增撤銷計數使舊憑證失效
+            if not stateless:
+                # 透過用戶 Session 索引查詢，不需要掃描並解碼所有 session
+                try:
+                    deleted_count = evict_user_sessions(user)
+                    if deleted_count > 0:
+                        logger.info(f"用戶 {username} 登入時已清除 {deleted_count} 個其他活躍會話")
+                except Exception as e:
+                    # 如果清除 session 失敗，記錄警告但繼續登入流程
+                    # 這不會影響用戶登入，只是可能無法清除舊會話
+                    logger.warning(
+                        f"清除用戶 {username} 的其他會話時發生錯誤: {e}",
+                        exc_info=True
+                    )
         
         # 登錄用戶（使用 backend 參數確保可以登錄無密碼用戶）
         # 對於無密碼用戶，必須明確指定 backend
         # 如果資料庫連接失敗或 session 保存失敗，login() 可能會拋出異常，需要捕獲
         session_saved = True
         try:
-            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+            if stateless:
+                # 無狀態模式：不建立 session，憑證在取得玩家資料後簽發
+                request.user = user
+            else:
+                login(request, user, backend='game.backends.PlayerModelBackend')
         except (OperationalError, DatabaseError) as e:
             # 資料庫連接失敗，記錄警告但繼續處理
             # session 保存會在 middleware 中處理，這裡只記錄警告
@@ -160,9 +179,7 @@ def api_login_or_register(request):
                 # 其他未預期的錯誤，重新拋出
                 raise
         
-        # 獲取或創建玩家資料
-        profile = get_or_create_profile(user)
-        
+        # 直接使用上方查詢/建立時返回的資料列構建回應
         response_data = {
             'success': True,
             'user': {
@@ -180,11 +197,21 @@ def api_login_or_register(request):
             }
         }
         
+        # 無狀態模式：已存在的用戶遞增撤銷計數（單一會話策略），再簽發新憑證
+        token = None
+        if stateless:
+            epoch = profile.auth_epoch if created else revoke_tokens(user)
+            token = issue_token(user, epoch)
+            response_data['token'] = token
+        
         # 如果 session 未保存，添加警告訊息
         if not session_saved:
             response_data['warning'] = '登入成功，但 session 保存失敗，請稍後再試'
         
-        return JsonResponse(response_data)
+        response = JsonResponse(response_data)
+        if token:
+            set_token_cookie(response, token)
+        return response
     except Exception as e:
         error_message = handle_database_error(e)
         return JsonResponse({'error': error_message}, status=500)
@@ -195,6 +222,11 @@ def api_login_or_register(request):
 def api_logout(request):
     """登出用戶"""
     try:
+        # 無狀態模式：遞增撤銷計數，使目前的憑證（包含以 Bearer 方式保存的副本）失效
+        stateless = stateless_auth_enabled()
+        if stateless and request.user.is_authenticated:
+            revoke_tokens(request.user)
+        
         # 如果資料庫連接失敗，logout() 可能會拋出異常，需要捕獲
         try:
             logout(request)
@@ -221,12 +253,84 @@ def api_logout(request):
                 # 其他未預期的錯誤，重新拋出
                 raise
         
-        return JsonResponse({'success': True})
+        response = JsonResponse({'success': True})
+        if stateless:
+            delete_token_cookie(response)
+        return response
     except Exception as e:
         error_message = handle_database_error(e)
         return JsonResponse({'error': error_message}, status=500)
 
 
+def _profile_payload(user, profile, catalog, rank=None):
+    """玩家資料、購買等級、已解鎖成就與徽章（只使用玩家資料的一列與目錄快取，不查詢資料庫）
+    
+    rank 為呼叫端以 game.ranks.global_rank 查詢的全服排名（同時用於 ETag）
+    """
+    # 購買等級從玩家資料的反正規化副本讀取，不查詢購買記錄
+    player_items = {}
+    for shop_item_id, level in profile_levels(profile.purchase_levels).items():
+        shop_item = catalog.shop_item(shop_item_id)
+        if shop_item is None:
+            continue
+        player_items[shop_item.item_type] = {
+            'level': level,
+            'effect_value': shop_item.effect_value * level
+        }
+    
+    # 已解鎖的成就從玩家資料的位元組讀取，不查詢解鎖記錄
+    # （解鎖時即發放獎勵，有獎勵金幣的成就都已領取）
+    unlocked_achievements = []
+    unlocked_achievement_ids = set()
+    for achievement_id in sorted(decode_unlocked(profile.achievement_bits)):
+        achievement = catalog.achievement(achievement_id)
+        if achievement is None:
+            continue
+        unlocked_achievement_ids.add(achievement_id)
+        unlocked_achievements.append({
+            'id': achievement.id,
+            'name': achievement.name,
+            'icon': achievement.icon,
+            'reward_claimed': achievement.reward_coins > 0,
+        })
+    
+    # 獲取用戶選擇的徽章信息（只顯示已解鎖的成就）
+    badge_ids = [profile.badge_1_id, profile.badge_2_id, profile.badge_3_id]
+    badge_achievements = {}
+    for ach_id in badge_ids:
+        if ach_id is not None and ach_id in unlocked_achievement_ids:
+            ach = catalog.achievement(ach_id)
+            badge_achievements[ach_id] = {
+                'id': ach.id,
+                'icon': ach.icon,
+                'name': ach.name,
+            }
+    
+    # 構建徽章列表
+    badges = []
+    for badge_id in badge_ids:
+        if badge_id and badge_id in badge_achievements:
+            badges.append(badge_achievements[badge_id])
+        else:
+            badges.append(None)
+    
+    return {
+        'profile': {
+            'username': user.username,
+            'created_at': profile.created_at.isoformat(),
+            'battle_wins': profile.battle_wins,
+            'coins': profile.coins,
+            'total_clicks': profile.total_clicks,
+            'best_clicks_per_round': profile.best_clicks_per_round,
+            'total_games_played': profile.total_games_played,
+            'global_rank': rank,
+        },
+        'purchases': player_items,
+        'achievements': unlocked_achievements,
+        'badges': badges,
+    }
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def api_get_profile(request):
@@ -237,77 +341,15 @@ def api_get_profile(request):
         
         profile = get_or_create_profile(request.user)
         
-        # 優化：一次性查詢所有需要的資料，減少資料庫查詢次數
-        # 獲取玩家購買記錄（使用 select_related 優化，避免 N+1 查詢）
-        purchases = PlayerPurchase.objects.filter(user=request.user).select_related('shop_item')
-        player_items = {}
-        for purchase in purchases:
-            player_items[purchase.shop_item.item_type] = {
-                'level': purchase.level,
-                'effect_value': purchase.shop_item.effect_value * purchase.level
-            }
-        
-        # 獲取已解鎖的成就（已使用 select_related 優化）
-        achievements = PlayerAchievement.objects.filter(user=request.user).select_related('achievement')
-        unlocked_achievements = [
-            {
-                'id': ach.achievement.id,
-                'name': ach.achievement.name,
-                'icon': ach.achievement.icon,
-                'reward_claimed': ach.reward_claimed,
-            }
-            for ach in achievements
-        ]
-        
-        # 獲取用戶選擇的徽章信息（優化：合併查詢，減少資料庫往返）
-        badge_ids = [profile.badge_1_id, profile.badge_2_id, profile.badge_3_id]
-        valid_badge_ids = [bid for bid in badge_ids if bid is not None]
-        
-        # 一次性查詢所有需要的成就和解鎖狀態
-        badge_achievements = {}
-        if valid_badge_ids:
-            # 使用 values 只查詢需要的欄位，減少資料傳輸
-            achievements_dict = {
-                ach['id']: ach for ach in Achievement.objects.filter(id__in=valid_badge_ids)
-                .values('id', 'icon', 'name')
-            }
-            # 一次性查詢所有已解鎖的成就ID
-            unlocked_achievement_ids = set(
-                PlayerAchievement.objects.filter(user=request.user, achievement_id__in=valid_badge_ids)
-                .values_list('achievement_id', flat=True)
-            )
-            
-            for ach_id in valid_badge_ids:
-                if ach_id in achievements_dict and ach_id in unlocked_achievement_ids:
-                    ach = achievements_dict[ach_id]
-                    badge_achievements[ach_id] = {
-                        'id': ach['id'],
-                        'icon': ach['icon'],
-                        'name': ach['name'],
-                    }
-        
-        # 構建徽章列表
-        badges = []
-        for badge_id in badge_ids:
-            if badge_id and badge_id in badge_achievements:
-                badges.append(badge_achievements[badge_id])
-            else:
-                badges.append(None)
-        
-        return JsonResponse({
-            'profile': {
-                'username': request.user.username,
-                'created_at': profile.created_at.isoformat(),
-                'battle_wins': profile.battle_wins,
-                'coins': profile.coins,
-                'total_clicks': profile.total_clicks,
-                'best_clicks_per_round': profile.best_clicks_per_round,
-                'total_games_played': profile.total_games_played,
-            },
-            'purchases': player_items,
-            'achievements': unlocked_achievements,
-            'badges': badges,
-        })
+        # 商店物品與成就從目錄快取讀取，購買等級與已解鎖成就從玩家資料讀取
+        catalog = get_catalog()
+        # 全服排名隨其他玩家的成績改變，與資料版本一起作為 ETag；資料未變更時返回 304
+        rank = global_rank(profile.best_clicks_per_round)
+        etag = make_etag('profile', request.user.id, profile.data_version, catalog.digest, rank)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        return with_etag(JsonResponse(_profile_payload(request.user, profile, catalog, rank)), etag)
     except (OperationalError, DatabaseError) as e:
         # 資料庫連接失敗，返回友好的錯誤訊息
         logger.error(
@@ -326,8 +368,53 @@ def api_get_profile(request):
         return JsonResponse({'error': error_message}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_bootstrap(request):
+    """首次載入頁面所需的全部資料（取代 profile、shop、achievements、history 四個請求）
+    
+    玩家資料由認證後端以 JOIN 載入（或查詢一次），購買等級與已解鎖成就從玩家資料讀取，
+    商店物品與成就使用目錄快取，最近的遊戲記錄在記錄快取有效時不查詢資料庫。
+    """
+    try:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': '未登錄'}, status=401)
+        
+        profile = get_or_create_profile(request.user)
+        catalog = get_catalog()
+        # 資料未變更時返回 304（遊戲記錄隨提交遞增資料版本，全服排名隨其他玩家的成績改變）
+        rank = global_rank(profile.best_clicks_per_round)
+        etag = make_etag('bootstrap', request.user.id, profile.data_version, catalog.digest, rank)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        payload = _profile_payload(request.user, profile, catalog, rank)
+        payload['shop_items'] = _shop_items(catalog, profile_levels(profile.purchase_levels))
+        payload['achievement_list'] = _achievement_list(catalog, profile.achievement_bits)
+        payload['history'] = _recent_history(request.user, games_played=profile.total_games_played)
+        return with_etag(JsonResponse(payload), etag)
+    except (OperationalError, DatabaseError) as e:
+        # 資料庫連接失敗，返回友好的錯誤訊息
+        logger.error(
+            f"載入首頁資料時資料庫連接失敗: {e}",
+            exc_info=True
+        )
+        error_message = handle_database_error(e)
+        return JsonResponse({'error': error_message}, status=500)
+    except Exception as e:
+        # 其他未預期的錯誤
+        logger.error(
+            f"載入首頁資料時發生錯誤: {e}",
+            exc_info=True
+        )
+        error_message = handle_database_error(e)
+        return JsonResponse({'error': error_message}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent('submit_game')
 def api_submit_game(request):
     """提交遊戲結果（優化版：快速儲存）"""
     if not request.user.is_authenticated:
@@ -339,238 +426,380 @@ def api_submit_game(request):
         except json.JSONDecodeError:
             return JsonResponse({'error': '無效的 JSON 格式'}, status=400)
         
-        # 驗證 clicks 參數
-        clicks_str = data.get('clicks')
-        if clicks_str is None:
-            return JsonResponse({'error': '缺少點擊數參數'}, status=400)
-        try:
-            clicks = int(clicks_str)
-            if clicks < 0:
-                return JsonResponse({'error': '點擊數不能為負數'}, status=400)
-        except (ValueError, TypeError):
-            return JsonResponse({'error': '無效的點擊數格式'}, status=400)
-        
-        # 驗證 game_duration 參數
-        game_duration_str = data.get('game_duration')
-        if game_duration_str is None:
-            game_duration = 10.0  # 預設值
-        else:
-            try:
-                game_duration = float(game_duration_str)
-                if game_duration <= 0:
-                    return JsonResponse({'error': '遊戲時長必須大於0'}, status=400)
-            except (ValueError, TypeError):
-                return JsonResponse({'error': '無效的遊戲時長格式'}, status=400)
-        
-        with transaction.atomic():
-            # 優化：先嘗試獲取，避免不必要的鎖定和 get_or_create 的額外查詢
-            try:
-                profile = PlayerProfile.objects.select_for_update().get(user=request.user)
-            except PlayerProfile.DoesNotExist:
-                # 如果不存在，創建新的 profile
-                profile = PlayerProfile.objects.create(
-                    user=request.user,
-                    coins=0,
-                    total_clicks=0,
-                    best_clicks_per_round=0,
-                    total_games_played=0,
-                    battle_wins=0,
-                )
-            
-            # 計算金幣
-            # 基礎時間（10秒）內：每次點擊1金幣
-            # 延長時間（由商店物品升級增加的秒數）內：每次點擊2金幣（基礎時間的兩倍）
-            base_time = 10.0
-            if game_duration <= base_time:
-                # 基礎時間內的點擊，每次1金幣
-                coins_earned = clicks
-            else:
-                # 有延長時間，需要區分基礎時間和延長時間的點擊
-                # 假設點擊均勻分佈，計算基礎時間和延長時間的點擊數
-                # 延長時間內的點擊獲得2倍金幣（相對於基礎時間的1金幣）
-                base_clicks = int(clicks * (base_time / game_duration))
-                extra_clicks = clicks - base_clicks
-                coins_earned = base_clicks + (extra_clicks * 2)
-            
-            # 更新玩家資料（先更新數值，稍後一次性儲存）
-            profile.coins += coins_earned
-            profile.total_clicks += clicks
-            profile.total_games_played += 1
-            update_fields = ['coins', 'total_clicks', 'total_games_played']
-            if clicks > profile.best_clicks_per_round:
-                profile.best_clicks_per_round = clicks
-                update_fields.append('best_clicks_per_round')
-            
-            # 檢查成就（優化版：合併成就獎勵到 profile 更新中）
-            new_achievements, total_reward_coins = check_achievements_optimized(
-                request.user, profile, clicks
-            )
-            
-            # 如果有成就獎勵，加到金幣中（coins 已在 update_fields 中）
-            if total_reward_coins > 0:
-                profile.coins += total_reward_coins
-            
-            # 一次性儲存所有更新（使用 update_fields 只更新需要的欄位）
-            profile.save(update_fields=update_fields)
-            
-            # 創建遊戲記錄（在 transaction 內，確保資料一致性）
-            session = GameSession.objects.create(
-                user=request.user,
-                clicks=clicks,
-                game_duration=game_duration,
-                coins_earned=coins_earned
-            )
+        clicks, game_duration, error_message = parse_game_round(data)
+        if error_message:
+            return JsonResponse({'error': error_message}, status=400)
+        coins_earned = calculate_coins_earned(clicks, game_duration)
         
-        # 優化：在 transaction 外查詢歷史記錄，減少鎖定時間
-        # 只查詢最新的 10 筆記錄（與前端 loadHistory 的 limit 一致）
-        recent_sessions = GameSession.objects.filter(
-            user=request.user
-        ).order_by('-played_at')[:10].values(
-            'clicks', 'game_duration', 'coins_earned', 'played_at'
+        profile, new_achievements = record_game_result(
+            request.user, clicks, game_duration, coins_earned
         )
-        recent_history = [
-            {
-                'clicks': s['clicks'],
-                'game_duration': s['game_duration'],
-                'coins_earned': s['coins_earned'],
-                'played_at': s['played_at'].isoformat(),
-            }
-            for s in recent_sessions
-        ]
+        mark_committed(request)
         
         return JsonResponse({
             'success': True,
             'coins_earned': coins_earned,
             'new_achievements': new_achievements,
-            'profile': {
-                'username': request.user.username,
-                'created_at': profile.created_at.isoformat(),
-                'battle_wins': profile.battle_wins,
-                'coins': profile.coins,
-                'total_clicks': profile.total_clicks,
-                'best_clicks_per_round': profile.best_clicks_per_round,
-                'total_games_played': profile.total_games_played,
-            },
-            'history': recent_history,  # 包含最新歷史記錄
+            'profile': _game_profile_payload(request.user, profile),
+            'history': _history_after_commit(request.user, profile.total_games_played),  # 包含最新歷史記錄
         })
     except Exception as e:
         error_message = handle_database_error(e)
         return JsonResponse({'error': error_message}, status=500)
 
 
-def check_achievements_optimized(user, profile, current_clicks):
-    """檢查並解鎖成就（優化版：批量處理，減少資料庫寫入）"""
-    new_achievements = []
-    total_reward_coins = 0
-    player_achievements_to_create = []
+@csrf_exempt
+@require_http_methods(["POST"])
+@idempotent('submit_games')
+def api_submit_games(request):
+    """批量提交遊戲結果（離線佇列中累積的多局）
     
-    # 優化：一次性查詢所有成就和已解鎖的成就ID
-    all_achievements = Achievement.objects.all()
-    unlocked_achievement_ids = set(
-        PlayerAchievement.objects.filter(user=user)
-        .values_list('achievement_id', flat=True)
-    )
+    請求格式：{"rounds": [{"client_id": "...", "clicks": 50, "game_duration": 10.0}, ...]}
+    所有有效的局在同一個交易內寫入：一次 bulk_create 遊戲記錄、一次玩家資料更新，
+    之後進行一次成就判斷。返回每一局的處理結果（applied / rejected）。
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': '未登錄'}, status=401)
     
-    for achievement in all_achievements:
-        # 檢查是否已解鎖（使用集合查找，O(1) 時間複雜度）
-        if achievement.id in unlocked_achievement_ids:
-            continue
+    try:
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': '無效的 JSON 格式'}, status=400)
         
-        # 檢查是否達到目標
-        unlocked = False
-        if achievement.achievement_type == 'total_clicks':
-            if profile.total_clicks >= achievement.target_value:
-                unlocked = True
-        elif achievement.achievement_type == 'single_round':
-            if current_clicks >= achievement.target_value:
-                unlocked = True
-        elif achievement.achievement_type == 'total_games':
-            if profile.total_games_played >= achievement.target_value:
-                unlocked = True
+        rounds_data = data.get('rounds') if isinstance(data, dict) else None
+        if not isinstance(rounds_data, list) or not rounds_data:
+            return JsonResponse({'error': '缺少遊戲結果列表'}, status=400)
+        if len(rounds_data) > MAX_BATCH_ROUNDS:
+            return JsonResponse({'error': f'單次最多提交 {MAX_BATCH_ROUNDS} 局'}, status=400)
         
-        if unlocked:
-            # 累積獎勵金幣
-            if achievement.reward_coins > 0:
-                total_reward_coins += achievement.reward_coins
+        results = []
+        rounds = []
+        seen_client_ids = set()
+        for round_data in rounds_data:
+            if not isinstance(round_data, dict):
+                return JsonResponse({'error': '無效的遊戲結果格式'}, status=400)
+            client_id = round_data.get('client_id')
+            if not isinstance(client_id, str) or not client_id or len(client_id) > 64:
+                return JsonResponse({'error': '無效的 client_id'}, status=400)
+            if client_id in seen_client_ids:
+                return JsonResponse({'error': f'重複的 client_id: {client_id}'}, status=400)
+            seen_client_ids.add(client_id)
             
-            # 準備批量創建成就記錄
-            player_achievements_to_create.append(
-                PlayerAchievement(
-                    user=user,
-                    achievement=achievement,
-                    reward_claimed=(achievement.reward_coins > 0)
-                )
-            )
-            
-            new_achievements.append({
-                'id': achievement.id,
-                'name': achievement.name,
-                'description': achievement.description,
-                'icon': achievement.icon,
-                'reward_coins': achievement.reward_coins,
-            })
+            clicks, game_duration, error_message = parse_game_round(round_data)
+            if error_message:
+                results.append({'client_id': client_id, 'status': 'rejected', 'error': error_message})
+                continue
+            coins_earned = calculate_coins_earned(clicks, game_duration)
+            rounds.append((clicks, game_duration, coins_earned))
+            results.append({'client_id': client_id, 'status': 'applied', 'coins_earned': coins_earned})
+        
+        if not rounds:
+            return JsonResponse({'error': '沒有有效的遊戲結果', 'results': results}, status=400)
+        
+        profile, new_achievements = record_game_results(request.user, rounds)
+        mark_committed(request)
+        
+        return JsonResponse({
+            'success': True,
+            'results': results,
+            'coins_earned': sum(coins_earned for _, _, coins_earned in rounds),
+            'new_achievements': new_achievements,
+            'profile': _game_profile_payload(request.user, profile),
+            'history': _history_after_commit(request.user, profile.total_games_played),
+        })
+    except Exception as e:
+        error_message = handle_database_error(e)
+        return JsonResponse({'error': error_message}, status=500)
+
+
+def parse_game_round(data):
+    """驗證單局遊戲結果的參數
     
-    # 優化：批量創建成就記錄，減少資料庫寫入次數
-    if player_achievements_to_create:
-        PlayerAchievement.objects.bulk_create(player_achievements_to_create)
+    Returns:
+        tuple: (clicks, game_duration, error_message)，驗證失敗時 error_message 不為 None
+    """
+    # 驗證 clicks 參數
+    clicks_str = data.get('clicks')
+    if clicks_str is None:
+        return None, None, '缺少點擊數參數'
+    try:
+        clicks = int(clicks_str)
+        if clicks < 0:
+            return None, None, '點擊數不能為負數'
+    except (ValueError, TypeError):
+        return None, None, '無效的點擊數格式'
     
-    return new_achievements, total_reward_coins
+    # 驗證 game_duration 參數
+    game_duration_str = data.get('game_duration')
+    if game_duration_str is None:
+        game_duration = 10.0  # 預設值
+    else:
+        try:
+            game_duration = float(game_duration_str)
+            if game_duration <= 0:
+                return None, None, '遊戲時長必須大於0'
+        except (ValueError, TypeError):
+            return None, None, '無效的遊戲時長格式'
+    
+    return clicks, game_duration, None
 
 
-def check_achievements(user, profile, current_clicks):
-    """檢查並解鎖成就（舊版，保留以向後兼容）"""
-    new_achievements = []
+def calculate_coins_earned(clicks, game_duration):
+    """計算一局獲得的金幣
+    
+    基礎時間（10秒）內：每次點擊1金幣
+    延長時間（由商店物品升級增加的秒數）內：每次點擊2金幣（基礎時間的兩倍）
+    """
+    base_time = 10.0
+    if game_duration <= base_time:
+        # 基礎時間內的點擊，每次1金幣
+        return clicks
+    # 有延長時間，需要區分基礎時間和延長時間的點擊
+    # 假設點擊均勻分佈，計算基礎時間和延長時間的點擊數
+    # 延長時間內的點擊獲得2倍金幣（相對於基礎時間的1金幣）
+    base_clicks = int(clicks * (base_time / game_duration))
+    extra_clicks = clicks - base_clicks
+    return base_clicks + (extra_clicks * 2)
+
+
+def _game_profile_payload(user, profile):
+    """提交遊戲後返回的玩家資料"""
+    return {
+        'username': user.username,
+        'created_at': profile.created_at.isoformat(),
+        'battle_wins': profile.battle_wins,
+        'coins': profile.coins,
+        'total_clicks': profile.total_clicks,
+        'best_clicks_per_round': profile.best_clicks_per_round,
+        'total_games_played': profile.total_games_played,
+    }
+
+
+def _history_after_commit(user, games_played):
+    """遊戲結果提交後返回的最新記錄，讀取失敗時返回 None（前端保留目前顯示的記錄）"""
+    try:
+        return _recent_history(user, games_played=games_played)
+    except Exception:
+        logger.exception('遊戲結果已提交，讀取最新遊戲記錄失敗（用戶 %s）', user.id)
+        return None
+
+
+def _recent_history(user, limit=10, games_played=None):
+    """最新的遊戲記錄（預設 10 筆，與前端 loadHistory 的 limit 一致），在交易外查詢
+    
+    limit 在快取長度以內時由玩家的記錄快取返回，不查詢資料庫；
+    快取未命中時查詢資料庫並重建快取。延遲寫入模式下合併本程序緩衝中尚未寫入資料庫的記錄。
     
-    # 獲取所有成就
-    all_achievements = Achievement.objects.all()
+    Args:
+        games_played: 目前的遊戲局數（提交遊戲後已知，省略時在重建快取前查詢）
+    """
+    history = get_cached_history(user.id, limit, games_played)
+    if history is not None:
+        return history
     
-    # 優化：一次性查詢所有已解鎖的成就ID，避免 N+1 查詢
-    unlocked_achievement_ids = set(
-        PlayerAchievement.objects.filter(user=user)
-        .values_list('achievement_id', flat=True)
+    if games_played is None:
+        # 先讀取局數再讀取記錄：期間有新的提交時，下次提交會偵測到局數不連續並重建
+        games_played = PlayerProfile.objects.filter(user=user).values_list(
+            'total_games_played', flat=True
+        ).first() or 0
+    fetch = max(limit, history_cache_size())
+    # 依 (user, -played_at) 索引讀取；分區表上先只讀取當月分區
+    recent_sessions = latest_sessions(
+        user, fetch, ('clicks', 'game_duration', 'coins_earned', 'played_at')
     )
+    complete = len(recent_sessions) < fetch
+    pending = pending_sessions_for_user(user.id)
+    if pending:
+        recent_sessions = sorted(
+            recent_sessions + pending, key=lambda s: s['played_at'], reverse=True
+        )[:fetch]
+    history = [history_row(s) for s in recent_sessions]
+    store_history(user.id, history, games_played, complete)
+    return history[:limit]
+
+
+def _locked_best_score(user, best_clicks):
+    """本次提交可能刷新最佳成績時，鎖定玩家資料並讀取原本的最佳成績，不可能刷新時返回 None
     
-    for achievement in all_achievements:
-        # 檢查是否已解鎖（使用集合查找，O(1) 時間複雜度）
-        if achievement.id in unlocked_achievement_ids:
-            continue
+    最佳成績只會增加：不超過請求開始時載入的最佳成績時不可能改變，不需要額外的查詢。
+    鎖定到交易提交為止（接著的計數器 UPDATE 同樣會鎖定這一列），
+    並發的提交不會以相同的原本成績重複更新排名。
+    """
+    profile = loaded_profile(user)
+    if best_clicks <= 0 or (profile is not None and best_clicks <= profile.best_clicks_per_round):
+        return None
+    return PlayerProfile.objects.select_for_update().filter(user=user).values_list(
+        'best_clicks_per_round', flat=True
+    ).first() or 0
+
+
+def _apply_ranked_game_result(user, totals):
+    """累加遊戲結果，最佳成績改變時在同一個交易內更新全服排名的樹狀陣列（見 game.ranks）"""
+    old_best = _locked_best_score(user, totals['best_clicks'])
+    profile = apply_game_result(user, **totals)
+    if old_best is not None and profile.best_clicks_per_round != old_best:
+        move_best_score(old_best, profile.best_clicks_per_round)
+    return profile
+
+
+def record_game_results(user, rounds):
+    """儲存多局遊戲結果並發放成就獎勵（只在可能刷新最佳成績時使用 select_for_update）
+    
+    遊戲記錄（一次 bulk_create）、每日統計（一個 upsert）與計數器更新（一個 UPDATE）在同一個交易內，
+    計數器的 UPDATE 放在最後，資料列鎖只持有到提交為止（最佳成績改變時接著更新全服排名的節點）；
+    成就判斷在交易外依 UPDATE 返回的數值進行一次。
+    
+    Args:
+        rounds: [(clicks, game_duration, coins_earned), ...]，依遊戲順序排列
+    
+    Returns:
+        tuple: (更新後的 PlayerProfile, 新解鎖的成就列表)
+    """
+    best_clicks = max(clicks for clicks, _, _ in rounds)
+    sessions = [
+        GameSession(
+            user=user,
+            clicks=clicks,
+            game_duration=game_duration,
+            coins_earned=coins_earned
+        )
+        for clicks, game_duration, coins_earned in rounds
+    ]
+    totals = {
+        'clicks': sum(clicks for clicks, _, _ in rounds),
+        'coins_earned': sum(coins_earned for _, _, coins_earned in rounds),
+        'games_played': len(rounds),
+        'best_clicks': best_clicks,
+    }
+    if write_behind_enabled():
+        # 延遲寫入模式：只更新統計與計數器，遊戲記錄放入緩衝稍後批量寫入
+        # （計數器已提交，日誌寫入失敗時不能返回錯誤，見 buffer_sessions）
+        with transaction.atomic():
+            record_daily_stats(sessions)
+            profile = _apply_ranked_game_result(user, totals)
+        buffer_sessions(sessions)
+        push_history(user.id, sessions, profile.total_games_played)
+    else:
+        with transaction.atomic():
+            GameSession.objects.bulk_create(sessions)
+            record_daily_stats(sessions)
+            profile = _apply_ranked_game_result(user, totals)
+            # 交易提交後才更新記錄快取，回滾時快取不變
+            push_history(user.id, sessions, profile.total_games_played)
+    
+    # 遊戲結果已提交：之後的步驟失敗只記錄日誌，返回已提交的結果（用戶端重試會重複套用）
+    new_achievements, profile = _achievements_after_commit(user, profile, SUBMIT_INPUTS)
+    try:
+        # 分數達到排行榜門檻時，交易提交後重建排行榜快取
+        refresh_leaderboards(profile)
+    except Exception:
+        logger.exception('遊戲結果已提交，更新排行榜快取失敗')
+    
+    return profile, new_achievements
+
+
+def _achievements_after_commit(user, profile, inputs):
+    """變更提交後的成就判斷（成就記錄、已解鎖成就位元組與獎勵在同一個交易內，避免解鎖後獎勵未發放）
+    
+    判斷失敗時交易回滾，記錄日誌並返回 ([], profile)，不讓已提交的請求返回錯誤；
+    未解鎖的成就可由 backfill_achievements 命令補發。
+    """
+    try:
+        with transaction.atomic():
+            return check_achievements_optimized(user, profile, inputs)
+    except Exception:
+        logger.exception('變更已提交，成就判斷失敗（用戶 %s）', user.id)
+        return [], profile
+
+
+def record_game_result(user, clicks, game_duration, coins_earned):
+    """儲存一局遊戲結果並發放成就獎勵，返回 (更新後的 PlayerProfile, 新解鎖的成就列表)"""
+    return record_game_results(user, [(clicks, game_duration, coins_earned)])
+
+
+def check_achievements_optimized(user, profile, inputs=SUBMIT_INPUTS):
+    """檢查並解鎖成就（優化版：以編譯後的門檻索引只檢查新跨越的門檻）
+    
+    inputs 為本次事件變更的輸入（見 game.achievement_rules），只計算規則依賴這些輸入、
+    且尚有未解鎖門檻的類型；目錄中沒有相關類型時直接返回，不讀取玩家的解鎖狀態。
+    索引與玩家的已解鎖狀態都快取在程序內（狀態未快取時由 profile 的已解鎖成就位元組重建），
+    一般的提交不需要查詢 Achievement 與 PlayerAchievement。
+    成就判斷不在資料列鎖內，並發的提交可能同時跨越同一成就：
+    位元組以比較並交換寫入，只有成功寫入的請求建立解鎖記錄並發放獎勵。
+    
+    Returns:
+        tuple: (新解鎖的成就列表, 更新後的 PlayerProfile)
+    """
+    new_achievements = []
+    
+    index = get_achievement_index()
+    types = index.types_for(inputs)
+    if not types:
+        return new_achievements, profile
+    state = get_unlock_state(user.id, index, profile.achievement_bits)
+    context = RuleContext(user.id, profile, index)
+    crossed_ids, reached = state.crossed({
+        achievement_type: RULES[achievement_type].value(context)
+        for achievement_type in state.pending(types)
+    })
+    
+    if crossed_ids:
+        new_ids, profile = unlock_achievements(user, profile, crossed_ids, index)
+        new_achievements = [dict(index.by_id[achievement_id]) for achievement_id in new_ids]
+    
+    if reached:
+        state.advance(reached, crossed_ids)
+        store_unlock_state(user.id, state)
+    
+    return new_achievements, profile
+
+
+def _shop_items(catalog, levels):
+    """商店物品列表與玩家的購買狀態（levels 為 {shop_item_id: level}，未登入時為空）"""
+    shop_data = []
+    # 檢查是否有寵物夥伴
+    extra_button_level = 0
+    extra_button_item = catalog.shop_item_of_type('extra_button')
+    if extra_button_item:
+        extra_button_level = levels.get(extra_button_item.id, 0)
+    
+    for item in catalog.shop_items:
+        # 從字典中獲取玩家當前等級（避免單獨查詢）
+        current_level = levels.get(item.id, 0)
         
-        # 檢查是否達到目標
-        unlocked = False
-        if achievement.achievement_type == 'total_clicks':
-            if profile.total_clicks >= achievement.target_value:
-                unlocked = True
-        elif achievement.achievement_type == 'single_round':
-            if current_clicks >= achievement.target_value:
-                unlocked = True
-        elif achievement.achievement_type == 'total_games':
-            if profile.total_games_played >= achievement.target_value:
-                unlocked = True
+        # 計算下一級價格（價格遞增：基礎價格 * (等級 + 1)）與直接升到最高等級的總價
+        next_level_price = level_price(item.base_price, current_level) if current_level < item.max_level else None
+        max_out_price = cumulative_price(item.base_price, current_level, item.max_level) if next_level_price is not None else None
         
-        if unlocked:
-            # 解鎖成就
-            player_achievement = PlayerAchievement.objects.create(
-                user=user,
-                achievement=achievement,
-                reward_claimed=False
-            )
-            
-            # 自動領取獎勵
-            if achievement.reward_coins > 0:
-                profile.coins += achievement.reward_coins
-                profile.save()
-                player_achievement.reward_claimed = True
-                player_achievement.save()
-            
-            new_achievements.append({
-                'id': achievement.id,
-                'name': achievement.name,
-                'description': achievement.description,
-                'icon': achievement.icon,
-                'reward_coins': achievement.reward_coins,
-            })
-    
-    return new_achievements
+        # 對於寵物夥伴能力，檢查前置條件（需要寵物夥伴）
+        requires_extra_button = item.item_type == 'auto_clicker'
+        can_upgrade = current_level < item.max_level and next_level_price is not None
+        
+        # 如果沒有寵物夥伴且沒有提升能力，寵物夥伴能力不能升級
+        # 如果已經有提升能力（current_level > 0），則可以升級
+        if requires_extra_button and extra_button_level == 0 and current_level == 0:
+            can_upgrade = False
+        
+        # 判斷是否為未購買狀態（等級為0且未達到最大等級）
+        is_unpurchased = current_level == 0 and current_level < item.max_level
+        
+        shop_data.append({
+            'id': item.id,
+            'name': item.name,
+            'type': item.item_type,
+            'description': item.description,
+            'base_price': item.base_price,
+            'effect_value': item.effect_value,
+            'max_level': item.max_level,
+            'current_level': current_level,
+            'next_level_price': next_level_price,
+            'max_out_price': max_out_price,
+            'can_upgrade': can_upgrade,
+            'requires_extra_button': requires_extra_button and extra_button_level == 0 and current_level == 0,
+            'is_unpurchased': is_unpurchased,
+        })
+    return shop_data
 
 
 @csrf_exempt
@@ -578,59 +807,29 @@ def check_achievements(user, profile, current_clicks):
 def api_get_shop(request):
     """獲取商店物品列表"""
     try:
-        items = ShopItem.objects.all()
-        shop_data = []
+        # 商店物品從目錄快取讀取，購買等級與資料版本從玩家資料的同一列讀取（一個查詢）
+        catalog = get_catalog()
         
-        # 優化：一次性查詢所有購買記錄，避免 N+1 查詢
-        purchases_dict = {}
-        extra_button_level = 0
+        levels = {}
         if request.user.is_authenticated:
-            # 一次性查詢該用戶的所有購買記錄
-            purchases = PlayerPurchase.objects.filter(user=request.user).select_related('shop_item')
-            purchases_dict = {purchase.shop_item_id: purchase for purchase in purchases}
-            
-            # 檢查是否有寵物夥伴
-            extra_button_item = ShopItem.objects.filter(item_type='extra_button').first()
-            if extra_button_item and extra_button_item.id in purchases_dict:
-                extra_button_level = purchases_dict[extra_button_item.id].level
-        
-        for item in items:
-            # 從字典中獲取玩家當前等級（避免單獨查詢）
-            current_level = 0
-            if request.user.is_authenticated and item.id in purchases_dict:
-                current_level = purchases_dict[item.id].level
-            
-            # 計算下一級價格（價格遞增：基礎價格 * (等級 + 1)）
-            next_level_price = item.base_price * (current_level + 1) if current_level < item.max_level else None
-            
-            # 對於寵物夥伴能力，檢查前置條件（需要寵物夥伴）
-            requires_extra_button = item.item_type == 'auto_clicker'
-            can_upgrade = current_level < item.max_level and next_level_price is not None
-            
-            # 如果沒有寵物夥伴且沒有提升能力，寵物夥伴能力不能升級
-            # 如果已經有提升能力（current_level > 0），則可以升級
-            if requires_extra_button and extra_button_level == 0 and current_level == 0:
-                can_upgrade = False
-            
-            # 判斷是否為未購買狀態（等級為0且未達到最大等級）
-            is_unpurchased = current_level == 0 and current_level < item.max_level
-            
-            shop_data.append({
-                'id': item.id,
-                'name': item.name,
-                'type': item.item_type,
-                'description': item.description,
-                'base_price': item.base_price,
-                'effect_value': item.effect_value,
-                'max_level': item.max_level,
-                'current_level': current_level,
-                'next_level_price': next_level_price,
-                'can_upgrade': can_upgrade,
-                'requires_extra_button': requires_extra_button and extra_button_level == 0 and current_level == 0,
-                'is_unpurchased': is_unpurchased,
-            })
+            profile = loaded_profile(request.user)
+            if profile is not None:
+                data_version, purchase_levels = profile.data_version, profile.purchase_levels
+            else:
+                data_version, purchase_levels = PlayerProfile.objects.filter(user=request.user).values_list(
+                    'data_version', 'purchase_levels'
+                ).first() or (None, None)
+            levels = profile_levels(purchase_levels)
+            etag = make_etag('shop', request.user.id, data_version, catalog.digest)
+        else:
+            etag = make_etag('shop', catalog.digest)
+        # 資料未變更時返回 304
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
         
-        return JsonResponse({'items': shop_data})
+        shop_data = _shop_items(catalog, levels)
+        return with_etag(JsonResponse({'items': shop_data}), etag)
     except (OperationalError, DatabaseError) as e:
         # 資料庫連接失敗，返回友好的錯誤訊息
         logger.error(
@@ -649,10 +848,38 @@ def api_get_shop(request):
         return JsonResponse({'error': error_message}, status=500)
 
 
+def parse_purchase_levels(data):
+    """驗證多級購買的參數：levels（升級幾級）或 target_level（升級到第幾級），兩者都未提供時升級一級
+    
+    Returns:
+        tuple: (levels, target_level, error_message)，未提供的參數為 None，驗證失敗時 error_message 不為 None
+    """
+    values = {}
+    for key in ('levels', 'target_level'):
+        value = data.get(key)
+        if value is None:
+            values[key] = None
+            continue
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value.strip())
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            return None, None, f'無效的 {key}：必須為正整數'
+        values[key] = value
+    
+    if values['levels'] is not None and values['target_level'] is not None:
+        return None, None, 'levels 與 target_level 只能提供其中一個'
+    return values['levels'], values['target_level'], None
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent('purchase')
 def api_purchase_item(request):
-    """購買商店物品（優化版：減少資料庫查詢）"""
+    """購買商店物品（優化版：減少資料庫查詢，不鎖定玩家資料）
+    
+    可以一次升級多級（levels 或 target_level）：總價以等差數列公式計算，
+    在同一個交易內只驗證一次金幣並直接寫入目標等級（見 game.purchases）。
+    """
     if not request.user.is_authenticated:
         return JsonResponse({'error': '未登錄'}, status=401)
     
@@ -689,125 +916,52 @@ def api_purchase_item(request):
         except (ValueError, TypeError) as e:
             return JsonResponse({'error': f'無效的物品ID格式：{str(e)}'}, status=400)
         
-        # 優化：在 transaction 外查詢 ShopItem（靜態資料，不需要鎖定）
-        shop_item = ShopItem.objects.get(id=item_id)
+        levels, target_level, error_message = parse_purchase_levels(data)
+        if error_message:
+            return JsonResponse({'error': error_message}, status=400)
         
-        # 優化：預先查詢相關物品（靜態資料，不需要鎖定）
-        related_items = {}
-        shop_item_ids_to_query = [item_id]
+        # 商店物品是靜態資料，從目錄快取讀取（不查詢、不需要鎖定）
+        catalog = get_catalog()
+        shop_item = catalog.shop_item(item_id)
+        if shop_item is None:
+            return JsonResponse({'error': '物品不存在'}, status=404)
         
-        # 只在需要時查詢相關物品
-        if shop_item.item_type == 'auto_clicker':
-            # 提升寵物夥伴能力時，需要檢查寵物夥伴
-            extra_button_item = ShopItem.objects.filter(item_type='extra_button').first()
-            if extra_button_item:
-                related_items['extra_button'] = extra_button_item
-                shop_item_ids_to_query.append(extra_button_item.id)
-        elif shop_item.item_type == 'extra_button':
-            # 購買寵物夥伴時，可能需要創建寵物夥伴能力
-            auto_clicker_item = ShopItem.objects.filter(item_type='auto_clicker').first()
-            if auto_clicker_item:
-                related_items['auto_clicker'] = auto_clicker_item
-                shop_item_ids_to_query.append(auto_clicker_item.id)
+        # 樂觀並發：條件式扣款 + 等級比較並交換，衝突時重試，仍無法完成才鎖定玩家資料
+        try:
+            result = purchase_item(
+                request.user, shop_item, related_items(catalog, shop_item), levels, target_level
+            )
+        except PurchaseRejected as e:
+            return JsonResponse(e.payload, status=400)
+        # 購買已提交：之後的步驟失敗也返回購買結果，重試不會再購買一級
+        mark_committed(request)
         
-        with transaction.atomic():
-            # 使用 select_for_update 鎖定資料行，確保資料一致性
-            profile = PlayerProfile.objects.select_for_update().get_or_create(
-                user=request.user,
-                defaults={
-                    'coins': 0,
-                    'total_clicks': 0,
-                    'best_clicks_per_round': 0,
-                    'total_games_played': 0,
-                    'battle_wins': 0,
-                }
-            )[0]
-            
-            # 優化：一次性查詢所有相關的購買記錄，避免多次查詢
-            purchase_queryset = PlayerPurchase.objects.filter(
-                user=request.user,
-                shop_item_id__in=shop_item_ids_to_query
-            ).select_related('shop_item')
-            purchases_dict = {purchase.shop_item_id: purchase for purchase in purchase_queryset}
-            
-            # 獲取當前購買記錄
-            purchase = purchases_dict.get(item_id)
-            current_level = purchase.level if purchase else 0
-            
-            # 對於寵物夥伴能力，檢查前置條件（需要寵物夥伴）
-            if shop_item.item_type == 'auto_clicker':
-                extra_button_item = related_items.get('extra_button')
-                if extra_button_item:
-                    extra_button_purchase = purchases_dict.get(extra_button_item.id)
-                    if not extra_button_purchase or extra_button_purchase.level == 0:
-                        return JsonResponse({'error': '需要先購買「購買寵物夥伴」才能提升寵物夥伴能力'}, status=400)
-            
-            if current_level >= shop_item.max_level:
-                return JsonResponse({'error': '已達到最大等級'}, status=400)
-            
-            # 計算價格
-            price = shop_item.base_price * (current_level + 1)
-            
-            if profile.coins < price:
-                return JsonResponse({
-                    'error': '金幣不足',
-                    'current_coins': profile.coins,
-                    'required_coins': price,
-                    'shortage': price - profile.coins
-                }, status=400)
-            
-            # 扣除金幣
-            profile.coins -= price
-            profile.save(update_fields=['coins'])
-            
-            # 更新或創建購買記錄
-            if purchase:
-                purchase.level += 1
-                purchase.price_paid = price
-                purchase.save(update_fields=['level', 'price_paid'])
-            else:
-                purchase = PlayerPurchase.objects.create(
-                    user=request.user,
-                    shop_item=shop_item,
-                    level=1,
-                    price_paid=price
-                )
-            
-            # 如果購買的是寵物夥伴，自動附加1等級的寵物夥伴能力
-            if shop_item.item_type == 'extra_button' and purchase.level == 1:
-                auto_clicker_item = related_items.get('auto_clicker')
-                if auto_clicker_item:
-                    auto_clicker_purchase = purchases_dict.get(auto_clicker_item.id)
-                    
-                    # 如果沒有寵物夥伴能力，創建1等級的寵物夥伴能力
-                    if not auto_clicker_purchase:
-                        PlayerPurchase.objects.create(
-                            user=request.user,
-                            shop_item=auto_clicker_item,
-                            level=1,
-                            price_paid=0  # 免費附加
-                        )
+        # 只檢查依賴金幣或購買等級的成就（目錄中沒有這些類型時不執行任何查詢）
+        new_achievements, profile = _achievements_after_commit(request.user, result.profile, PURCHASE_INPUTS)
         
         # 計算下一級價格（用於前端更新，避免重新載入商店）
-        next_level = purchase.level + 1
         next_level_price = None
-        can_upgrade = next_level <= shop_item.max_level
+        max_out_price = None
+        can_upgrade = result.new_level < shop_item.max_level
         if can_upgrade:
-            next_level_price = shop_item.base_price * next_level
+            next_level_price = level_price(shop_item.base_price, result.new_level)
+            max_out_price = cumulative_price(shop_item.base_price, result.new_level, shop_item.max_level)
         
         return JsonResponse({
             'success': True,
-            'new_level': purchase.level,
+            'new_level': result.new_level,
+            'levels_purchased': result.new_level - result.old_level,
+            'total_price': result.price,
             'coins_remaining': profile.coins,
             'item_name': shop_item.name,
             'next_level_price': next_level_price,
+            'max_out_price': max_out_price,
             'can_upgrade': can_upgrade,
             'max_level': shop_item.max_level,
+            'new_achievements': new_achievements,
         })
-    except ShopItem.DoesNotExist:
-        return JsonResponse({'error': '物品不存在'}, status=404)
     except Exception as e:
-        # 處理資料庫鎖定超時錯誤（可能是並發購買導致）
+        # 處理資料庫鎖定超時錯誤（樂觀路徑重試用盡、退回鎖定路徑時仍可能發生）
         error_str = str(e).lower()
         if 'lock' in error_str or 'timeout' in error_str or 'deadlock' in error_str:
             return JsonResponse({
@@ -818,22 +972,15 @@ def api_purchase_item(request):
         return JsonResponse({'error': error_message}, status=500)
 
 
-@csrf_exempt
-@require_http_methods(["GET"])
-def api_get_achievements(request):
-    """獲取所有成就列表"""
-    if not request.user.is_authenticated:
-        return JsonResponse({'error': '未登錄'}, status=401)
-    
-    all_achievements = Achievement.objects.all()
-    unlocked_ids = set(
-        PlayerAchievement.objects.filter(user=request.user)
-        .values_list('achievement_id', flat=True)
-    )
-    
+def _achievement_list(catalog, bits, values=None):
+    """所有成就與玩家的解鎖狀態（bits 為玩家資料的已解鎖成就位元組）
+
+    values 為各成就類型的目前數值（見 achievement_rules.profile_values）時，
+    在同一次遍歷中加上 current_value 與 progress（完成百分比；不支援或依賴事件資料的類型為 None）
+    """
     achievements_data = []
-    for achievement in all_achievements:
-        achievements_data.append({
+    for achievement in catalog.achievements:
+        entry = {
             'id': achievement.id,
             'name': achievement.name,
             'description': achievement.description,
@@ -841,10 +988,81 @@ def api_get_achievements(request):
             'target_value': achievement.target_value,
             'reward_coins': achievement.reward_coins,
             'icon': achievement.icon,
-            'unlocked': achievement.id in unlocked_ids,
-        })
+            'unlocked': is_unlocked(bits, achievement.id),
+        }
+        if values is not None:
+            current_value = values.get(achievement.achievement_type)
+            entry['current_value'] = current_value
+            if entry['unlocked']:
+                entry['progress'] = 100.0
+            elif current_value is None:
+                entry['progress'] = None
+            else:
+                entry['progress'] = progress_percent(current_value, achievement.target_value)
+        achievements_data.append(entry)
+    return achievements_data
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_get_achievements(request, progress=False):
+    """獲取所有成就列表
+    
+    progress=True（/api/achievements/progress/）時每個成就另外返回目前數值與完成百分比，
+    由玩家資料的一列計算，查詢數與成就數量無關
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': '未登錄'}, status=401)
     
-    return JsonResponse({'achievements': achievements_data})
+    catalog = get_catalog()
+    # 資料版本、已解鎖成就位元組與進度數值從玩家資料的同一列讀取（認證後端未載入時一個查詢），資料未變更時返回 304
+    values = None
+    profile = loaded_profile(request.user)
+    if profile is None and progress:
+        profile = PlayerProfile.objects.filter(user=request.user).first()
+    if profile is not None:
+        data_version, bits = profile.data_version, profile.achievement_bits
+        if progress:
+            values = profile_values(profile)
+    elif progress:
+        data_version, bits = None, None
+        # 尚未建立玩家資料時以欄位預設值（0）計算
+        values = profile_values(PlayerProfile())
+    else:
+        data_version, bits = PlayerProfile.objects.filter(user=request.user).values_list(
+            'data_version', 'achievement_bits'
+        ).first() or (None, None)
+    etag = make_etag('achievement-progress' if progress else 'achievements', request.user.id, data_version, catalog.digest)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    
+    return with_etag(JsonResponse({'achievements': _achievement_list(catalog, bits, values)}), etag)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def api_get_leaderboard(request):
+    """獲取全服排行榜（?board=best_round 最佳單局 / total_clicks 累計點擊，不需要登入）
+    
+    所有觀看者共用快取的前 N 名（見 game.leaderboard），快取命中時不查詢資料庫；
+    ETag 為快取的版本，排行榜重建前返回 304
+    """
+    board = request.GET.get('board', 'best_round')
+    if board not in BOARDS:
+        return JsonResponse({'error': '無效的排行榜類型'}, status=400)
+    
+    leaderboard = get_leaderboard(board)
+    etag = make_etag('leaderboard', board, leaderboard['version'])
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    
+    entries = [
+        {'rank': entry['rank'], 'username': entry['username'], 'score': entry['score']}
+        for entry in leaderboard['entries']
+    ]
+    return with_etag(JsonResponse({'board': board, 'entries': entries}), etag)
 
 
 @csrf_exempt
@@ -864,20 +1082,26 @@ def api_get_game_history(request):
             return JsonResponse({'error': 'limit 不能超過100'}, status=400)
     except (ValueError, TypeError):
         return JsonResponse({'error': '無效的 limit 格式'}, status=400)
-    # 使用 order_by 確保使用索引（模型 Meta 中已定義 ordering，但明確指定更安全）
-    sessions = GameSession.objects.filter(user=request.user).order_by('-played_at')[:limit]
-    
-    history = [
-        {
-            'clicks': s.clicks,
-            'game_duration': s.game_duration,
-            'coins_earned': s.coins_earned,
-            'played_at': s.played_at.isoformat(),
-        }
-        for s in sessions
-    ]
     
-    return JsonResponse({'history': history})
+    # 一次取得資料版本與遊戲局數（認證後端已載入玩家資料時不查詢）：資料未變更時返回 304；
+    # 局數同時用於驗證記錄快取（提交剛完成、快取尚未更新時不會返回舊的記錄）
+    profile = loaded_profile(request.user)
+    if profile is not None:
+        versions = (profile.data_version, profile.total_games_played)
+    else:
+        versions = PlayerProfile.objects.filter(user=request.user).values_list(
+            'data_version', 'total_games_played'
+        ).first()
+    etag = None
+    games_played = None
+    if versions is not None:
+        data_version, games_played = versions
+        etag = make_etag('history', request.user.id, data_version, limit)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+    history = _recent_history(request.user, limit, games_played)
+    return with_etag(JsonResponse({'history': history}), etag)
 
 
 @csrf_exempt
@@ -916,32 +1140,29 @@ def api_update_badges(request):
         
         profile = get_or_create_profile(request.user)
         
-        # 驗證徽章ID是否有效且用戶已解鎖
-        unlocked_achievement_ids = set(
-            PlayerAchievement.objects.filter(user=request.user)
-            .values_list('achievement_id', flat=True)
-        )
-        
+        # 驗證徽章ID是否有效且用戶已解鎖（從玩家資料的已解鎖成就位元組判斷）
+        catalog = get_catalog()
         badges_to_check = [badge_1_id, badge_2_id, badge_3_id]
         for badge_id in badges_to_check:
             if badge_id is not None:
-                if badge_id not in unlocked_achievement_ids:
+                if not is_unlocked(profile.achievement_bits, badge_id):
                     return JsonResponse({'error': f'成就ID {badge_id} 尚未解鎖'}, status=400)
-                if not Achievement.objects.filter(id=badge_id).exists():
+                if catalog.achievement(badge_id) is None:
                     return JsonResponse({'error': f'成就ID {badge_id} 不存在'}, status=400)
         
-        # 更新徽章
+        # 更新徽章（只寫入徽章欄位，不覆蓋並發更新的金幣與計數器）
         profile.badge_1_id = badge_1_id
         profile.badge_2_id = badge_2_id
         profile.badge_3_id = badge_3_id
-        profile.save()
+        profile.data_version = F('data_version') + 1
+        profile.save(update_fields=['badge_1_id', 'badge_2_id', 'badge_3_id', 'data_version', 'updated_at'])
         
         # 返回更新後的徽章信息
         badge_ids = [profile.badge_1_id, profile.badge_2_id, profile.badge_3_id]
         badges = []
         for badge_id in badge_ids:
             if badge_id:
-                achievement = Achievement.objects.get(id=badge_id)
+                achievement = catalog.achievement(badge_id)
                 badges.append({
                     'id': achievement.id,
                     'icon': achievement.icon,
@@ -996,7 +1217,9 @@ def api_rollback_shop_level(request):
         except (ValueError, TypeError):
             return JsonResponse({'error': '無效的目標等級格式'}, status=400)
         
-        shop_item = ShopItem.objects.get(id=item_id)
+        shop_item = get_catalog().shop_item(item_id)
+        if shop_item is None:
+            return JsonResponse({'error': '物品不存在'}, status=404)
         profile = get_or_create_profile(request.user)
         
         # 驗證目標等級範圍
@@ -1004,7 +1227,7 @@ def api_rollback_shop_level(request):
             return JsonResponse({'error': f'目標等級必須在 0 到 {shop_item.max_level} 之間'}, status=400)
         
         # 獲取當前購買記錄
-        purchase = PlayerPurchase.objects.filter(user=request.user, shop_item=shop_item).first()
+        purchase = PlayerPurchase.objects.filter(user=request.user, shop_item_id=shop_item.id).first()
         current_level = purchase.level if purchase else 0
         
         if target_level == current_level:
@@ -1017,25 +1240,22 @@ def api_rollback_shop_level(request):
                     purchase.delete()
             else:
                 # 更新購買記錄的等級
+                # 計算到目標等級的總價格（用於記錄）
+                total_price = cumulative_price(shop_item.base_price, 0, target_level)
                 if purchase:
                     purchase.level = target_level
-                    # 計算到目標等級的總價格（用於記錄）
-                    total_price = 0
-                    for level in range(target_level):
-                        total_price += shop_item.base_price * (level + 1)
                     purchase.price_paid = total_price
                     purchase.save()
                 else:
                     # 如果沒有購買記錄但目標等級 > 0，創建新記錄
-                    total_price = 0
-                    for level in range(target_level):
-                        total_price += shop_item.base_price * (level + 1)
                     purchase = PlayerPurchase.objects.create(
                         user=request.user,
-                        shop_item=shop_item,
+                        shop_item_id=shop_item.id,
                         level=target_level,
                         price_paid=total_price
                     )
+            # 同步玩家資料的購買等級（等級 0 移除）並遞增資料版本
+            set_purchase_levels(request.user.id, {shop_item.id: target_level})
         
         return JsonResponse({
             'success': True,
@@ -1045,8 +1265,6 @@ def api_rollback_shop_level(request):
             'new_level': target_level,
             'message': f'已將 {shop_item.name} 從等級 {current_level} 回溯到等級 {target_level}'
         })
-    except ShopItem.DoesNotExist:
-        return JsonResponse({'error': '物品不存在'}, status=404)
     except ValueError as e:
         return JsonResponse({'error': '無效的參數值'}, status=400)
     except Exception as e:
@@ -1078,6 +1296,9 @@ def api_rollback_all_shop_items(request):
                         'old_level': purchase.level
                     })
                     purchase.delete()
+            if rolled_back_items:
+                # 同步玩家資料的購買等級並遞增資料版本
+                sync_purchase_levels(request.user.id)
             
             return JsonResponse({
                 'success': True,
@@ -5,10 +5,15 @@ from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.sessions.backends.base import SessionBase
 from django.core.exceptions import ImproperlyConfigured
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# session 中記錄上次延長過期時間的時間戳（Unix 秒）
+SESSION_REFRESHED_AT_KEY = '_session_refreshed_at'
+
 
 class SafeSessionMiddleware(SessionMiddleware):
     """
@@ -16,6 +21,11 @@ class SafeSessionMiddleware(SessionMiddleware):
     
     這個中間件解決了 Django 5.x 在 serverless 環境（如 Vercel）中
     可能出現的 'SessionStore' object has no attribute '_session_cache' 錯誤
+
+    另外提供合併寫入模式：當 SESSION_SAVE_EVERY_REQUEST = False 且設定了
+    SESSION_REFRESH_FRACTION 時，session 資料未變更的請求不會寫入資料庫，
+    只有距離上次延長超過 SESSION_COOKIE_AGE * SESSION_REFRESH_FRACTION 秒後
+    才會寫入一次以延長過期時間（滑動過期）。
     """
     
     def process_request(self, request):
@@ -64,6 +74,10 @@ class SafeSessionMiddleware(SessionMiddleware):
         
         如果保存失敗，記錄錯誤但不影響響應
         """
+        try:
+            self._coalesce_session_refresh(request)
+        except Exception as e:
+            logger.warning(f"檢查 Session 延長時間失敗: {e}", exc_info=True)
         try:
             return super().process_response(request, response)
         except Exception as e:
@@ -74,3 +88,71 @@ class SafeSessionMiddleware(SessionMiddleware):
             )
             return response
 
+    def _coalesce_session_refresh(self, request):
+        """
+        決定本次請求是否需要延長 session 過期時間
+
+        只處理本次請求已載入的非空 session（未讀取 session 的請求不會額外查詢）。
+        資料已變更的 session 本來就會保存，順便更新時間戳；
+        資料未變更時，只有超過刷新間隔才標記為已修改，讓 SessionMiddleware 保存一次。
+        """
+        fraction = getattr(settings, 'SESSION_REFRESH_FRACTION', None)
+        if fraction is None or settings.SESSION_SAVE_EVERY_REQUEST:
+            return
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.is_empty():
+            return
+
+        now = int(time.time())
+        if session.modified:
+            session[SESSION_REFRESHED_AT_KEY] = now
+            return
+
+        refreshed_at = session.get(SESSION_REFRESHED_AT_KEY)
+        refresh_interval = settings.SESSION_COOKIE_AGE * fraction
+        if not isinstance(refreshed_at, int) or now - refreshed_at >= refresh_interval:
+            session[SESSION_REFRESHED_AT_KEY] = now
+
+
+class SignedTokenAuthenticationMiddleware:
+    """
+    無狀態簽名憑證認證中間件（需放在 AuthenticationMiddleware 之後）
+
+    當 GAME_STATELESS_AUTH = True 且請求帶有有效的登入憑證（Bearer 標頭或 cookie）時，
+    直接以憑證中的用戶 ID 與用戶名稱建立 request.user，不查詢 django_session 與 auth_user。
+    沒有憑證或憑證無效時，沿用 AuthenticationMiddleware 的 session 認證結果。
+
+    憑證建立的用戶只有 id 與 username（不是 staff），只套用在 GAME_AUTH_TOKEN_PATH_PREFIXES
+    開頭的路徑（遊戲 API）；後台等其他路徑一律使用 session 認證，同時帶有遊戲憑證的管理員不會被擋在外面。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from game.auth_tokens import stateless_auth_enabled, get_token_from_request
+
+        if stateless_auth_enabled() and request.path.startswith(self._path_prefixes()):
+            token = get_token_from_request(request)
+            if token:
+                session_user = request.user
+                request.user = SimpleLazyObject(
+                    lambda: self._resolve_user(token, session_user)
+                )
+        return self.get_response(request)
+
+    @staticmethod
+    def _path_prefixes():
+        return tuple(getattr(settings, 'GAME_AUTH_TOKEN_PATH_PREFIXES', ('/api/',)))
+
+    @staticmethod
+    def _resolve_user(token, session_user):
+        """解析憑證用戶（延遲執行，只有視圖讀取 request.user 時才檢查撤銷計數）"""
+        from game.auth_tokens import user_from_token
+
+        try:
+            user = user_from_token(token)
+        except Exception as e:
+            logger.warning(f"登入憑證驗證失敗: {e}", exc_info=True)
+            user = None
+        return user if user is not None else session_user
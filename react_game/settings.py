@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from urllib.parse import urlparse
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -70,6 +71,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'react_game.middleware.SignedTokenAuthenticationMiddleware',  # 無狀態簽名憑證（GAME_STATELESS_AUTH 啟用時）
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -270,6 +272,16 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# 認證後端：載入 session 用戶時以 JOIN 一併取得玩家資料（game.backends.PlayerModelBackend）。
+# session 用戶由 AuthenticationMiddleware 以 session 中記錄的後端載入，JOIN 只能在後端的 get_user 中完成，
+# 因此對所有路徑（包含後台）生效；只改寫 get_user，密碼登入與權限判斷與 ModelBackend 相同。
+# 保留 ModelBackend，以原本的後端登入的 session 仍然有效
+AUTHENTICATION_BACKENDS = [
+    'game.backends.PlayerModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -299,7 +311,73 @@ SESSION_COOKIE_AGE = 60 * 60 * 24 * 7  # 7 天
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = False  # 本地開發設為 False，生產環境應設為 True（HTTPS）
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_SAVE_EVERY_REQUEST = True  # 每次請求都更新 session，延長過期時間
+# 不在每次請求都寫入 session（避免每個 API 呼叫都 UPDATE django_session）
+# 改由 SafeSessionMiddleware 合併寫入：距離上次延長超過 SESSION_COOKIE_AGE 的
+# SESSION_REFRESH_FRACTION 比例後才延長過期時間，維持 7 天的滑動過期
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = 0.1  # 設為 None 則停用滑動延長
+
+# 無狀態簽名憑證模式（可選）
+# 啟用後 API 以 HMAC 簽名憑證（cookie 或 Authorization: Bearer）認證，不查詢 session 表，
+# 適合 serverless 部署（每次資料庫往返成本較高）
+GAME_STATELESS_AUTH = os.getenv('GAME_STATELESS_AUTH', '').lower() == 'true'
+GAME_AUTH_TOKEN_COOKIE_NAME = 'cf_auth'
+GAME_AUTH_TOKEN_PATH_PREFIXES = ('/api/',)  # 只在這些路徑使用憑證認證（後台等其他路徑使用 session）
+GAME_AUTH_EPOCH_CACHE_TIMEOUT = 60  # 撤銷計數快取秒數（多個程序間撤銷生效的最長延遲）
+
+# Idempotency-Key 去重（提交遊戲結果、購買物品）
+GAME_IDEMPOTENCY_TTL = 60 * 60 * 24  # 記錄保留秒數（用戶端在此期間內可用同一個 key 重試）
+GAME_IDEMPOTENCY_LEASE = 60  # 處理中記錄的租約秒數（程序中途結束時，到期後同一個 key 可重新處理）
+GAME_IDEMPOTENCY_MAX_RECORDS = 100000  # 記錄數量上限，超出時刪除最舊的記錄
+GAME_IDEMPOTENCY_PURGE_INTERVAL = 300  # 每個程序批量清除過期記錄的間隔秒數
+
+# 遊戲記錄延遲寫入（可選）
+# 啟用後 GameSession 先放入程序內緩衝（附本地日誌），累積一定筆數或時間後一次寫入資料庫。
+# 需要可寫入的本地磁碟與常駐程序（gunicorn 等），不適合 serverless 部署
+GAME_SESSION_WRITE_BEHIND = os.getenv('GAME_SESSION_WRITE_BEHIND', '').lower() == 'true'
+GAME_SESSION_BUFFER_SIZE = 200  # 緩衝達到此筆數時寫入
+GAME_SESSION_BUFFER_MAX_AGE = 2.0  # 最舊的記錄超過此秒數時寫入
+GAME_SESSION_JOURNAL_DIR = os.getenv(
+    'GAME_SESSION_JOURNAL_DIR',
+    os.path.join(tempfile.gettempdir(), 'clickfast-game-sessions'),
+)
+
+# 玩家最近遊戲記錄快取（每位玩家保留最新 N 筆，/api/history/ 的 limit 不超過 N 時不查詢資料庫）
+# GAME_HISTORY_CACHE 為 CACHES 的別名；未設定 CACHES 時使用 Django 預設的程序內快取，
+# 多程序部署建議設定共用的快取（Redis / Memcached）
+GAME_HISTORY_CACHE = 'default'
+GAME_HISTORY_CACHE_SIZE = 20
+GAME_HISTORY_CACHE_TIMEOUT = 60 * 60
+
+# 商店物品與成就目錄快取（每個程序載入一次，修改時以 Django cache 中的版本戳記通知其他程序）
+# 快取不是跨程序共用時，版本戳記無法傳遞，最多在此秒數後重新載入
+GAME_CATALOG_TTL = 300
+
+# 購買商店物品的樂觀並發重試次數（條件式扣款 + 等級比較並交換）
+# 重試用盡後退回以 select_for_update 鎖定玩家資料的流程；設為 0 時一律使用鎖定流程
+GAME_PURCHASE_CAS_RETRIES = 3
+
+# 全服排行榜（/api/leaderboard/）快取前 N 名，所有觀看者共用；提交的分數達到第 N 名時重建
+# 其他寫入（刪除用戶、後台修改分數）最多在此秒數後反映
+# GAME_LEADERBOARD_CACHE 為 CACHES 的別名；失效以快取中的世代計數器通知其他程序，
+# 未設定 CACHES 時使用 Django 預設的程序內快取，其他程序最多在 GAME_LEADERBOARD_CACHE_TIMEOUT 秒後才看到新的排行榜，
+# 多程序部署需要設定共用的快取（Redis / Memcached）
+GAME_LEADERBOARD_CACHE = 'default'
+GAME_LEADERBOARD_SIZE = 100
+GAME_LEADERBOARD_CACHE_TIMEOUT = 5 * 60
+
+# 全服排名（玩家資料的 global_rank）的樹狀陣列涵蓋的最高單局點擊數，更高的分數視為同分
+# 修改後需要執行 rebuild_score_ranks 重建
+GAME_RANK_MAX_SCORE = 2 ** 20 - 1
+
+# 遊戲記錄歸檔（archive_game_sessions 命令）
+# PostgreSQL 上遊戲記錄表依月份分區，舊的月份匯出為壓縮檔後卸離並刪除分區
+GAME_SESSION_ARCHIVE_KEEP_MONTHS = 12  # 保留最近幾個月（含當月）
+GAME_SESSION_ARCHIVE_DIR = os.getenv('GAME_SESSION_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'game_sessions'))
+# 預先建立未來幾個月的分區：每次 migrate 後自動建立，另外請以排程每日執行
+#   python manage.py ensure_game_session_partitions
+# （與 archive_game_sessions 無關；長時間不部署時，跨月前仍會建立下個月的分區）
+GAME_SESSION_PARTITION_MONTHS_AHEAD = 3
 
 # 日誌配置
 # 過濾掉未登錄時的 401 警告（這是正常行為，不需要記錄為警告）